@@ -20,6 +20,8 @@
  * from rhsm import _certificate
  *
  * x509 = _certificate.load(pem=my_pem_string)
+ * x509 = _certificate.load(data=mmap_or_string_of_pem_or_der)
+ * x509s = _certificate.load_all(data=bundle_of_pem_certificates)
  *
  * print x509.get_extension('10.11.1.2.9.7')
  * print x509.get_extension(name='subjectAltName')
@@ -43,6 +45,7 @@
 
 #include <openssl/asn1.h>
 #include <openssl/asn1t.h>
+#include <openssl/err.h>
 #include <openssl/pem.h>
 #include <openssl/x509.h>
 #include <openssl/x509v3.h>
@@ -50,8 +53,14 @@
 #include "Python.h"
 #include "structmember.h"
 
+#include <ctype.h>
+
 #define MAX_BUF 256
 
+#if PY_VERSION_HEX < 0x02050000
+typedef int Py_ssize_t;
+#endif
+
 typedef struct {
 	PyObject_HEAD;
 	X509 *x509;
@@ -66,12 +75,18 @@ certificate_x509_dealloc (certificate_x509 *self)
 
 static PyObject *get_not_before (certificate_x509 *self, PyObject *varargs);
 static PyObject *get_not_after (certificate_x509 *self, PyObject *varargs);
+static PyObject *get_not_before_epoch (certificate_x509 *self,
+				       PyObject *varargs);
+static PyObject *get_not_after_epoch (certificate_x509 *self,
+				      PyObject *varargs);
 static PyObject *get_serial_number (certificate_x509 *self, PyObject *varargs);
 static PyObject *get_subject (certificate_x509 *self, PyObject *varargs);
 static PyObject *get_issuer(certificate_x509 *self, PyObject *varargs);
 static PyObject *get_extension (certificate_x509 *self, PyObject *varargs,
 				PyObject *keywords);
 static PyObject *get_all_extensions (certificate_x509 *self, PyObject *varargs);
+static PyObject *get_extensions (certificate_x509 *self, PyObject *varargs,
+				 PyObject *keywords);
 static PyObject *as_pem (certificate_x509 *self, PyObject *varargs);
 
 static PyMethodDef x509_methods[] = {
@@ -79,6 +94,12 @@ static PyMethodDef x509_methods[] = {
 	 "get the certificate's start time"},
 	{"get_not_after", (PyCFunction) get_not_after, METH_VARARGS,
 	 "get the certificate's end time"},
+	{"get_not_before_epoch", (PyCFunction) get_not_before_epoch,
+	 METH_VARARGS,
+	 "get the certificate's start time in seconds since the epoch, UTC"},
+	{"get_not_after_epoch", (PyCFunction) get_not_after_epoch,
+	 METH_VARARGS,
+	 "get the certificate's end time in seconds since the epoch, UTC"},
 	{"get_serial_number", (PyCFunction) get_serial_number, METH_VARARGS,
 	 "get the certificate's serial number"},
 	{"get_subject", (PyCFunction) get_subject, METH_VARARGS,
@@ -90,6 +111,11 @@ static PyMethodDef x509_methods[] = {
 	 "get the string representation of an extension by oid"},
 	{"get_all_extensions", (PyCFunction) get_all_extensions, METH_VARARGS,
 	 "get a dict of oid: value"},
+	{"get_extensions", (PyCFunction) get_extensions,
+	 METH_VARARGS | METH_KEYWORDS,
+	 "get a list of (oid, value), optionally only those under a namespace "
+	 "oid, which is trimmed from the oids returned, and optionally leaving "
+	 "out the extensions openssl knows by name"},
 	{"as_pem", (PyCFunction) as_pem, METH_VARARGS,
 	 "return the pem representation of this certificate"},
 	{NULL}
@@ -138,14 +164,8 @@ static PyTypeObject certificate_x509_type = {
 };
 
 static size_t
-get_extension_by_object (X509 *x509, ASN1_OBJECT *obj, char **output)
+get_extension_value (X509_EXTENSION *ext, char **output)
 {
-	int pos = X509_get_ext_by_OBJ (x509, obj, -1);
-	if (pos < 0) {
-		return 0;
-	}
-	X509_EXTENSION *ext = X509_get_ext (x509, pos);
-
 	int tag;
 	long len;
 	int tc;
@@ -195,6 +215,81 @@ get_extension_by_object (X509 *x509, ASN1_OBJECT *obj, char **output)
 	}
 }
 
+static size_t
+get_extension_by_object (X509 *x509, ASN1_OBJECT *obj, char **output)
+{
+	int pos = X509_get_ext_by_OBJ (x509, obj, -1);
+	if (pos < 0) {
+		return 0;
+	}
+	return get_extension_value (X509_get_ext (x509, pos), output);
+}
+
+typedef struct {
+	char oid[MAX_BUF];
+	/* offset of the oid with the namespace trimmed off */
+	size_t trim;
+	char *value;
+	size_t length;
+} extension_value;
+
+/*
+ * Decode the certificate's extensions in one pass over them, keeping only
+ * those under namespace if it is not NULL, and leaving out those openssl
+ * has a name for (subjectAltName, keyUsage, ...) if skip_named is set.
+ * Does not touch any python
+ * objects, so may be called without the GIL. Returns the number of
+ * extensions stored in *output, or -1 if out of memory. Free the result
+ * with free_extension_values.
+ */
+static int
+read_extensions (X509 *x509, const char *namespace, int skip_named,
+		 extension_value **output)
+{
+	int i;
+	int count = 0;
+	int ext_count = X509_get_ext_count (x509);
+	size_t namespace_len = namespace == NULL ? 0 : strlen (namespace);
+
+	extension_value *values = calloc (ext_count + 1,
+					  sizeof (extension_value));
+	if (values == NULL) {
+		return -1;
+	}
+
+	for (i = 0; i < ext_count; i++) {
+		X509_EXTENSION *ext = X509_get_ext (x509, i);
+		extension_value *value = &values[count];
+
+		if (skip_named && OBJ_obj2nid (ext->object) != NID_undef) {
+			continue;
+		}
+		OBJ_obj2txt (value->oid, MAX_BUF, ext->object, 1);
+		if (namespace != NULL) {
+			if (strncmp (value->oid, namespace, namespace_len) != 0 ||
+			    value->oid[namespace_len] != '.') {
+				continue;
+			}
+			value->trim = namespace_len + 1;
+		}
+		value->length = get_extension_value (ext, &value->value);
+		count++;
+	}
+
+	*output = values;
+	return count;
+}
+
+static void
+free_extension_values (extension_value *values, int count)
+{
+	int i;
+	for (i = 0; i < count; i++) {
+		free (values[i].value);
+	}
+	free (values);
+}
+
 static ASN1_OBJECT *
 get_object_by_oid (const char *oid)
 {
@@ -208,38 +303,242 @@ get_object_by_name (const char *name)
 	return OBJ_nid2obj (nid);
 }
 
+/*
+ * Parse a PEM, or failing that DER, certificate from memory. Does not touch
+ * any python objects, so may be called without the GIL.
+ */
+static X509 *
+read_x509 (const char *data, Py_ssize_t length)
+{
+	BIO *bio = BIO_new_mem_buf ((void *) data, length);
+	X509 *x509 = PEM_read_bio_X509 (bio, NULL, NULL, NULL);
+	BIO_free (bio);
+
+	if (x509 == NULL) {
+		const unsigned char *p = (const unsigned char *) data;
+		x509 = d2i_X509 (NULL, &p, length);
+	}
+	ERR_clear_error ();
+	return x509;
+}
+
+static PyObject *
+wrap_x509 (X509 *x509)
+{
+	if (x509 == NULL) {
+		Py_INCREF (Py_None);
+		return Py_None;
+	}
+
+	certificate_x509 *py_x509 =
+		(certificate_x509 *) _PyObject_New (&certificate_x509_type);
+	py_x509->x509 = x509;
+	return (PyObject *) py_x509;
+}
+
+/*
+ * Memory of a python object with the buffer interface. Get one with
+ * get_buffer, and hand it back with release_buffer.
+ */
+typedef struct {
+	const void *buf;
+	Py_ssize_t len;
+#if PY_VERSION_HEX >= 0x02060000
+	Py_buffer view;
+	int has_view;
+#endif
+} buffer_data;
+
+static int
+get_buffer (PyObject *data, buffer_data *buffer)
+{
+	if (PyUnicode_Check (data)) {
+		PyErr_SetString (PyExc_TypeError,
+				 "data must be a str or buffer, not unicode");
+		return -1;
+	}
+
+#if PY_VERSION_HEX >= 0x02060000
+	/*
+	 * Prefer the new buffer interface, which stops the likes of bytearray
+	 * from being resized while we read them without the GIL.
+	 */
+	buffer->has_view = PyObject_CheckBuffer (data);
+	if (buffer->has_view) {
+		if (PyObject_GetBuffer (data, &buffer->view, PyBUF_SIMPLE) < 0) {
+			return -1;
+		}
+		buffer->buf = buffer->view.buf;
+		buffer->len = buffer->view.len;
+		return 0;
+	}
+#endif
+
+	return PyObject_AsReadBuffer (data, &buffer->buf, &buffer->len);
+}
+
+static void
+release_buffer (buffer_data *buffer)
+{
+#if PY_VERSION_HEX >= 0x02060000
+	if (buffer->has_view) {
+		PyBuffer_Release (&buffer->view);
+	}
+#endif
+}
+
+/*
+ * Load a certificate straight out of the memory of any object with the
+ * buffer interface (str, bytearray, mmap, ...), without copying it.
+ */
+static PyObject *
+load_buffer (PyObject *data)
+{
+	buffer_data buffer;
+	X509 *x509;
+
+	if (get_buffer (data, &buffer) < 0) {
+		return NULL;
+	}
+
+	Py_BEGIN_ALLOW_THREADS;
+	x509 = read_x509 (buffer.buf, buffer.len);
+	Py_END_ALLOW_THREADS;
+
+	release_buffer (&buffer);
+	return wrap_x509 (x509);
+}
+
+/*
+ * Read every PEM certificate in a buffer, skipping any other PEM blocks.
+ * Does not touch any python objects, so may be called without the GIL.
+ * Returns the number of certificates stored in *output, or -1 if one of
+ * them could not be parsed or we ran out of memory.
+ */
+static int
+read_all_x509 (const void *data, Py_ssize_t length, X509 ***output)
+{
+	int count = 0;
+	int size = 8;
+	X509 **certs = malloc (sizeof (X509 *) * size);
+	BIO *bio = BIO_new_mem_buf ((void *) data, length);
+	X509 *x509;
+
+	if (certs == NULL || bio == NULL) {
+		free (certs);
+		BIO_free (bio);
+		return -1;
+	}
+
+	ERR_clear_error ();
+	while ((x509 = PEM_read_bio_X509 (bio, NULL, NULL, NULL)) != NULL) {
+		if (count == size) {
+			X509 **bigger;
+			size *= 2;
+			bigger = realloc (certs, sizeof (X509 *) * size);
+			if (bigger == NULL) {
+				X509_free (x509);
+				break;
+			}
+			certs = bigger;
+		}
+		certs[count++] = x509;
+	}
+	BIO_free (bio);
+
+	/* running out of certificates to read is the only expected error */
+	unsigned long error = ERR_peek_last_error ();
+	ERR_clear_error ();
+	if (x509 != NULL || (error != 0 &&
+			     ERR_GET_REASON (error) != PEM_R_NO_START_LINE)) {
+		int i;
+		for (i = 0; i < count; i++) {
+			X509_free (certs[i]);
+		}
+		free (certs);
+		return -1;
+	}
+
+	*output = certs;
+	return count;
+}
+
+static PyObject *
+load_all_certs (PyObject *self, PyObject *args, PyObject *keywords)
+{
+	PyObject *data = NULL;
+
+	static char *keywordlist[] = { "data", NULL };
+
+	if (!PyArg_ParseTupleAndKeywords (args, keywords, "O", keywordlist,
+					  &data)) {
+		return NULL;
+	}
+
+	buffer_data buffer;
+	X509 **certs;
+	int count;
+	int i;
+
+	if (get_buffer (data, &buffer) < 0) {
+		return NULL;
+	}
+
+	Py_BEGIN_ALLOW_THREADS;
+	count = read_all_x509 (buffer.buf, buffer.len, &certs);
+	Py_END_ALLOW_THREADS;
+
+	release_buffer (&buffer);
+	if (count < 0) {
+		PyErr_SetString (PyExc_ValueError,
+				 "unable to parse certificate bundle");
+		return NULL;
+	}
+
+	PyObject *list = PyList_New (count);
+	for (i = 0; i < count; i++) {
+		PyList_SET_ITEM (list, i, wrap_x509 (certs[i]));
+	}
+	free (certs);
+	return list;
+}
+
 static PyObject *
 load_cert (PyObject *self, PyObject *args, PyObject *keywords)
 {
 	const char *file_name = NULL;
 	const char *pem = NULL;
+	int pem_length = 0;
+	PyObject *data = NULL;
 
-	static char *keywordlist[] = { "file", "pem", NULL };
+	static char *keywordlist[] = { "file", "pem", "data", NULL };
 
-	if (!PyArg_ParseTupleAndKeywords (args, keywords, "|ss", keywordlist,
-					  &file_name, &pem)) {
+	if (!PyArg_ParseTupleAndKeywords (args, keywords, "|ss#O",
+					  keywordlist, &file_name, &pem,
+					  &pem_length, &data)) {
 		return NULL;
 	}
 
-	BIO *bio;
-	if (pem != NULL) {
-		bio = BIO_new_mem_buf ((void *) pem, strlen (pem));
-	} else {
-		bio = BIO_new_file (file_name, "r");
+	if (data != NULL) {
+		return load_buffer (data);
 	}
 
-	X509 *x509 = PEM_read_bio_X509 (bio, NULL, NULL, NULL);
-	BIO_free (bio);
+	X509 *x509;
 
-	if (x509 == NULL) {
-		Py_INCREF (Py_None);
-		return Py_None;
+	/* file_name and pem belong to args, which our caller holds on to */
+	Py_BEGIN_ALLOW_THREADS;
+	if (pem != NULL) {
+		BIO *bio = BIO_new_mem_buf ((void *) pem, pem_length);
+		x509 = PEM_read_bio_X509 (bio, NULL, NULL, NULL);
+		BIO_free (bio);
+	} else {
+		BIO *bio = BIO_new_file (file_name, "r");
+		x509 = PEM_read_bio_X509 (bio, NULL, NULL, NULL);
+		BIO_free (bio);
 	}
+	Py_END_ALLOW_THREADS;
 
-	certificate_x509 *py_x509 =
-		(certificate_x509 *) _PyObject_New (&certificate_x509_type);
-	py_x509->x509 = x509;
-	return (PyObject *) py_x509;
+	return wrap_x509 (x509);
 }
 
 static PyObject *
@@ -256,21 +555,22 @@ get_extension (certificate_x509 *self, PyObject *args, PyObject *keywords)
 	}
 
 	char *value = NULL;
-	size_t length;
+	size_t length = 0;
 	ASN1_OBJECT *obj = NULL;
+
+	Py_BEGIN_ALLOW_THREADS;
 	if (name != NULL) {
 		obj = get_object_by_name (name);
 	} else {
 		obj = get_object_by_oid (oid);
 	}
 
-	if (obj == NULL) {
-		Py_INCREF (Py_None);
-		return Py_None;
+	if (obj != NULL) {
+		length = get_extension_by_object (self->x509, obj, &value);
+		ASN1_OBJECT_free (obj);
 	}
+	Py_END_ALLOW_THREADS;
 
-	length = get_extension_by_object (self->x509, obj, &value);
-	ASN1_OBJECT_free (obj);
 	if (value != NULL) {
 		PyObject *extension = PyString_FromStringAndSize (value,
 								  length);
@@ -290,33 +590,81 @@ get_all_extensions (certificate_x509 *self, PyObject *args)
 	}
 
 	int i;
-	int ext_count = X509_get_ext_count (self->x509);
+	int count;
+	extension_value *values;
+
+	/* decode without holding the GIL, then build the python objects */
+	Py_BEGIN_ALLOW_THREADS;
+	count = read_extensions (self->x509, NULL, 0, &values);
+	Py_END_ALLOW_THREADS;
+	if (count < 0) {
+		return PyErr_NoMemory ();
+	}
 
-	char oid[MAX_BUF];
 	PyObject *dict = PyDict_New ();
-	for (i = 0; i < ext_count; i++) {
-		X509_EXTENSION *ext = X509_get_ext (self->x509, i);
-
-		OBJ_obj2txt (oid, MAX_BUF, ext->object, 1);
-		PyObject *key = PyString_FromString (oid);
-
-		char *value = NULL;
-		size_t length =
-			get_extension_by_object (self->x509, ext->object,
-						 &value);
-
-		PyObject *dict_value = PyString_FromStringAndSize (value,
-								   length);
-		free (value);
+	for (i = 0; i < count; i++) {
+		PyObject *key = PyString_FromString (values[i].oid);
+		/* if an oid is repeated, the first value wins */
+		if (PyDict_Contains (dict, key)) {
+			Py_DECREF (key);
+			continue;
+		}
+		PyObject *dict_value =
+			PyString_FromStringAndSize (values[i].value,
+						    values[i].length);
 		PyDict_SetItem (dict, key, dict_value);
 
 		Py_DECREF (key);
 		Py_DECREF (dict_value);
 	}
 
+	free_extension_values (values, count);
 	return dict;
 }
 
+static PyObject *
+get_extensions (certificate_x509 *self, PyObject *args, PyObject *keywords)
+{
+	const char *namespace = NULL;
+	PyObject *named = Py_True;
+
+	static char *keywordlist[] = { "namespace", "named", NULL };
+
+	if (!PyArg_ParseTupleAndKeywords (args, keywords, "|zO", keywordlist,
+					  &namespace, &named)) {
+		return NULL;
+	}
+
+	int i;
+	int count;
+	extension_value *values;
+
+	int skip_named = !PyObject_IsTrue (named);
+
+	Py_BEGIN_ALLOW_THREADS;
+	count = read_extensions (self->x509, namespace, skip_named, &values);
+	Py_END_ALLOW_THREADS;
+	if (count < 0) {
+		return PyErr_NoMemory ();
+	}
+
+	PyObject *list = PyList_New (count);
+	for (i = 0; i < count; i++) {
+		PyObject *key =
+			PyString_FromString (values[i].oid + values[i].trim);
+		PyObject *value =
+			PyString_FromStringAndSize (values[i].value,
+						    values[i].length);
+		PyList_SET_ITEM (list, i, PyTuple_Pack (2, key, value));
+
+		Py_DECREF (key);
+		Py_DECREF (value);
+	}
+
+	free_extension_values (values, count);
+	return list;
+}
+
 static PyObject *
 as_pem (certificate_x509 *self, PyObject *args)
 {
@@ -324,13 +672,18 @@ as_pem (certificate_x509 *self, PyObject *args)
 		return NULL;
 	}
 
+	size_t size;
+	char *buf;
+
+	Py_BEGIN_ALLOW_THREADS;
 	BIO *bio = BIO_new (BIO_s_mem ());
 	PEM_write_bio_X509 (bio, self->x509);
 
-	size_t size = BIO_ctrl_pending (bio);
-	char *buf = malloc (sizeof (char) * size);
+	size = BIO_ctrl_pending (bio);
+	buf = malloc (sizeof (char) * size);
 	BIO_read (bio, buf, size);
 	BIO_free (bio);
+	Py_END_ALLOW_THREADS;
 
 	PyObject *pem = PyString_FromStringAndSize (buf, size);
 	free (buf);
@@ -418,10 +771,11 @@ get_issuer (certificate_x509 *self, PyObject *args)
 }
 
 static PyObject *
-time_to_string (ASN1_UTCTIME *time)
+time_to_string (ASN1_TIME *time)
 {
 	BIO *bio = BIO_new (BIO_s_mem ());
-	ASN1_UTCTIME_print (bio, time);
+	/* handles GeneralizedTime as well as UTCTime */
+	ASN1_TIME_print (bio, time);
 
 	size_t size = BIO_ctrl_pending (bio);
 	char *buf = malloc (sizeof (char) * size);
@@ -433,23 +787,162 @@ time_to_string (ASN1_UTCTIME *time)
 	return time_str;
 }
 
+/* Read count digits at *pos as a decimal number. */
+static int
+read_digits (const char *str, int length, int *pos, int count, int *value)
+{
+	*value = 0;
+	if (*pos + count > length) {
+		return 0;
+	}
+	for (; count > 0; count--, (*pos)++) {
+		if (!isdigit ((unsigned char) str[*pos])) {
+			return 0;
+		}
+		*value = *value * 10 + str[*pos] - '0';
+	}
+	return 1;
+}
+
+/* Days from 1970-01-01 to the given date of the proleptic Gregorian calendar */
+static PY_LONG_LONG
+days_from_civil (int year, int month, int day)
+{
+	year -= month <= 2;
+	int era = (year >= 0 ? year : year - 399) / 400;
+	int year_of_era = year - era * 400;
+	int day_of_year = (153 * (month + (month > 2 ? -3 : 9)) + 2) / 5 +
+		day - 1;
+	int day_of_era = year_of_era * 365 + year_of_era / 4 -
+		year_of_era / 100 + day_of_year;
+	return (PY_LONG_LONG) era * 146097 + day_of_era - 719468;
+}
+
+/*
+ * Convert a UTCTime (YYMMDDhhmm[ss]) or GeneralizedTime
+ * (YYYYMMDDhhmm[ss[.fff]]) followed by "Z" or an offset of +/-hhmm to
+ * seconds since the epoch. We parse these ourselves, as ASN1_TIME_to_tm is
+ * not in the older openssl releases we build against, and timegm is not
+ * portable. Returns 0 if the time can't be parsed.
+ */
+static int
+time_to_epoch (ASN1_TIME *time, PY_LONG_LONG *epoch)
+{
+	const char *str = (const char *) ASN1_STRING_data (time);
+	int length = ASN1_STRING_length (time);
+	int pos = 0;
+	int year, month, day, hour, minute;
+	int second = 0;
+	int offset = 0;
+
+	if (ASN1_STRING_type (time) == V_ASN1_UTCTIME) {
+		if (!read_digits (str, length, &pos, 2, &year)) {
+			return 0;
+		}
+		/* as per RFC 5280 */
+		year += year < 50 ? 2000 : 1900;
+	} else if (ASN1_STRING_type (time) == V_ASN1_GENERALIZEDTIME) {
+		if (!read_digits (str, length, &pos, 4, &year)) {
+			return 0;
+		}
+	} else {
+		return 0;
+	}
+
+	if (!read_digits (str, length, &pos, 2, &month) ||
+	    !read_digits (str, length, &pos, 2, &day) ||
+	    !read_digits (str, length, &pos, 2, &hour) ||
+	    !read_digits (str, length, &pos, 2, &minute)) {
+		return 0;
+	}
+	if (pos < length && isdigit ((unsigned char) str[pos]) &&
+	    !read_digits (str, length, &pos, 2, &second)) {
+		return 0;
+	}
+	/* fractions of a second */
+	if (pos < length && (str[pos] == '.' || str[pos] == ',')) {
+		pos++;
+		while (pos < length && isdigit ((unsigned char) str[pos])) {
+			pos++;
+		}
+	}
+
+	if (pos < length && str[pos] == 'Z') {
+		pos++;
+	} else if (pos < length && (str[pos] == '+' || str[pos] == '-')) {
+		int sign = str[pos] == '-' ? -1 : 1;
+		int offset_hour, offset_minute;
+		pos++;
+		if (!read_digits (str, length, &pos, 2, &offset_hour) ||
+		    !read_digits (str, length, &pos, 2, &offset_minute)) {
+			return 0;
+		}
+		offset = sign * (offset_hour * 3600 + offset_minute * 60);
+	} else {
+		return 0;
+	}
+
+	if (pos != length || month < 1 || month > 12 || day < 1 || day > 31 ||
+	    hour > 23 || minute > 59 || second > 60) {
+		return 0;
+	}
+
+	*epoch = days_from_civil (year, month, day) * 86400 + hour * 3600 +
+		minute * 60 + second - offset;
+	return 1;
+}
+
+static PyObject *
+time_to_epoch_object (ASN1_TIME *time)
+{
+	PY_LONG_LONG epoch;
+	if (!time_to_epoch (time, &epoch)) {
+		PyErr_SetString (PyExc_ValueError, "invalid certificate time");
+		return NULL;
+	}
+	return PyLong_FromLongLong (epoch);
+}
+
 static PyObject *
 get_not_before (certificate_x509 *self, PyObject *args)
 {
-	ASN1_UTCTIME *time = X509_get_notBefore (self->x509);
+	ASN1_TIME *time = X509_get_notBefore (self->x509);
 	return time_to_string (time);
 }
 
 static PyObject *
 get_not_after (certificate_x509 *self, PyObject *args)
 {
-	ASN1_UTCTIME *time = X509_get_notAfter (self->x509);
+	ASN1_TIME *time = X509_get_notAfter (self->x509);
 	return time_to_string (time);
 }
 
+static PyObject *
+get_not_before_epoch (certificate_x509 *self, PyObject *args)
+{
+	if (!PyArg_ParseTuple (args, "")) {
+		return NULL;
+	}
+	return time_to_epoch_object (X509_get_notBefore (self->x509));
+}
+
+static PyObject *
+get_not_after_epoch (certificate_x509 *self, PyObject *args)
+{
+	if (!PyArg_ParseTuple (args, "")) {
+		return NULL;
+	}
+	return time_to_epoch_object (X509_get_notAfter (self->x509));
+}
+
 static PyMethodDef cert_methods[] = {
 	{"load", (PyCFunction) load_cert, METH_VARARGS | METH_KEYWORDS,
-	 "load a certificate from a file"},
+	 "load a PEM certificate from a file or string, or a PEM or DER "
+	 "certificate from any object with the buffer interface"},
+	{"load_all", (PyCFunction) load_all_certs,
+	 METH_VARARGS | METH_KEYWORDS,
+	 "load every PEM certificate in a bundle from any object with the "
+	 "buffer interface, returning a list"},
 	{NULL}
 };
 
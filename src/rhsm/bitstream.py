@@ -11,55 +11,154 @@
 # granted to use or replicate Red Hat trademarks that are incorporated
 # in this software or its documentation.
 
-from collections import deque
+from binascii import hexlify
 
 
-class GhettoBitStream(object):
+class BitReader(object):
+    """
+    Reads binary data as a stream of bits, a few bits or one byte at a time.
+
+    Rather than converting the data into some other representation, the
+    reader keeps an integer cursor with the position of the next unread bit
+    in the original data. Any number of bits can be peeked at or read at
+    once, and they are returned as one unsigned number.
+    """
+
+    def __init__(self, data):
+        """
+        :param data:    binary data in a string
+        :type  data:    str or bytearray
+        """
+        if not isinstance(data, str):
+            data = str(data)
+        self.data = data
+        # index of the next unread bit
+        self.position = 0
+        self.length = len(data) * 8
+
+    def bits_remaining(self):
+        """
+        :return:    number of bits that have not yet been consumed
+        :rtype:     int
+        """
+        return self.length - self.position
+
+    def peek_bits(self, count):
+        """
+        Looks at the next bits in the stream without consuming them. If fewer
+        than "count" bits remain, the result is padded on the right with 0s.
+
+        :param count:   number of bits to look at
+        :type  count:   int
+        :return:        the bits combined into one unsigned number, reading
+                        the stream as big-endian
+        :rtype:         int
+        """
+        position = self.position
+        first = position >> 3
+        last = (position + count + 7) >> 3
+        chunk = self.data[first:last]
+        if not chunk:
+            return 0
+        value = int(hexlify(chunk), 16) << ((last - first - len(chunk)) << 3)
+        return (value >> ((last << 3) - position - count)) & ((1 << count) - 1)
+
+    def read_bits(self, count):
+        """
+        :param count:   number of bits to consume
+        :type  count:   int
+        :return:        the bits combined into one unsigned number, reading
+                        the stream as big-endian
+        :rtype:         int
+
+        :raise: IndexError if fewer than "count" bits remain
+        """
+        if count > self.length - self.position:
+            raise IndexError('read past the end of the bit stream')
+        value = self.peek_bits(count)
+        self.position += count
+        return value
+
+    def skip_bits(self, count):
+        """
+        Consumes the next bits in the stream. Skipping past the end of the
+        stream leaves it empty.
+
+        :param count:   number of bits to consume
+        :type  count:   int
+        """
+        self.position = min(self.position + count, self.length)
+
+    def read_byte(self):
+        """
+        :return:    next 8 bits in the stream, as an int
+        :rtype:     int
+
+        :raise: IndexError if fewer than 8 bits remain
+        """
+        return self.read_bits(8)
+
+
+class GhettoBitStream(BitReader):
     """
     Accepts binary data and makes it available as a stream of bits or one byte
-    at a time. Python does not provide a built-in way to read a stream of bits,
-    or a way to represent a single bit. Thus, this class uses character '0'
-    or '1' to represent the status of each bit.
+    at a time. Python does not provide a built-in way to represent a single
+    bit. Thus, this class uses character '0' or '1' to represent the status of
+    each bit when iterated.
 
-    Data is converted into the '0' and '1' characters one byte at a time, since
-    that operation multiplies the size of the data by a factor of 8, and it may
-    not be desirable to inflate all of the data at once.
+    This is kept for compatibility with code that iterates over bits; new code
+    should use the BitReader methods, which do not allocate a string per bit.
     """
 
     def __init__(self, data):
         """
         :param data:    binary data in a string
-        :type  data:    str
+        :type  data:    str or bytearray
         """
-        self.bytes = deque(ord(x) for x in data)
-        self._bit_buffer = deque()
+        BitReader.__init__(self, data)
+        # whole bytes taken by pop_byte while the bits of the current byte
+        # were still being iterated over
+        self._popped = 0
 
     def __iter__(self):
         return self
 
+    def _skip_popped(self):
+        if self._popped and not self.position & 7:
+            self.position = min(self.position + (self._popped << 3),
+                                self.length)
+            self._popped = 0
+
     def next(self):
         """
-        converts one byte at a time into a bit representation, waiting until
-        those bits have been consumed before converting another byte
-
         :return:    next bit in the stream, either '0' or '1'
         :rtype:     string
         """
-        if not self._bit_buffer:
-            try:
-                byte = self.pop_byte()
-            except IndexError:
-                raise StopIteration
-            bits = self._byte_to_bits(byte)
-            self._bit_buffer.extend(bits)
-        return self._bit_buffer.popleft()
+        self._skip_popped()
+        if self.position >= self.length:
+            raise StopIteration
+        return str(self.read_bits(1))
 
     def pop_byte(self):
         """
+        Consumes the next entire byte in the stream. If some bits of a byte
+        have already been iterated over, the byte after it is returned, and
+        iterating carries on with the rest of the partially consumed byte
+        before skipping past the popped ones.
+
         :return:    next entire byte in the stream, as an int
         :rtype:     int
+
+        :raise: IndexError if no entire byte remains
         """
-        return self.bytes.popleft()
+        self._skip_popped()
+        if not self.position & 7:
+            return self.read_byte()
+        index = (self.position >> 3) + 1 + self._popped
+        if index >= len(self.data):
+            raise IndexError('pop from an empty bit stream')
+        self._popped += 1
+        return ord(self.data[index])
 
     @classmethod
     def _byte_to_bits(cls, byte):
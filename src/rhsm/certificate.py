@@ -29,34 +29,30 @@ will be relocated into this module.
 """
 
 import os
-import re
 from M2Crypto import X509, RSA
 from datetime import datetime as dt
 from datetime import tzinfo, timedelta
 from time import strptime
-from subprocess import Popen, PIPE, STDOUT
 import logging
 import warnings
 
-log = logging.getLogger(__name__)
-
-
-# Regex used to scan for OIDs:
-OID_PATTERN = re.compile('([0-9]+\.)+[0-9]+:')
-
+from rhsm import _certificate
 
-# Regex used to parse OID values such as:
-#    0:d=0  hl=2 l=   3 prim: UTF8STRING        :2.0
-VALUE_PATTERN = re.compile('.*prim:\s(\w*)\s*:*(.*)')
+log = logging.getLogger(__name__)
 
 
 # NOTE: These factory methods create new style certificate objects from
 # the certificate2 module. They are placed here to abstract the fact that
 # we're using two modules for the time being. Eventually the certificate2 code
 # should be moved here.
-def create_from_file(path):
+def create_from_file(path, cache_dir=None):
+    """
+    :param cache_dir:   optional directory where decoded entitlement
+                        certificates are cached, so that later calls for an
+                        unchanged file can skip most of the parsing.
+    """
     from certificate2 import _CertFactory  # prevent circular deps
-    return _CertFactory().create_from_file(path)
+    return _CertFactory(cache_dir).create_from_file(path)
 
 
 def create_from_pem(pem):
@@ -64,6 +60,35 @@ def create_from_pem(pem):
     return _CertFactory().create_from_pem(pem)
 
 
+def create_many_from_pem(pem):
+    """
+    Creates a certificate for each certificate in a bundle of concatenated
+    PEM certificates, such as the certificates of several entitlements.
+
+    :return:    list of certificates, in the order they were in the bundle
+    """
+    from certificate2 import _CertFactory  # prevent circular deps
+    return _CertFactory().create_many_from_pem(pem)
+
+
+def load_directory(path, kind=None, workers=None, cache_dir=None):
+    """
+    Loads every certificate in a directory, skipping "-key.pem" files.
+    A file that fails to load does not stop the others being loaded.
+
+    :param kind:        only return certificates of this type, one of the
+                        PRODUCT_CERT, ENTITLEMENT_CERT or IDENTITY_CERT
+                        constants in rhsm.certificate2
+    :param workers:     number of threads to load the files with
+    :param cache_dir:   as for create_from_file
+    :return:            tuple of a dict of certificates by serial, and a dict
+                        of the exception raised for each file that could not
+                        be loaded, by path
+    """
+    from certificate2 import _CertFactory  # prevent circular deps
+    return _CertFactory(cache_dir).create_from_directory(path, kind, workers)
+
+
 def parse_tags(tag_str):
     """
     Split a comma separated list of tags from a certificate into a list.
@@ -113,6 +138,17 @@ def get_datetime_from_x509(date):
     return dt(*tm)
 
 
+EPOCH = dt(1970, 1, 1, tzinfo=UTC())
+
+
+def get_datetime_from_epoch(seconds):
+    """
+    Convert seconds since the epoch, such as the validity bounds returned by
+    the X509 objects of rhsm._certificate, to a UTC datetime.
+    """
+    return EPOCH + timedelta(seconds=seconds)
+
+
 def deprecated(func):
     """
     A decorator that marks a function as deprecated. This will cause a
@@ -152,6 +188,7 @@ class Certificate(object):
             x509 = X509.X509()
         self.__ext = Extensions(x509)
         self.x509 = x509
+        self._valid_range = None
 
         self._parse_subject()
         self.serial = self.x509.get_serial_number()
@@ -208,8 +245,13 @@ class Certificate(object):
         @return: The valid date range.
         @rtype: L{DateRange}
         """
-        return DateRange(get_datetime_from_x509(self.x509.get_not_before()),
-                get_datetime_from_x509(self.x509.get_not_after()))
+        # parsing the dates is slow, and this is called for every comparison
+        # when sorting certificates
+        if self._valid_range is None:
+            self._valid_range = DateRange(
+                    get_datetime_from_x509(self.x509.get_not_before()),
+                    get_datetime_from_x509(self.x509.get_not_after()))
+        return self._valid_range
 
     def valid(self, on_date=None):
         """
@@ -672,9 +714,24 @@ class GMT(tzinfo):
         return timedelta(seconds=0)
 
 
+def _oid_sort_key(item):
+    """
+    Order (OID, value) items numerically by OID parts.
+    """
+    key = []
+    for part in item[0].part:
+        if part.isdigit():
+            key.append((0, int(part)))
+        else:
+            key.append((1, part))
+    return key
+
+
 class Extensions(dict):
     """
     Represents x.509 (v3) I{custom} extensions.
+    Lookups walk a trie of the OID parts, built on first use and
+    discarded whenever the extensions are modified.
     """
 
     def __init__(self, x509):
@@ -682,6 +739,7 @@ class Extensions(dict):
         @param x509: An m2crypto X509 object or dict.
         @type x509: L{X509}
         """
+        self._trie = None
         if isinstance(x509, dict):
             self.update(x509)
         else:
@@ -709,6 +767,11 @@ class Extensions(dict):
         @return: The value of the first extension matched.
         @rtype: str
         """
+        if isinstance(oid, str):
+            oid = OID(oid)
+        part = oid.part
+        if part and part[0] and part[-1] and OID.WILDCARD not in part:
+            return dict.get(self, oid, default)
         ext = self.find(oid, 1, True)
         if ext:
             return ext[0][1]
@@ -723,29 +786,32 @@ class Extensions(dict):
         @type oid: str|L{OID}
         @param limit: Limit the number returned, 0=unlimited
         @type limit: int
+        @param ignoreOrder: Skip sorting the matches by OID.
         @type ignoreOrder: bool
         @return: A list of matching items.
         @rtype: (OID, value)
         @see: OID.match()
         """
-        ext = []
-        found = 0
         if isinstance(oid, str):
             oid = OID(oid)
-
-        # Only order the keys if we want more than a singel return avalue
-        if ignoreOrder:
-            keyset = self.keys()
+        matches = self._match(oid.part)
+        if matches is None:
+            matches = self._scan(oid)
         else:
-            keyset = sorted(self.keys())
+            matches = ((OID(part), v) for part, v in matches)
 
-        for k in keyset:
-            if k.match(oid):
-                v = self[k]
-                ext.append((k, v))
-                found = found + 1
-            if limit and found == limit:
-                break
+        ext = []
+        if ignoreOrder:
+            # Stop walking as soon as we have enough
+            for item in matches:
+                ext.append(item)
+                if limit and len(ext) == limit:
+                    break
+            return ext
+
+        ext = sorted(matches, key=_oid_sort_key)
+        if limit:
+            ext = ext[:limit]
         return ext
 
     def branch(self, root):
@@ -762,38 +828,152 @@ class Extensions(dict):
         if root[-1]:
             root = root.append('')
         ln = len(root) - 1
-        for oid, v in self.find(root):
-            trimmed = oid.ltrim(ln)
-            d[trimmed] = v
-        return Extensions(d)
+        matches = self._match(root.part)
+        if matches is None:
+            for oid, v in self._scan(root):
+                d[oid.ltrim(ln)] = v
+            return Extensions(d)
+
+        for part, v in matches:
+            d[OID(part[ln:])] = v
+        subtree = Extensions(d)
+        if root[0] and OID.WILDCARD not in root.part:
+            # The subtree of the root node is exactly the trie of the
+            # branch, so share it rather than building another.
+            subtree._trie = self._node(root.part[:-1])
+        return subtree
+
+    def _build(self):
+        """
+        Build the trie of OID parts. Every node is a list of:
+        [children by part, has value, value].
+        """
+        root = [{}, False, None]
+        for oid, v in self.items():
+            node = root
+            for part in oid.part:
+                children = node[0]
+                child = children.get(part)
+                if child is None:
+                    child = children[part] = [{}, False, None]
+                node = child
+            node[1] = True
+            node[2] = v
+        self._trie = root
+        return root
+
+    def _node(self, part):
+        """
+        Get the trie node of an OID without wildcards.
+        @param part: The OID parts.
+        @type part: [str,]
+        @return: The node, or None when nothing lies under it.
+        """
+        node = self._trie or self._build()
+        for p in part:
+            node = node[0].get(p)
+            if node is None:
+                return None
+        return node
+
+    def _match(self, part):
+        """
+        Walk the trie for a full (1.*.3) or prefix (1.*.3.) pattern.
+        @param part: The pattern parts.
+        @type part: [str,]
+        @return: A generator of (parts, value), or None when the
+            pattern can only be matched by scanning.
+        """
+        if not part or not part[0]:
+            return None
+        prefix = not part[-1]
+        if prefix:
+            part = part[:-1]
+        node = self._trie or self._build()
+        return self._walk(node, part, 0, [], prefix)
+
+    def _walk(self, node, pattern, depth, path, prefix):
+        if depth == len(pattern):
+            if prefix:
+                for item in self._subtree(node, path):
+                    yield item
+            elif node[1]:
+                yield (path, node[2])
+            return
+        want = pattern[depth]
+        children = node[0]
+        if want == OID.WILDCARD:
+            items = children.items()
+        else:
+            child = children.get(want)
+            if child is None:
+                return
+            items = ((want, child),)
+        for p, child in items:
+            for item in self._walk(child, pattern, depth + 1, path + [p],
+                    prefix):
+                yield item
+
+    def _subtree(self, node, path):
+        stack = [(node, path)]
+        while stack:
+            node, path = stack.pop()
+            if node[1]:
+                yield (path, node[2])
+            for p, child in node[0].items():
+                stack.append((child, path + [p]))
+
+    def _scan(self, oid):
+        """
+        Match every key against the I{oid}, for patterns the trie
+        cannot walk such as suffix matches (.5.6).
+        """
+        for k, v in self.items():
+            if k.match(oid):
+                yield (k, v)
+
+    def __setitem__(self, key, value):
+        self._trie = None
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._trie = None
+        dict.__delitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        self._trie = None
+        dict.update(self, *args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self._trie = None
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *default):
+        self._trie = None
+        return dict.pop(self, key, *default)
 
-    def _get_extensions_block(self, x509):
-        """ Isolate the block of text with the extensions. """
-        text = x509.as_text()
-        p = Popen(['openssl', 'x509', '-text', '-certopt', 'ext_parse'],
-                stdout=PIPE, stdin=PIPE, stderr=STDOUT)
-        text = p.communicate(input=x509.as_pem())[0]
+    def popitem(self):
+        self._trie = None
+        return dict.popitem(self)
 
-        start = text.find('extensions:')
-        end = text.rfind('Signature Algorithm:')
-        text = text[start:end]
-        return [s.strip() for s in text.split('\n')]
+    def clear(self):
+        self._trie = None
+        dict.clear(self)
 
     def _parse(self, x509):
         """
         Parse the extensions section. Expects an m2crypto X509 object.
         """
-        oid = None
-        for entry in self._get_extensions_block(x509):
-            if oid is not None:
-                m = VALUE_PATTERN.match(entry)
-                self[oid] = m.group(2).strip()
-                oid = None
-                continue
-            m = OID_PATTERN.match(entry)
-            if m is None:
-                continue
-            oid = OID(entry[:-1])
+        # Read through our C module rather than m2crypto, which assumes
+        # extension values are printable. Extensions openssl knows by name
+        # have never been included here.
+        cert = _certificate.load(data=x509.as_der())
+        if cert is None:
+            return
+        for oid, value in cert.get_extensions(named=False):
+            oid = OID(oid)
+            if oid not in self:
+                self[oid] = value
 
     def __str__(self):
         s = []
@@ -805,14 +985,24 @@ class Extensions(dict):
 class OID(object):
     """
     The Object Identifier object.
+    OIDs are immutable and interned: constructing an OID equal to one
+    already in use returns the existing object.
     @ivar part: The oid parts.
-    @type part: [str,]
+    @type part: (str,)
     @cvar WILDCARD: The wildcard character.
     @type WILDCARD: str
     """
 
+    __slots__ = ('part', '_str', '_hash')
+
     WILDCARD = '*'
 
+    # Interned OIDs by string. Certificates share most of their OIDs, so
+    # this stays small; it is simply emptied if it ever grows past the
+    # limit.
+    _interned = {}
+    INTERN_LIMIT = 10000
+
     @classmethod
     def join(cls, *oid):
         return '.'.join(oid)
@@ -828,19 +1018,38 @@ class OID(object):
         """
         return s.split('.')
 
-    def __init__(self, oid):
+    def __new__(cls, oid):
         """
         @param oid: The OID value.
         @type oid: str|[str,]
         """
         if isinstance(oid, str):
-            self.part = self.split(oid)
+            key = s = oid
+        else:
+            s = '.'.join(oid)
+            key = s
+            if not oid:
+                # No parts at all, unlike '' which is one empty part
+                key = ()
+        interned = cls._interned
+        self = interned.get(key)
+        if self is not None:
+            return self
+
+        self = object.__new__(cls)
+        if key == ():
+            self.part = ()
         else:
-            self.part = oid
+            self.part = tuple([intern(part) for part in cls.split(s)])
+        self._str = s
+        self._hash = hash(s)
+        if len(interned) >= cls.INTERN_LIMIT:
+            interned.clear()
+        interned[key] = self
+        return self
 
-        self._len = None
-        self._str = None
-        self._hash = None
+    def __reduce__(self):
+        return (OID, (self._str,))
 
     def parent(self):
         """
@@ -882,8 +1091,7 @@ class OID(object):
         """
         if isinstance(oid, str):
             oid = OID(oid)
-        part = self.part + oid.part
-        return OID(part)
+        return OID(self.part + oid.part)
 
     def match(self, oid):
         """
@@ -897,16 +1105,15 @@ class OID(object):
         @type oid: L{OID}
         @return: True if matched
         """
-        i = 0
+        if isinstance(oid, OID):
+            oid = oid.part
 
         # Matching the end
         if not oid[0]:
-            #oid = OID(oid[1:])
             oid = oid[1:]
             parts = self.part[-len(oid):]
         # Matching the beginning
         elif not oid[-1]:
-            #oid = OID(oid[:-1])
             oid = oid[:-1]
             parts = self.part[:len(oid)]
         # Full on match
@@ -917,6 +1124,7 @@ class OID(object):
         if len(parts) != len(oid):
             return False
 
+        i = 0
         for x in parts:
             val = oid[i]
             if (x == val or val == self.WILDCARD):
@@ -927,30 +1135,28 @@ class OID(object):
         return True
 
     def __len__(self):
-        if not self._len:
-            self._len = len(self.part)
-
-        return self._len
+        return len(self.part)
 
     def __getitem__(self, index):
         return self.part[index]
 
     def __repr__(self):
-        return str(self)
+        return self._str
 
     def __hash__(self):
-        if not self._hash:
-            self._hash = hash(str(self))
-
         return self._hash
 
     def __eq__(self, other):
-        return (str(self) == str(other))
+        if self is other:
+            return True
+        if isinstance(other, OID):
+            return self._str == other._str
+        return self._str == str(other)
 
-    def __str__(self):
-        if not self._str:
-            self._str = '.'.join(self.part)
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
+    def __str__(self):
         return self._str
 
 
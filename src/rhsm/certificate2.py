@@ -14,11 +14,17 @@
 #
 
 import base64
+import bisect
+import calendar
+import cPickle
+import hashlib
 import logging
 import os
 import posixpath
-import re
+import tempfile
+import threading
 import zlib
+from Queue import Queue, Empty
 
 log = logging.getLogger(__name__)
 
@@ -28,8 +34,9 @@ from rhsm import _certificate
 
 from rhsm.connection import safe_int
 from rhsm.certificate import Extensions, OID, DateRange, GMT, \
-        get_datetime_from_x509, parse_tags, CertificateException
-from rhsm.pathtree import PathTree
+        get_datetime_from_epoch, parse_tags, CertificateException
+from rhsm.pathtree import PathIndex, PathTree
+from rhsm.utils import init_ssl_threading
 from rhsm import ourjson as json
 
 REDHAT_OID_NAMESPACE = "1.3.6.1.4.1.2312.9"
@@ -44,6 +51,37 @@ PRODUCT_CERT = 1
 ENTITLEMENT_CERT = 2
 IDENTITY_CERT = 3
 
+CERT_PEM_HEADER = "-----BEGIN CERTIFICATE-----"
+
+# Default number of threads loading certificates from a directory:
+DIRECTORY_WORKERS = 4
+
+# Unicode strings from v3 payloads shared by _intern, emptied when it reaches
+# the limit:
+_interned_unicode = {}
+INTERN_LIMIT = 10000
+
+
+def _intern(value):
+    """
+    Share one copy of a string that repeats across content sets and
+    certificates, such as a content type, vendor, arch or tag.
+
+    :param value:   the string, or any other value which is returned as is
+    :return:        an equal string, shared with previous calls
+    """
+    if isinstance(value, str):
+        return intern(value)
+    if isinstance(value, unicode):
+        if len(_interned_unicode) >= INTERN_LIMIT:
+            _interned_unicode.clear()
+        return _interned_unicode.setdefault(value, value)
+    return value
+
+
+def _intern_all(values):
+    return [_intern(value) for value in values]
+
 
 class _CertFactory(object):
     """
@@ -58,12 +96,104 @@ class _CertFactory(object):
     certificate.py instead of this class.
     """
 
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir:   optional directory where decoded entitlement
+                            certificates are cached between processes. See
+                            CertificateCache.
+        :type  cache_dir:   str
+        """
+        self.cache = None
+        if cache_dir:
+            self.cache = CertificateCache(cache_dir)
+
     def create_from_file(self, path):
         """
         Create appropriate certificate object from a PEM file on disk.
         """
-        pem = open(path, 'r').read()
-        return self._read_x509(_certificate.load(path), path, pem)
+        # read the file once, and parse the X509 from the same string
+        f = open(path, 'r')
+        try:
+            pem = f.read()
+        finally:
+            f.close()
+        if self.cache:
+            cert = self.cache.get(path, pem)
+            if cert is not None:
+                return cert
+        cert = self._read_x509(_certificate.load(data=pem), path, pem)
+        if self.cache:
+            self.cache.put(path, pem, cert)
+        return cert
+
+    def create_from_directory(self, path, kind=None, workers=None):
+        """
+        Create certificate objects from every PEM file in a directory,
+        skipping keys. Files are loaded by a pool of threads.
+
+        :param path:    directory to load certificates from
+        :type  path:    str
+        :param kind:    if given, only certificates of this type are
+                        returned, others are reported as errors: one of
+                        PRODUCT_CERT, ENTITLEMENT_CERT or IDENTITY_CERT
+        :type  kind:    int
+        :param workers: number of threads, DIRECTORY_WORKERS by default
+        :type  workers: int
+        :return:        tuple of a dict of certificates by serial, and a
+                        dict of the exception raised for each file that
+                        could not be loaded, by path
+        :rtype:         tuple
+        """
+        if workers is None:
+            workers = DIRECTORY_WORKERS
+        pem_paths = [os.path.join(path, name) for name in
+                     sorted(os.listdir(path)) if name.endswith('.pem') and
+                     not name.endswith('-key.pem')]
+
+        results = {}
+        queue = Queue()
+        for pem_path in pem_paths:
+            queue.put(pem_path)
+
+        def load():
+            while True:
+                try:
+                    pem_path = queue.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[pem_path] = self.create_from_file(pem_path)
+                except Exception, e:
+                    results[pem_path] = e
+
+        # before the threads parse certificates with OpenSSL
+        init_ssl_threading()
+        threads = [threading.Thread(target=load) for i in
+                   range(max(1, min(workers, len(pem_paths))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        cert_class = None
+        if kind is not None:
+            cert_class = CERT_CLASSES[kind]
+        certs = {}
+        errors = {}
+        for pem_path in pem_paths:
+            cert = results[pem_path]
+            if isinstance(cert, Exception):
+                errors[pem_path] = cert
+            elif cert_class and cert.__class__ is not cert_class:
+                errors[pem_path] = CertificateException(
+                        "%s is not a %s" % (pem_path, cert_class.__name__))
+            elif cert.serial in certs:
+                errors[pem_path] = CertificateException(
+                        "%s has the same serial as %s" %
+                        (pem_path, certs[cert.serial].path))
+            else:
+                certs[cert.serial] = cert
+        return certs, errors
 
     def create_from_pem(self, pem, path=None):
         """
@@ -73,15 +203,48 @@ class _CertFactory(object):
             raise CertificateException("Empty certificate")
         return self._read_x509(_certificate.load(pem=pem), path, pem)
 
+    def create_many_from_pem(self, pem):
+        """
+        Create certificate objects for every certificate in a bundle of
+        concatenated PEM certificates, parsing all of their X509 data in one
+        call. Other PEM blocks after a certificate, such as the entitlement
+        data of a v3 certificate, belong to that certificate.
+
+        :return:    list of certificates, in the order they were in the bundle
+        """
+        if not pem:
+            return []
+        # the C module reads buffers, not unicode
+        if isinstance(pem, unicode):
+            pem = pem.encode('ascii')
+        try:
+            x509s = _certificate.load_all(data=pem)
+        except ValueError, e:
+            raise CertificateException("Error loading certificates: %s" % e)
+
+        starts = []
+        start = pem.find(CERT_PEM_HEADER)
+        while start != -1:
+            starts.append(start)
+            start = pem.find(CERT_PEM_HEADER, start + 1)
+        if len(starts) != len(x509s):
+            raise CertificateException("Error loading certificates: found "
+                    "%d certificate headers but parsed %d certificates" %
+                    (len(starts), len(x509s)))
+
+        certs = []
+        ends = starts[1:] + [len(pem)]
+        for x509, start, end in zip(x509s, starts, ends):
+            certs.append(self._read_x509(x509, None, pem[start:end]))
+        return certs
+
     def _read_x509(self, x509, path, pem):
         if not x509:
             raise CertificateException("Error loading certificate")
         # Load the X509 extensions so we can determine what we're dealing with:
         try:
-            extensions = _Extensions2(x509)
-            redhat_oid = OID(REDHAT_OID_NAMESPACE)
-            # Trim down to only the extensions in the Red Hat namespace:
-            extensions = extensions.ltrim(len(redhat_oid))
+            # Only the extensions in the Red Hat namespace, relative to it:
+            extensions = _Extensions2(x509, REDHAT_OID_NAMESPACE)
             # Check the certificate version, absence of the extension implies v1.0:
             cert_version_str = "1.0"
             if EXT_CERT_VERSION in extensions:
@@ -119,14 +282,20 @@ class _CertFactory(object):
     def _read_subject(self, x509):
         return x509.get_subject()
 
+    def _read_start(self, x509):
+        return get_datetime_from_epoch(x509.get_not_before_epoch())
+
+    def _read_end(self, x509):
+        return get_datetime_from_epoch(x509.get_not_after_epoch())
+
     def _create_identity_cert(self, version, extensions, x509, path):
         cert = IdentityCertificate(
                 x509=x509,
                 path=path,
                 version=version,
                 serial=x509.get_serial_number(),
-                start=get_datetime_from_x509(x509.get_not_before()),
-                end=get_datetime_from_x509(x509.get_not_after()),
+                start=self._read_start(x509),
+                end=self._read_end(x509),
                 alt_name=self._read_alt_name(x509),
                 subject=self._read_subject(x509),
                 issuer=self._read_issuer(x509),
@@ -140,8 +309,8 @@ class _CertFactory(object):
                 path=path,
                 version=version,
                 serial=x509.get_serial_number(),
-                start=get_datetime_from_x509(x509.get_not_before()),
-                end=get_datetime_from_x509(x509.get_not_after()),
+                start=self._read_start(x509),
+                end=self._read_end(x509),
                 products=products,
                 subject=self._read_subject(x509),
                 issuer=self._read_issuer(x509),
@@ -158,8 +327,8 @@ class _CertFactory(object):
                 path=path,
                 version=version,
                 serial=x509.get_serial_number(),
-                start=get_datetime_from_x509(x509.get_not_before()),
-                end=get_datetime_from_x509(x509.get_not_after()),
+                start=self._read_start(x509),
+                end=self._read_end(x509),
                 subject=self._read_subject(x509),
                 order=order,
                 content=content,
@@ -251,17 +420,11 @@ class _CertFactory(object):
         except IndexError:
             entitlement_data = None
 
+        # The payload is only decompressed, and its order, content, products
+        # and pool only built, when the certificate is first asked for them.
+        payload = None
         if entitlement_data:
-            payload = self._decompress_payload(base64.b64decode(entitlement_data))
-            order = self._parse_v3_order(payload)
-            content = self._parse_v3_content(payload)
-            products = self._parse_v3_products(payload)
-            pool = self._parse_v3_pool(payload)
-        else:
-            order = None
-            content = None
-            products = None
-            pool = None
+            payload = base64.b64decode(entitlement_data)
 
         cert = EntitlementCertificate(
                 x509=x509,
@@ -269,13 +432,10 @@ class _CertFactory(object):
                 version=version,
                 extensions=extensions,
                 serial=x509.get_serial_number(),
-                start=get_datetime_from_x509(x509.get_not_before()),
-                end=get_datetime_from_x509(x509.get_not_after()),
+                start=self._read_start(x509),
+                end=self._read_end(x509),
                 subject=self._read_subject(x509),
-                order=order,
-                content=content,
-                products=products,
-                pool=pool,
+                payload=payload,
                 pem=pem,
                 issuer=self._read_issuer(x509),
             )
@@ -371,6 +531,207 @@ class _CertFactory(object):
                     "certificate payload.")
 
 
+class CertificateCache(object):
+    """
+    Keeps decoded entitlement certificates on disk, so that processes which
+    load the same certificates over and over can skip parsing the
+    extensions, decompressing the payload and decoding the path tree.
+
+    There is one cache file per certificate file path. Each one records the
+    mtime, size and sha256 of the PEM it was made from, and is only used if
+    all of them still match, so a changed certificate is simply parsed
+    again. The files are pickled, so the cache directory must only be
+    writable by the user loading the certificates; files owned by anyone
+    else are ignored.
+    """
+
+    # bump this whenever the layout of the cached data changes
+    VERSION = 1
+
+    ORDER_FIELDS = ('name', 'number', 'sku', 'subscription', 'quantity',
+            'virt_limit', 'socket_limit', 'contract', 'quantity_used',
+            'warning_period', 'account', 'provides_management',
+            'service_level', 'service_type', 'stacking_id', 'virt_only',
+            'ram_limit', 'core_limit')
+    PRODUCT_FIELDS = ('id', 'name', 'version', 'architectures',
+            'provided_tags', 'brand_type')
+    CONTENT_FIELDS = ('content_type', 'name', 'label', 'vendor', 'url', 'gpg',
+            'enabled', 'metadata_expire', 'required_tags', 'arches')
+    POOL_FIELDS = ('id',)
+
+    def __init__(self, cache_dir):
+        """
+        :param cache_dir:   directory to keep cache files in, created if it
+                            does not exist yet
+        :type  cache_dir:   str
+        """
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, path):
+        name = hashlib.sha256(os.path.abspath(path)).hexdigest()
+        return os.path.join(self.cache_dir, '%s.v%d' % (name, self.VERSION))
+
+    @staticmethod
+    def _key(path, pem):
+        """
+        :return:    tuple: (mtime, size, sha256 of the PEM)
+        """
+        stat = os.stat(path)
+        return (stat.st_mtime, stat.st_size, hashlib.sha256(pem).hexdigest())
+
+    def get(self, path, pem):
+        """
+        :param path:    path of the certificate file
+        :type  path:    str
+        :param pem:     contents of the certificate file
+        :type  pem:     str
+        :return:        the cached certificate, or None if there is no
+                        up to date cache for the file
+        :rtype:         rhsm.certificate2.EntitlementCertificate
+        """
+        cache_path = self._cache_path(path)
+        try:
+            f = open(cache_path, 'rb')
+            try:
+                stat = os.fstat(f.fileno())
+                if stat.st_uid != os.getuid():
+                    log.warn("Ignoring cache file not owned by us: %s" %
+                            cache_path)
+                    return None
+                key, data = cPickle.load(f)
+            finally:
+                f.close()
+        except (IOError, OSError):
+            return None
+        except Exception, e:
+            log.warn("Ignoring unreadable cache file %s: %s" % (cache_path, e))
+            return None
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        # cheap checks first, the hash only needs computing if these match
+        if key[:2] != (stat.st_mtime, stat.st_size) or \
+                key[2] != hashlib.sha256(pem).hexdigest():
+            return None
+        return self._load(data, path, pem)
+
+    def put(self, path, pem, cert):
+        """
+        Caches a certificate that was just created from the given file. Only
+        entitlement certificates are cached. Failing to write the cache is
+        logged and otherwise ignored.
+
+        :param path:    path of the certificate file
+        :type  path:    str
+        :param pem:     contents of the certificate file
+        :type  pem:     str
+        :param cert:    certificate created from pem
+        :type  cert:    rhsm.certificate2.Certificate
+        """
+        if not isinstance(cert, EntitlementCertificate):
+            return
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0700)
+            record = (self._key(path, pem), self._dump(cert))
+            # write to a temporary file and rename it into place, so that
+            # other processes never see a partially written file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            try:
+                f = os.fdopen(fd, 'wb')
+                try:
+                    cPickle.dump(record, f, cPickle.HIGHEST_PROTOCOL)
+                finally:
+                    f.close()
+                os.rename(tmp_path, self._cache_path(path))
+            except:
+                os.unlink(tmp_path)
+                raise
+        except Exception, e:
+            log.warn("Unable to cache certificate %s: %s" % (path, e))
+
+    @staticmethod
+    def _fields(obj, fields):
+        if obj is None:
+            return None
+        return dict((field, getattr(obj, field)) for field in fields)
+
+    def _dump(self, cert):
+        """
+        :return:    the state of an entitlement certificate as plain python
+                    types
+        :rtype:     dict
+        """
+        data = {
+            'version': str(cert.version),
+            'serial': cert.serial,
+            'start': cert.start,
+            'end': cert.end,
+            'subject': cert.subject,
+            'issuer': cert.issuer,
+            'has_pem': cert.pem is not None,
+            'extensions': dict((str(oid), value) for oid, value in
+                               cert.extensions.items()),
+            'order': self._fields(cert.order, self.ORDER_FIELDS),
+            'pool': self._fields(cert.pool, self.POOL_FIELDS),
+            'products': None,
+            'content': None,
+            'path_tree': None,
+        }
+        if cert.products is not None:
+            data['products'] = [self._fields(product, self.PRODUCT_FIELDS)
+                                for product in cert.products]
+        if cert.content is not None:
+            data['content'] = [self._fields(content, self.CONTENT_FIELDS)
+                               for content in cert.content]
+        if cert.version.major >= 3 and EXT_ENT_PAYLOAD in cert.extensions:
+            data['path_tree'] = cert._path_tree.compiled()
+        return data
+
+    def _load(self, data, path, pem):
+        """
+        Recreates an entitlement certificate from the output of _dump.
+        """
+        products = data['products']
+        if products is not None:
+            products = [Product(**fields) for fields in products]
+        content = data['content']
+        if content is not None:
+            content = [Content(**fields) for fields in content]
+        order = data['order']
+        if order is not None:
+            order = Order(**order)
+        pool = data['pool']
+        if pool is not None:
+            pool = Pool(**pool)
+        extensions = Extensions(dict((OID(oid), value) for oid, value in
+                                     data['extensions'].items()))
+
+        cert = EntitlementCertificate(
+                x509=None,
+                path=path,
+                version=Version(data['version']),
+                extensions=extensions,
+                serial=data['serial'],
+                start=data['start'],
+                end=data['end'],
+                subject=data['subject'],
+                order=order,
+                content=content,
+                products=products,
+                pool=pool,
+                pem=data['has_pem'] and pem or None,
+                issuer=data['issuer'],
+            )
+        # the X509 object is only loaded if something asks for it
+        cert._x509_pem = pem
+        if data['path_tree'] is not None:
+            cert._path_tree_object = PathTree.from_compiled(data['path_tree'])
+        return cert
+
+
 class Version(object):
     """ Small wrapper for version string comparisons. """
     def __init__(self, version_str):
@@ -391,21 +752,82 @@ class Version(object):
 
 class _Extensions2(Extensions):
 
+    def __init__(self, x509, namespace=None):
+        """
+        :param x509:        X509 object from the C wrapper, or a dict
+        :param namespace:   if given, only the extensions under this OID are
+                            read, with it trimmed off their OIDs
+        :type  namespace:   str
+        """
+        self._namespace = namespace
+        Extensions.__init__(self, x509)
+
     def _parse(self, x509):
         """
         Override parent method for an X509 object from the new C wrapper.
         """
-        extensions = x509.get_all_extensions()
-        for (key, value) in extensions.items():
+        for (key, value) in x509.get_extensions(self._namespace):
             oid = OID(key)
-            self[oid] = value
+            # if an oid is repeated, the first value wins
+            if oid not in self:
+                self[oid] = value
+
 
+class _Slots(object):
+    """
+    Base of the certificate and model classes, which keep their attributes in
+    __slots__ rather than a dict per object. Pickles them with any protocol,
+    as was possible before.
+    """
+    __slots__ = ()
 
-class Certificate(object):
+    def _slots(self):
+        """
+        :return:    the slot descriptors of every class of this object
+        :rtype:     list of (name, descriptor)
+        """
+        slots = []
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name != '__weakref__':
+                    slots.append((name, cls.__dict__[name]))
+        return slots
+
+    def __getstate__(self):
+        # Read the slots through their descriptors, as a subclass may
+        # override one with a property, such as EntitlementCertificate's
+        # payload sections.
+        slots = {}
+        for name, slot in self._slots():
+            try:
+                slots[name] = slot.__get__(self, type(self))
+            except AttributeError:
+                pass
+        return (getattr(self, '__dict__', None), slots)
+
+    def __setstate__(self, state):
+        attributes, slots = state
+        if attributes:
+            self.__dict__.update(attributes)
+        descriptors = dict(self._slots())
+        for name, value in slots.items():
+            descriptors[name].__set__(self, value)
+
+
+class Certificate(_Slots):
     """ Parent class of all x509 certificate types. """
+
+    __slots__ = ('_x509_pem', '_x509', 'path', 'version', 'serial', 'start',
+                 'end', 'valid_range', 'pem', 'subject', 'issuer',
+                 '__weakref__')
+
     def __init__(self, x509=None, path=None, version=None, serial=None, start=None,
             end=None, subject=None, pem=None, issuer=None):
 
+        # PEM to load the X509 object from when it is first needed, used
+        # when the certificate was restored from a CertificateCache
+        self._x509_pem = None
+
         # The X509 M2crypto object for this certificate.
         # WARNING: May be None in tests
         self.x509 = x509
@@ -432,6 +854,16 @@ class Certificate(object):
         self.subject = subject
         self.issuer = issuer
 
+    def _get_x509(self):
+        if self._x509 is None and self._x509_pem is not None:
+            self._x509 = _certificate.load(data=self._x509_pem)
+        return self._x509
+
+    def _set_x509(self, x509):
+        self._x509 = x509
+
+    x509 = property(_get_x509, _set_x509)
+
     def is_valid(self, on_date=None):
         gmt = datetime.utcnow()
         if on_date:
@@ -478,12 +910,18 @@ class Certificate(object):
 
 
 class IdentityCertificate(Certificate):
+
+    __slots__ = ('alt_name', )
+
     def __init__(self, alt_name=None, **kwargs):
         Certificate.__init__(self, **kwargs)
         self.alt_name = alt_name
 
 
 class ProductCertificate(Certificate):
+
+    __slots__ = ('products', )
+
     def __init__(self, products=None, **kwargs):
         Certificate.__init__(self, **kwargs)
 
@@ -494,16 +932,143 @@ class ProductCertificate(Certificate):
         self.products = products
 
 
+def _payload_section(name):
+    """
+    Property for a section of an EntitlementCertificate's v3 payload, which
+    is built the first time it is read.
+    """
+    def get(self):
+        if name not in self._sections:
+            self._sections[name] = self._parse_payload_section(name)
+        return self._sections[name]
+
+    def set(self, value):
+        self._sections[name] = value
+        self._indexes = {}
+
+    return property(get, set)
+
+
+def _index(items, keys):
+    """
+    Index items by each of their keys, keeping the order of the items.
+
+    :param items:   items to index
+    :param keys:    function returning the keys of an item
+    :return:        dict of lists of items, by key
+    :rtype:         dict
+    """
+    index = {}
+    for item in items:
+        for key in keys(item):
+            index.setdefault(key, []).append(item)
+    return index
+
+
+def _content_label(content):
+    return (content.label, )
+
+
+def _content_tags(content):
+    return content.required_tags
+
+
+def _content_arches(content):
+    return content.arches
+
+
+def _product_id(product):
+    return (product.id, )
+
+
 class EntitlementCertificate(ProductCertificate):
 
-    def __init__(self, order=None, content=None, pool=None, extensions=None, **kwargs):
+    __slots__ = ('_sections', 'extensions', 'payload', '_payload_dict',
+                 '_path_tree_object', '_v1_urls', '_v1_index', '_indexes')
+
+    # Lookup indexes: the section each indexes, and a function returning the
+    # keys of an item of that section.
+    INDEXES = {
+        'label': ('content', _content_label),
+        'tag': ('content', _content_tags),
+        'arch': ('content', _content_arches),
+        'product': ('products', _product_id),
+    }
+
+    # v3 payload sections, and the _CertFactory methods that build them
+    PAYLOAD_SECTIONS = {
+        'order': '_parse_v3_order',
+        'content': '_parse_v3_content',
+        'products': '_parse_v3_products',
+        'pool': '_parse_v3_pool',
+    }
+
+    def __init__(self, order=None, content=None, pool=None, extensions=None,
+            payload=None, **kwargs):
+        """
+        :param payload: zlib compressed JSON entitlement data of a v3
+                        certificate. If given, the order, content, products
+                        and pool that are not passed in are built from it
+                        when first accessed.
+        :type  payload: str
+        """
+        self._sections = {}
+        self._indexes = {}
         ProductCertificate.__init__(self, **kwargs)
         self.order = order
         self.content = content
         self.pool = pool
         self.extensions = extensions
+
+        # the compressed entitlement data, and the decompressed JSON while
+        # sections remain to be built from it
+        self.payload = payload
+        self._payload_dict = None
+        if payload is not None:
+            passed = {'order': order, 'content': content, 'pool': pool,
+                      'products': kwargs.get('products')}
+            for name, value in passed.items():
+                if value is None:
+                    del self._sections[name]
         self._path_tree_object = None
 
+        # v1 certs list their download URLs as extensions. Find them once
+        # here, rather than scanning every extension on each check_path call.
+        self._v1_urls = []
+        if self.version is not None and self.version.major < 3 and extensions:
+            self._v1_urls = [oid_url for ext_oid, oid_url in
+                             extensions.iteritems() if
+                             ext_oid.match(OID('2.')) and
+                             ext_oid.match(OID('.1.6'))]
+        self._v1_index = None
+
+    order = _payload_section('order')
+    content = _payload_section('content')
+    products = _payload_section('products')
+    pool = _payload_section('pool')
+
+    def _parse_payload_section(self, name):
+        if self.payload is None:
+            if name == 'products':
+                return []
+            return None
+        factory = _CertFactory()
+        try:
+            if self._payload_dict is None:
+                self._payload_dict = factory._decompress_payload(self.payload)
+            section = getattr(factory, self.PAYLOAD_SECTIONS[name])(
+                    self._payload_dict)
+        except CertificateException:
+            raise
+        except Exception, e:
+            log.exception(e)
+            raise CertificateException("Error parsing certificate payload: %s"
+                    % e)
+        # the section being built now is not in self._sections yet
+        if len(self._sections) + 1 == len(self.PAYLOAD_SECTIONS):
+            self._payload_dict = None
+        return section
+
     @property
     def _path_tree(self):
         """
@@ -553,50 +1118,96 @@ class EntitlementCertificate(ProductCertificate):
         else:
             return self._path_tree.match_path(path)
 
+    def entitled_paths(self):
+        """
+        :return:    the content paths this certificate authorizes, which may
+                    contain variables such as "$releasever"
+        :rtype:     list of str
+        """
+        if self.version.major < 3:
+            return list(self._v1_urls)
+        return self._path_tree.paths()
+
     def _check_v1_path(self, path):
         """
         Check the requested path against a v1 certificate
 
+        The download URLs are compiled into a tree of path segments on first
+        use, where "$variable" segments (e.g. $basearch, $version) match any
+        one segment of the path. For example, the following entitlement:
+          content/dist/rhel/server/$version/$basearch/os
+
+        Should allow any value for the variables, such as:
+          content/dist/rhel/server/6/x86_64/os
+
         :param path:    requested path
         :type  path:    basestring
         :return:    True iff the path matches, else False
         :rtype:     bool
         """
-        path = path.strip('/')
-        valid = False
-        for ext_oid, oid_url in self.extensions.iteritems():
-            # if this is a download URL
-            if ext_oid.match(OID('2.')) and ext_oid.match(OID('.1.6')):
-                if self._validate_v1_url(oid_url, path):
-                    valid = True
-                    break
-        return valid
+        if self._v1_index is None:
+            index = PathIndex()
+            index.add_paths(self.serial, self._v1_urls)
+            self._v1_index = index
+        return self._v1_index.match_any(path)
 
-    @staticmethod
-    def _validate_v1_url(oid_url, dest):
+    def _lookup(self, name, key):
         """
-        Determines if the destination URL matches the OID's URL.
+        Look up a key in one of the INDEXES, built from the content or
+        products the first time it is used. Setting the content or products
+        discards the indexes.
 
-        Swaps out all $ variables (e.g. $basearch, $version) for a reg ex
-        wildcard in that location. For example, the following entitlement:
-          content/dist/rhel/server/$version/$basearch/os
+        :return:    list of matching items
+        :rtype:     list
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            section, keys = self.INDEXES[name]
+            index = _index(getattr(self, section) or [], keys)
+            self._indexes[name] = index
+        return index.get(key, [])
+
+    def get_content(self, label):
+        """
+        :param label:   content label, the repo ID
+        :type  label:   str
+        :return:        the content set with this label, or None
+        :rtype:         Content
+        """
+        found = self._lookup('label', label)
+        if found:
+            return found[0]
+        return None
 
-        Should allow any value for the variables:
-          content/dist/rhel/server/.+?/.+?/os
+    def get_product(self, product_id):
+        """
+        :param product_id:  ID of a product
+        :type  product_id:  str
+        :return:            the product with this ID, or None
+        :rtype:             Product
+        """
+        found = self._lookup('product', product_id)
+        if found:
+            return found[0]
+        return None
 
-        :param oid_url: path associated with an entitlement OID, as pulled from
-                        the cert's extensions.
-        :type  oid_url: basestring
-        :param dest:    path requested by a client
-        :type  dest:    basestring
+    def get_content_by_tag(self, tag):
+        """
+        :param tag: a tag, such as "rhel-6-server"
+        :type  tag: str
+        :return:    content sets requiring this tag
+        :rtype:     list of Content
+        """
+        return list(self._lookup('tag', tag))
 
-        :return: True iff the OID permits the destination else False
-        :rtype:  bool
+    def get_content_by_arch(self, arch):
         """
-        # Remove initial and trailing '/', and substitute the $variables for
-        # equivalent regular expressions in oid_url.
-        oid_re = re.sub(r'\$[^/]+(/|$)', '[^/]+/', oid_url.strip('/'))
-        return re.match(oid_re, dest) is not None
+        :param arch:    an architecture, such as "x86_64" or "ALL"
+        :type  arch:    str
+        :return:        content sets listing this arch
+        :rtype:         list of Content
+        """
+        return list(self._lookup('arch', arch))
 
     def delete(self):
         """
@@ -610,10 +1221,280 @@ class EntitlementCertificate(ProductCertificate):
         os.unlink(key_path)
 
 
-class Product(object):
+class EntitlementIndex(object):
+    """
+    Content and products of many entitlement certificates, such as those
+    returned by _CertFactory.create_from_directory, indexed across all of
+    them. Each index is built the first time it is used, and does not see
+    certificates changed afterwards.
+    """
+
+    def __init__(self, certs):
+        """
+        :param certs:   entitlement certificates, or a dict of them
+        :type  certs:   iterable of EntitlementCertificate
+        """
+        if isinstance(certs, dict):
+            certs = [certs[serial] for serial in sorted(certs)]
+        self.certs = list(certs)
+        self._indexes = {}
+
+    def _lookup(self, name, key):
+        index = self._indexes.get(name)
+        if index is None:
+            section, keys = EntitlementCertificate.INDEXES[name]
+            index = {}
+            for cert in self.certs:
+                for item in getattr(cert, section) or []:
+                    for item_key in keys(item):
+                        index.setdefault(item_key, []).append((cert, item))
+            self._indexes[name] = index
+        return list(index.get(key, []))
+
+    def get_content(self, label):
+        """
+        :param label:   content label, the repo ID
+        :type  label:   str
+        :return:        the certificates providing this content, with it
+        :rtype:         list of (EntitlementCertificate, Content)
+        """
+        return self._lookup('label', label)
+
+    def get_product(self, product_id):
+        """
+        :param product_id:  ID of a product
+        :type  product_id:  str
+        :return:            the certificates providing this product, with it
+        :rtype:             list of (EntitlementCertificate, Product)
+        """
+        return self._lookup('product', product_id)
+
+    def get_content_by_tag(self, tag):
+        """
+        :param tag: a tag, such as "rhel-6-server"
+        :type  tag: str
+        :return:    content sets requiring this tag, with their certificates
+        :rtype:     list of (EntitlementCertificate, Content)
+        """
+        return self._lookup('tag', tag)
+
+    def get_content_by_arch(self, arch):
+        """
+        :param arch:    an architecture, such as "x86_64" or "ALL"
+        :type  arch:    str
+        :return:        content sets listing this arch, with their
+                        certificates
+        :rtype:         list of (EntitlementCertificate, Content)
+        """
+        return self._lookup('arch', arch)
+
+
+def _epoch(date):
+    """
+    :param date:    a date taken as UTC whatever its timezone, as in
+                    Certificate.is_valid, or None for now
+    :type  date:    datetime
+    :return:        seconds since the epoch
+    :rtype:         float
+    """
+    if date is None:
+        date = datetime.utcnow()
+    return calendar.timegm(date.timetuple()) + date.microsecond / 1e6
+
+
+class _IntervalTree(object):
+    """
+    Centered interval tree, finding the intervals overlapping a range in
+    O(log n + k) time.
+    """
+
+    def __init__(self, intervals):
+        """
+        :param intervals:   (start, end, item) tuples, where start <= end
+        :type  intervals:   list
+        """
+        self.center = None
+        self.by_start = self.by_end = []
+        self.left = self.right = None
+        if not intervals:
+            return
+        points = []
+        for start, end, item in intervals:
+            points.append(start)
+            points.append(end)
+        points.sort()
+        self.center = center = points[len(points) / 2]
+
+        left = []
+        right = []
+        here = []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: interval[1],
+                             reverse=True)
+        if left:
+            self.left = _IntervalTree(left)
+        if right:
+            self.right = _IntervalTree(right)
+
+    def overlapping(self, low, high, found):
+        """
+        Append the items of the intervals overlapping [low, high] to found.
+        """
+        node = self
+        while node is not None and node.center is not None:
+            center = node.center
+            if high < center:
+                for start, end, item in node.by_start:
+                    if start > high:
+                        break
+                    found.append(item)
+                node = node.left
+            elif low > center:
+                for start, end, item in node.by_end:
+                    if end < low:
+                        break
+                    found.append(item)
+                node = node.right
+            else:
+                for start, end, item in node.by_start:
+                    found.append(item)
+                if node.left is not None and low < center:
+                    node.left.overlapping(low, high, found)
+                node = high > center and node.right or None
+
+
+class ValidityIndex(object):
+    """
+    The validity dates of many certificates, sorted so that those valid on a
+    date, overlapping a range of dates, ending within a range or expiring
+    can be found without checking every certificate. Like Certificate's
+    methods, dates are taken as UTC, and default to now.
+    """
+
+    def __init__(self, certs):
+        """
+        :param certs:   certificates, or a dict of them
+        :type  certs:   iterable of Certificate
+        """
+        if isinstance(certs, dict):
+            certs = [certs[serial] for serial in sorted(certs)]
+        self.certs = list(certs)
+
+        intervals = []
+        for position, cert in enumerate(self.certs):
+            intervals.append((_epoch(cert.valid_range.begin()),
+                              _epoch(cert.valid_range.end()), position))
+        self._tree = _IntervalTree(intervals)
+        intervals.sort(key=lambda interval: interval[1])
+        self._ends = [end for start, end, position in intervals]
+        self._by_end = [position for start, end, position in intervals]
+        self._end_rank = [0] * len(self.certs)
+        for rank, position in enumerate(self._by_end):
+            self._end_rank[position] = rank
+
+        # when each entitlement begins to expire, built when first needed as
+        # reading the warning period parses v3 payloads
+        self._warnings = None
+        self._by_warning = None
+
+    def _certs(self, positions):
+        """
+        :return:    the certificates at positions, ordered by end date
+        """
+        end_rank = self._end_rank
+        ranked = [(end_rank[position], position) for position in positions]
+        ranked.sort()
+        return [self.certs[position] for rank, position in ranked]
+
+    def valid_on(self, on_date=None):
+        """
+        :return:    certificates valid on the date, the first to end first
+        :rtype:     list of Certificate
+        """
+        when = _epoch(on_date)
+        found = []
+        self._tree.overlapping(when, when, found)
+        return self._certs(found)
+
+    def overlapping(self, start, end):
+        """
+        :return:    certificates valid at any time from start to end, the
+                    first to end first
+        :rtype:     list of Certificate
+        """
+        found = []
+        self._tree.overlapping(_epoch(start), _epoch(end), found)
+        return self._certs(found)
+
+    def ending_between(self, start, end):
+        """
+        :return:    certificates whose validity ends from start to end, such
+                    as those ending in the next N days, the first to end
+                    first
+        :rtype:     list of Certificate
+        """
+        low = bisect.bisect_left(self._ends, _epoch(start))
+        high = bisect.bisect_right(self._ends, _epoch(end))
+        return [self.certs[position] for position in self._by_end[low:high]]
+
+    def first_to_end(self, on_date=None):
+        """
+        :return:    the certificate valid on the date that ends first, or
+                    None
+        :rtype:     Certificate
+        """
+        valid = self.valid_on(on_date)
+        if valid:
+            return valid[0]
+        return None
+
+    def expiring(self, on_date=None):
+        """
+        :return:    entitlement certificates within their order's warning
+                    period of their end on the date, as is_expiring checks,
+                    the first to end first. Certificates without an order
+                    are never expiring.
+        :rtype:     list of EntitlementCertificate
+        """
+        if self._warnings is None:
+            warnings = []
+            for position, cert in enumerate(self.certs):
+                order = getattr(cert, 'order', None)
+                if order is None:
+                    continue
+                period = int(order.warning_period) * 24 * 60 * 60
+                warnings.append((_epoch(cert.valid_range.end()) - period,
+                                 position))
+            warnings.sort()
+            self._warnings = [warning for warning, position in warnings]
+            self._by_warning = [position for warning, position in warnings]
+        count = bisect.bisect_left(self._warnings, _epoch(on_date))
+        return self._certs(self._by_warning[:count])
+
+
+# Certificate classes for each type of certificate:
+CERT_CLASSES = {
+    PRODUCT_CERT: ProductCertificate,
+    ENTITLEMENT_CERT: EntitlementCertificate,
+    IDENTITY_CERT: IdentityCertificate,
+}
+
+
+class Product(_Slots):
     """
     Represents the product information from a certificate.
     """
+
+    __slots__ = ('id', 'name', 'version', 'architectures', 'provided_tags',
+                 'brand_type')
+
     def __init__(self, id=None, name=None, version=None, architectures=None,
             provided_tags=None, brand_type=None):
 
@@ -624,7 +1505,7 @@ class Product(object):
 
         self.id = id
         self.name = name
-        self.version = version
+        self.version = _intern(version)
 
         self.architectures = architectures
         # If this is sent in as a string split it, as the field
@@ -633,23 +1514,31 @@ class Product(object):
             self.architectures = parse_tags(self.architectures)
         if self.architectures is None:
             self.architectures = []
+        self.architectures = _intern_all(self.architectures)
 
         self.provided_tags = provided_tags
         if self.provided_tags is None:
             self.provided_tags = []
+        self.provided_tags = _intern_all(self.provided_tags)
 
-        self.brand_type = brand_type
+        self.brand_type = _intern(brand_type)
 
     def __eq__(self, other):
         return (self.id == other.id)
 
 
-class Order(object):
+class Order(_Slots):
     """
     Represents the order information for the subscription an entitlement
     originated from.
     """
 
+    __slots__ = ('name', 'number', 'sku', 'subscription', 'quantity',
+                 'quantity_used', 'virt_limit', 'stacking_id', 'socket_limit',
+                 'warning_period', 'contract', 'account',
+                 'provides_management', 'service_level', 'service_type',
+                 'virt_only', 'ram_limit', 'core_limit')
+
     def __init__(self, name=None, number=None, sku=None, subscription=None,
             quantity=None, virt_limit=None, socket_limit=None,
             contract=None, quantity_used=None, warning_period=None,
@@ -681,8 +1570,8 @@ class Order(object):
 
         self.provides_management = provides_management or False
 
-        self.service_level = service_level
-        self.service_type = service_type
+        self.service_level = _intern(service_level)
+        self.service_type = _intern(service_type)
 
         self.virt_only = virt_only or False
 
@@ -694,7 +1583,10 @@ class Order(object):
                 (self.name, self.number, self.sku)
 
 
-class Content(object):
+class Content(_Slots):
+
+    __slots__ = ('content_type', 'name', 'label', 'vendor', 'url', 'gpg',
+                 'enabled', 'metadata_expire', 'required_tags', 'arches')
 
     def __init__(self, content_type=None, name=None, label=None, vendor=None, url=None,
             gpg=None, enabled=None, metadata_expire=None, required_tags=None, arches=None):
@@ -702,12 +1594,12 @@ class Content(object):
         if (name is None) or (label is None):
             raise CertificateException("Content missing name/label")
 
-        self.content_type = content_type
+        self.content_type = _intern(content_type)
         self.name = name
         self.label = label
-        self.vendor = vendor
+        self.vendor = _intern(vendor)
         self.url = url
-        self.gpg = gpg
+        self.gpg = _intern(gpg)
 
         if not content_type:
             raise CertificateException("Content does not have a type set.")
@@ -723,9 +1615,9 @@ class Content(object):
             self.enabled = True
 
         self.metadata_expire = metadata_expire
-        self.required_tags = required_tags or []
+        self.required_tags = _intern_all(required_tags or [])
 
-        self.arches = arches or []
+        self.arches = _intern_all(arches or [])
 
     def __eq__(self, other):
         return isinstance(other, self.__class__) and (self.label == other.label)
@@ -738,10 +1630,13 @@ class Content(object):
         return hash(self.label)
 
 
-class Pool(object):
+class Pool(_Slots):
     """
     Represents the pool an entitlement originates from.
     """
+
+    __slots__ = ('id', )
+
     def __init__(self, id=None):
         if id is None:
             raise CertificateException("Pool is missing ID")
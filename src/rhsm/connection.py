@@ -17,23 +17,28 @@
 import base64
 import certificate
 import datetime
+import httplib
 import locale
 import logging
 import os
+import Queue
 import socket
 import sys
+import threading
 import time
 import urllib
+import weakref
 
-from M2Crypto import SSL, httpslib
+from M2Crypto import BIO, SSL, httpslib, m2
 from M2Crypto.SSL import SSLError
+from M2Crypto.SSL.Session import Session
 from urllib import urlencode
 
 from config import initConfig
 from version import Versions
 
 from rhsm import ourjson as json
-from rhsm.utils import get_env_proxy_info
+from rhsm.utils import get_env_proxy_info, init_ssl_threading
 
 # on EL5, there is a really long socket timeout. The
 # best thing we can do is set a process wide default socket timeout.
@@ -48,6 +53,20 @@ try:
 except ImportError:
     import email.Utils as eut
 
+# Defaults for the kept alive connections of a Restlib: how many to keep, for
+# how many seconds an idle connection may be reused, and how many requests to
+# make on one connection. The idle timeout is kept below the keep alive
+# timeouts servers commonly use.
+POOL_SIZE = 4
+POOL_IDLE_TIMEOUT = 15
+POOL_MAX_REQUESTS = 100
+
+# Number of SSL contexts kept by a ContextCache
+CONTEXT_CACHE_SIZE = 16
+
+# Default number of calls an AsyncUEPConnection makes at once
+MAX_WORKERS = POOL_SIZE
+
 
 class NullHandler(logging.Handler):
     def emit(self, record):
@@ -177,6 +196,11 @@ class ExpiredIdentityCertException(ConnectionException):
     pass
 
 
+class TimeoutException(ConnectionException):
+
+    pass
+
+
 class NoOpChecker:
 
     def __init__(self, host=None, peerCertHash=None, peerCertDigest='sha1'):
@@ -213,6 +237,568 @@ class RhsmProxyHTTPSConnection(httpslib.ProxyHTTPSConnection):
         msg = msg + "\r\n"
         return msg
 
+    def _start_ssl(self):
+        # ProxyHTTPSConnection does not offer the session given to
+        # set_session()
+        self.sock = SSL.Connection(self.ssl_ctx, self.sock)
+        self.sock.setup_ssl()
+        self.sock.set_connect_state()
+        if self.session is not None:
+            self.sock.set_session(self.session)
+        self.sock.connect_ssl()
+
+
+def close_connection(conn):
+    """
+    Close an HTTPS connection. M2Crypto's HTTPSConnection.close() leaves the
+    socket open for its response to use, so close the SSL connection too.
+    """
+    sock = conn.sock
+    conn.close()
+    conn.sock = None
+    if sock is not None:
+        try:
+            sock.close()
+        except Exception, e:
+            log.debug("Error closing connection: %s" % e)
+
+
+def _file_stats(paths):
+    """
+    :return:    the modification time and size of each path, None for those
+                that do not exist
+    :rtype:     tuple
+    """
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((st.st_mtime, st.st_size))
+        except (OSError, TypeError):
+            stats.append(None)
+    return tuple(stats)
+
+
+def _pem_files(directory):
+    """
+    :return:    the directory, and the PEM files in it
+    :rtype:     list of str
+    """
+    paths = [directory]
+    try:
+        names = os.listdir(directory)
+    except (OSError, TypeError):
+        return paths
+    names.sort()
+    for name in names:
+        if name.endswith(".pem"):
+            paths.append(os.path.join(directory, name))
+    return paths
+
+
+class ContextCache(object):
+    """
+    SSL contexts, which load the CA certificates and client certificate of
+    every connection made with them, built once and reused until one of the
+    files or directories they were loaded from is modified. Only the size
+    most recently built are kept.
+    """
+
+    def __init__(self, size=None):
+        if size is None:
+            size = CONTEXT_CACHE_SIZE
+        self.size = size
+        # (file stats, context) by key, and the keys oldest first
+        self._contexts = {}
+        self._keys = []
+        self._lock = threading.Lock()
+
+        # number of contexts built, and of times one was reused
+        self.built = 0
+        self.reused = 0
+
+    def get(self, key, paths, build):
+        """
+        :param key:     everything the context depends on besides the files
+        :type  key:     tuple
+        :param paths:   files the context is loaded from, and the directories
+                        they are found in, as adding or removing files
+                        changes a directory's modification time
+        :type  paths:   list of str
+        :param build:   function returning a new context
+        :type  build:   callable
+        :return:        the context
+        :rtype:         M2Crypto.SSL.Context
+        """
+        stats = _file_stats(paths)
+        self._lock.acquire()
+        try:
+            cached = self._contexts.get(key)
+            if cached is not None and cached[0] == stats:
+                self.reused += 1
+                return cached[1]
+            context = build()
+            if cached is None:
+                self._keys.append(key)
+                while len(self._keys) > self.size:
+                    del self._contexts[self._keys.pop(0)]
+            self._contexts[key] = (stats, context)
+            self.built += 1
+            return context
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._contexts = {}
+            self._keys = []
+        finally:
+            self._lock.release()
+
+
+# SSL contexts shared by every Restlib and ContentConnection
+contexts = ContextCache()
+
+
+def _own_session(session):
+    """
+    :return:    a copy of the session, which unlike those returned by
+                get_session() outlives its connection
+    :rtype:     M2Crypto.SSL.Session
+    """
+    bio = BIO.MemoryBuffer()
+    m2.ssl_session_write_pem(session._ptr(), bio.bio_ptr())
+    return Session(m2.ssl_session_read_pem(bio.bio_ptr()), 1)
+
+
+def _resumed(conn, offered):
+    """
+    :return:    whether the connection resumed the session offered. OpenSSL
+                keeps using the session it was given when it is resumed, and
+                starts a new one otherwise.
+    :rtype:     bool
+    """
+    return offered is not None and \
+            m2.ssl_get_session(conn.sock.ssl) == offered._ptr()
+
+
+class SessionCache(object):
+    """
+    The SSL session last negotiated with each server, offered by the next
+    connection to it so that the server can resume the session rather than
+    make a full handshake.
+
+    Sessions are kept by SSL context, as a session resumed with another
+    context would go on using the client certificate it was negotiated with.
+    """
+
+    def __init__(self):
+        # {server: session} by context
+        self._sessions = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        # number of handshakes that resumed a session, and of full ones
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context, server):
+        """
+        :return:    the session to offer the server, or None
+        """
+        self._lock.acquire()
+        try:
+            return self._sessions.get(context, {}).get(server)
+        finally:
+            self._lock.release()
+
+    def connect(self, conn, server):
+        """
+        Connect, offering the cached session for the server, and cache the
+        session negotiated.
+
+        :param conn:    M2Crypto HTTPS connection, not connected yet
+        :param server:  (host, port) of the server, which differs from that
+                        of the connection when it is made through a proxy
+        :type  server:  tuple
+        """
+        context = conn.ssl_ctx
+        offered = self.get(context, server)
+        if offered is not None:
+            conn.set_session(offered)
+        conn.connect()
+        # After a resumed handshake the client sends the request right after
+        # its own last handshake message, which Nagle's algorithm would hold
+        # back until the server acknowledged that.
+        try:
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except socket.error, e:
+            log.debug("Could not set TCP_NODELAY: %s" % e)
+        resumed = _resumed(conn, offered)
+        session = offered
+        if not resumed:
+            try:
+                session = _own_session(conn.get_session())
+            except Exception, e:
+                log.debug("Could not keep SSL session: %s" % e)
+                session = None
+
+        self._lock.acquire()
+        try:
+            if resumed:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if session is not None:
+                self._sessions.setdefault(context, {})[server] = session
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._sessions = weakref.WeakKeyDictionary()
+        finally:
+            self._lock.release()
+
+
+# SSL sessions shared by every Restlib and ContentConnection
+sessions = SessionCache()
+
+
+class ConnectionPool(object):
+    """
+    Kept alive connections to one server, reused by the requests made through
+    a Restlib. Connections are taken from the pool for each request and put
+    back after their response has been read. More connections than the size
+    of the pool may be in use at once, but only that many are kept.
+
+    Connections taken before the pool was last closed are not kept when they
+    are put back.
+    """
+
+    def __init__(self, factory, size=None, idle_timeout=None,
+            max_requests=None):
+        """
+        :param factory:         creates a new connection
+        :type  factory:         callable
+        :param size:            number of idle connections kept, or 0 to
+                                make a new connection for every request
+        :type  size:            int
+        :param idle_timeout:    seconds an idle connection may be reused for
+        :type  idle_timeout:    int
+        :param max_requests:    requests made on one connection before it is
+                                closed
+        :type  max_requests:    int
+        """
+        self.factory = factory
+        if size is None:
+            size = POOL_SIZE
+        if idle_timeout is None:
+            idle_timeout = POOL_IDLE_TIMEOUT
+        if max_requests is None:
+            max_requests = POOL_MAX_REQUESTS
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+
+        # (connection, when it was last used, requests made on it), most
+        # recently used last
+        self._idle = []
+        # connections in use, with the generation they were taken in, which
+        # close() moves on
+        self._used = {}
+        self._generation = 0
+        # idle connections kept beyond size, see reserve()
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+        # number of connections made, and of times one was reused
+        self.created = 0
+        self.reused = 0
+
+    def get(self):
+        """
+        Take an idle connection from the pool, or make a new one.
+
+        :return:    the connection, and the number of requests already made on
+                    it, 0 if it is new
+        :rtype:     tuple
+        """
+        expired = []
+        found = None
+        self._lock.acquire()
+        try:
+            now = time.time()
+            while self._idle:
+                conn, used, requests = self._idle.pop()
+                if now - used <= self.idle_timeout:
+                    found = (conn, requests)
+                    self._used[conn] = self._generation
+                    self.reused += 1
+                    break
+                expired.append(conn)
+        finally:
+            self._lock.release()
+
+        for conn in expired:
+            close_connection(conn)
+        if found is None:
+            found = self.new()
+        return found
+
+    def new(self):
+        """
+        Make a new connection, bypassing the idle ones.
+
+        :return:    the connection, and 0 requests made on it
+        :rtype:     tuple
+        """
+        self._lock.acquire()
+        try:
+            self.created += 1
+            generation = self._generation
+        finally:
+            self._lock.release()
+        conn = self.factory()
+        self._lock.acquire()
+        try:
+            self._used[conn] = generation
+        finally:
+            self._lock.release()
+        return (conn, 0)
+
+    def put(self, conn, requests):
+        """
+        Return a connection to the pool after a request, or close it if it is
+        not to be reused.
+
+        :param requests:    the number of requests made on the connection
+        :type  requests:    int
+        """
+        self._lock.acquire()
+        try:
+            current = self._used.pop(conn, None) == self._generation
+            if current and requests < self.max_requests and \
+                    conn.sock is not None and \
+                    len(self._idle) < self.size + self._reserved:
+                self._idle.append((conn, time.time(), requests))
+                return
+        finally:
+            self._lock.release()
+        close_connection(conn)
+
+    def reserve(self, count):
+        """
+        Keep count more idle connections than the size of the pool, until
+        release() is called with the same count.
+        """
+        self._lock.acquire()
+        try:
+            self._reserved += count
+        finally:
+            self._lock.release()
+
+    def release(self, count):
+        """
+        Undo reserve(), closing the idle connections kept beyond the size of
+        the pool.
+        """
+        self._lock.acquire()
+        try:
+            self._reserved -= count
+            keep = max(self.size + self._reserved, 0)
+            # the least recently used are first
+            excess = self._idle[:max(len(self._idle) - keep, 0)]
+            del self._idle[:len(excess)]
+        finally:
+            self._lock.release()
+        for conn, used, requests in excess:
+            close_connection(conn)
+
+    def discard(self, conn):
+        """
+        Close a connection taken from the pool rather than put it back.
+        """
+        self._lock.acquire()
+        try:
+            self._used.pop(conn, None)
+        finally:
+            self._lock.release()
+        close_connection(conn)
+
+    def close(self):
+        """
+        Close every idle connection, and those in use once they are put back.
+        """
+        self._lock.acquire()
+        try:
+            idle = self._idle
+            self._idle = []
+            self._generation += 1
+        finally:
+            self._lock.release()
+        for conn, used, requests in idle:
+            close_connection(conn)
+
+
+class Future(object):
+    """
+    The result of a call made by an Executor, available once the call has
+    returned or raised.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        """
+        Wait for the call to return.
+
+        :param timeout: seconds to wait, or None to wait for as long as the
+                        call takes
+        :type  timeout: float
+        :return:        what the call returned. What it raised is raised
+                        again, with its traceback.
+        :raises:        TimeoutException if the call has not returned within
+                        the timeout
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        Wait for the call to return, as for result().
+
+        :return:    the exception the call raised, or None
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, callback):
+        """
+        Call callback with this future once the call has returned, in the
+        thread that made the call, or at once if it already has.
+        """
+        self._lock.acquire()
+        try:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._lock.release()
+        callback(self)
+
+    def _wait(self, timeout):
+        self._done.wait(timeout)
+        if not self.done():
+            raise TimeoutException("Call did not return within %s seconds" %
+                                   timeout)
+
+    def _set(self, result=None, exc_info=None):
+        self._lock.acquire()
+        try:
+            self._result = result
+            self._exc_info = exc_info
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        finally:
+            self._lock.release()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception, e:
+                log.exception(e)
+
+
+class Executor(object):
+    """
+    Makes calls in up to max_workers threads at once. Threads are started as
+    calls are submitted and kept until shutdown(); calls submitted while
+    every thread is busy wait for one to be free.
+    """
+
+    def __init__(self, max_workers=None):
+        # before any thread makes SSL connections
+        init_ssl_threading()
+        self.max_workers = max_workers or MAX_WORKERS
+        self._calls = Queue.Queue()
+        self._threads = []
+        # threads waiting for a call, less the calls submitted to them
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, function, *args, **kwargs):
+        """
+        :return:    the future result of function(*args, **kwargs)
+        :rtype:     Future
+        """
+        future = Future()
+        self._lock.acquire()
+        try:
+            if self._shutdown:
+                raise RuntimeError("Executor has been shut down")
+            self._calls.put((future, function, args, kwargs))
+            if self._idle:
+                self._idle -= 1
+            elif len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+        return future
+
+    def _work(self):
+        while True:
+            call = self._calls.get()
+            if call is None:
+                return
+            future, function, args, kwargs = call
+            try:
+                future._set(result=function(*args, **kwargs))
+            except:
+                future._set(exc_info=sys.exc_info())
+            self._lock.acquire()
+            try:
+                self._idle += 1
+            finally:
+                self._lock.release()
+
+    def shutdown(self, wait=True):
+        """
+        Stop the threads once the calls already submitted have been made.
+
+        :param wait:    wait for them to stop
+        :type  wait:    bool
+        """
+        self._lock.acquire()
+        try:
+            self._shutdown = True
+            threads = self._threads
+            self._threads = []
+        finally:
+            self._lock.release()
+        for thread in threads:
+            self._calls.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
 
 # FIXME: this is terrible, we need to refactor
 # Restlib to be Restlib based on a https client class
@@ -225,6 +811,7 @@ class ContentConnection(object):
                  ssl_verify_depth=1):
 
         log.debug("ContectConnection")
+        self.sessions = sessions
         # FIXME
         self.ent_dir = "/etc/pki/entitlement"
         self.handler = "/"
@@ -247,10 +834,14 @@ class ContentConnection(object):
         self.proxy_user = proxy_user or config.get('server', 'proxy_user') or info['proxy_username']
         self.proxy_password = proxy_password or config.get('server', 'proxy_password') or info['proxy_password']
 
-    def _request(self, request_type, handler, body=None):
+    def _create_context(self):
         context = SSL.Context("tlsv1")
-
         self._load_ca_certificates(context)
+        return context
+
+    def _request(self, request_type, handler, body=None):
+        context = contexts.get(('content', self.ent_dir),
+                               _pem_files(self.ent_dir), self._create_context)
 
         if self.proxy_hostname and self.proxy_port:
             log.debug("Using proxy: %s:%s" % (self.proxy_hostname, self.proxy_port))
@@ -263,6 +854,7 @@ class ContentConnection(object):
         else:
             conn = httpslib.HTTPSConnection(self.host, safe_int(self.ssl_port), ssl_context=context)
 
+        self.sessions.connect(conn, (self.host, safe_int(self.ssl_port)))
         conn.request("GET", handler, body="", headers={"Host": "%s:%s" % (self.host, self.ssl_port), "Content-Length": "0"})
         response = conn.getresponse()
         result = {
@@ -330,14 +922,26 @@ def _get_locale():
 class Restlib(object):
     """
      A wrapper around httplib to make rest calls easier
+
+     Connections are kept alive and reused by later requests, see
+     ConnectionPool for pool_size, idle_timeout and max_requests.
     """
 
+    # Errors from a kept alive connection the server has since closed, after
+    # which the request may be made again on a new connection, see _retry():
+    RECONNECT_ERRORS = (httplib.BadStatusLine, socket.error, SSLError)
+
+    # Requests made again even when they were sent before the connection
+    # failed, as making them twice does no harm:
+    RETRY_METHODS = ("GET",)
+
     def __init__(self, host, ssl_port, apihandler,
             username=None, password=None,
             proxy_hostname=None, proxy_port=None,
             proxy_user=None, proxy_password=None,
             cert_file=None, key_file=None,
-            ca_dir=None, insecure=False, ssl_verify_depth=1):
+            ca_dir=None, insecure=False, ssl_verify_depth=1,
+            pool_size=None, idle_timeout=None, max_requests=None):
         self.host = host
         self.ssl_port = ssl_port
         self.apihandler = apihandler
@@ -375,6 +979,19 @@ class Restlib(object):
             basic = 'Basic %s' % encoded
             self.headers['Authorization'] = basic
 
+        self.pool = ConnectionPool(self._create_connection, size=pool_size,
+                idle_timeout=idle_timeout, max_requests=max_requests)
+        # the SSL context of the pooled connections
+        self._context = None
+        # see SessionCache for the hits and misses of session resumption
+        self.sessions = sessions
+
+    def close(self):
+        """
+        Close the connections kept alive for later requests.
+        """
+        self.pool.close()
+
     def _decode_list(self, data):
         rv = []
         for item in data:
@@ -417,9 +1034,7 @@ class Restlib(object):
         if loaded_ca_certs:
             log.debug("Loaded CA certificates from %s: %s" % (self.ca_dir, ', '.join(loaded_ca_certs)))
 
-    # FIXME: can method be emtpty?
-    def _request(self, request_type, method, info=None):
-        handler = self.apihandler + method
+    def _create_context(self):
         context = SSL.Context("tlsv1")
 
         if self.insecure:  # allow clients to work insecure mode if required..
@@ -430,17 +1045,73 @@ class Restlib(object):
                 self._load_ca_certificates(context)
         if self.cert_file and os.path.exists(self.cert_file):
             context.load_cert(self.cert_file, keyfile=self.key_file)
+        return context
+
+    def _get_context(self):
+        """
+        :return:    the SSL context for this server, built only if it has not
+                    been yet or the CA certificates, cert or key have changed
+        """
+        key = ('restlib', self.ca_dir, self.insecure, self.ssl_verify_depth,
+               self.cert_file, self.key_file)
+        paths = _pem_files(self.ca_dir) + [self.cert_file, self.key_file]
+        return contexts.get(key, paths, self._create_context)
 
+    def _create_connection(self):
+        context = self._context or self._get_context()
         if self.proxy_hostname and self.proxy_port:
             log.debug("Using proxy: %s:%s" % (self.proxy_hostname, self.proxy_port))
-            conn = RhsmProxyHTTPSConnection(self.proxy_hostname, self.proxy_port,
+            return RhsmProxyHTTPSConnection(self.proxy_hostname, self.proxy_port,
                                             username=self.proxy_user,
                                             password=self.proxy_password,
                                             ssl_context=context)
+        return httpslib.HTTPSConnection(self.host, self.ssl_port, ssl_context=context)
+
+    def _send(self, conn, request_type, handler, body, headers):
+        """
+        Send a request on the connection.
+        """
+        try:
+            if conn.sock is None:
+                self.sessions.connect(conn, (self.host, safe_int(self.ssl_port)))
+            conn.request(request_type, handler, body=body, headers=headers)
+        except SSLError:
+            if self.cert_file:
+                id_cert = certificate.create_from_file(self.cert_file)
+                if not id_cert.is_valid():
+                    raise ExpiredIdentityCertException()
+            raise
+
+    def _receive(self, conn):
+        """
+        Read the response to the request sent on the connection.
+
+        :return:    the response, and its content
+        :rtype:     tuple
+        """
+        response = conn.getresponse()
+        return (response, response.read())
+
+    def _retry(self, request_type, requests, sent, error):
+        """
+        :return:    whether a request that failed with one of
+                    RECONNECT_ERRORS may be made again on a new connection
+        :rtype:     bool
+        """
+        if not requests or isinstance(error, socket.timeout):
+            # a new connection, or a server slow to answer rather than gone
+            return False
+        # The server closed the connection while it was idle. A request that
+        # could not be sent never reached it, but one that was may have been
+        # processed before the connection failed.
+        return not sent or request_type in self.RETRY_METHODS
+
+    # FIXME: can method be emtpty?
+    def _request(self, request_type, method, info=None):
+        handler = self.apihandler + method
+        if self.proxy_hostname and self.proxy_port:
             # this connection class wants the full url
             handler = "https://%s:%s%s" % (self.host, self.ssl_port, handler)
-        else:
-            conn = httpslib.HTTPSConnection(self.host, self.ssl_port, ssl_context=context)
 
         if info is not None:
             body = json.dumps(info)
@@ -453,17 +1124,38 @@ class Restlib(object):
         if body is None:
             headers = dict(self.headers.items() +
                            {"Content-Length": "0"}.items())
+        context = self._get_context()
+        if context is not self._context:
+            # Kept alive connections would go on presenting a replaced
+            # identity certificate. The context is set first, so that no
+            # connection made with the previous one outlives close().
+            self._context = context
+            self.pool.close()
+        conn, requests = self.pool.get()
         try:
-            conn.request(request_type, handler, body=body, headers=headers)
-        except SSLError:
-            if self.cert_file:
-                id_cert = certificate.create_from_file(self.cert_file)
-                if not id_cert.is_valid():
-                    raise ExpiredIdentityCertException()
+            sent = False
+            try:
+                self._send(conn, request_type, handler, body, headers)
+                sent = True
+                response, content = self._receive(conn)
+            except self.RECONNECT_ERRORS, e:
+                if not self._retry(request_type, requests, sent, e):
+                    raise
+                log.debug("Kept alive connection lost (%s), reconnecting" % e)
+                self.pool.discard(conn)
+                conn, requests = self.pool.new()
+                self._send(conn, request_type, handler, body, headers)
+                response, content = self._receive(conn)
+        except:
+            self.pool.discard(conn)
             raise
-        response = conn.getresponse()
+        if response.will_close:
+            self.pool.discard(conn)
+        else:
+            self.pool.put(conn, requests + 1)
+
         result = {
-            "content": response.read(),
+            "content": content,
             "status": response.status,
         }
         response_log = 'Response: status=' + str(result['status'])
@@ -585,7 +1277,7 @@ class UEPConnection:
             proxy_password=None,
             username=None, password=None,
             cert_file=None, key_file=None,
-            insecure=None):
+            insecure=None, pool_size=None):
         """
         Two ways to authenticate:
             - username/password for HTTP basic authentication. (owner admin role)
@@ -593,6 +1285,9 @@ class UEPConnection:
               (consumer role)
 
         Must specify one method of authentication or the other, not both.
+
+        pool_size is the number of connections kept alive, see
+        ConnectionPool.
         """
         self.host = host or config.get('server', 'hostname')
         self.ssl_port = ssl_port or safe_int(config.get('server', 'port'))
@@ -648,7 +1343,8 @@ class UEPConnection:
                     proxy_hostname=self.proxy_hostname, proxy_port=self.proxy_port,
                     proxy_user=self.proxy_user, proxy_password=self.proxy_password,
                     ca_dir=self.ca_cert_dir, insecure=self.insecure,
-                    ssl_verify_depth=self.ssl_verify_depth)
+                    ssl_verify_depth=self.ssl_verify_depth,
+                    pool_size=pool_size)
             log.info("Using basic authentication as: %s" % username)
         elif using_id_cert_auth:
             self.conn = Restlib(self.host, self.ssl_port, self.handler,
@@ -656,7 +1352,8 @@ class UEPConnection:
                                 proxy_hostname=self.proxy_hostname, proxy_port=self.proxy_port,
                                 proxy_user=self.proxy_user, proxy_password=self.proxy_password,
                                 ca_dir=self.ca_cert_dir, insecure=self.insecure,
-                                ssl_verify_depth=self.ssl_verify_depth)
+                                ssl_verify_depth=self.ssl_verify_depth,
+                                pool_size=pool_size)
             log.info("Using certificate authentication: key = %s, cert = %s, "
                      "ca = %s, insecure = %s" %
                      (self.key_file, self.cert_file, self.ca_cert_dir,
@@ -666,7 +1363,8 @@ class UEPConnection:
                     proxy_hostname=self.proxy_hostname, proxy_port=self.proxy_port,
                     proxy_user=self.proxy_user, proxy_password=self.proxy_password,
                     ca_dir=self.ca_cert_dir, insecure=self.insecure,
-                    ssl_verify_depth=self.ssl_verify_depth)
+                    ssl_verify_depth=self.ssl_verify_depth,
+                    pool_size=pool_size)
             log.info("Using no auth")
 
         self.resources = None
@@ -1133,6 +1831,45 @@ class UEPConnection:
         results = self.conn.request_get(method)
         return results
 
+    def batch(self, calls, max_workers=None):
+        """
+        Make many calls at once, up to max_workers at a time, over the kept
+        alive connections of this connection. For instance:
+
+            conn.batch([('getPool', (pool_id,)) for pool_id in pool_ids])
+
+        :param calls:       (method, args) or (method, args, kwargs) tuples,
+                            method being the name of a method of this
+                            connection or any callable
+        :type  calls:       list
+        :param max_workers: number of calls made at once
+        :type  max_workers: int
+        :return:            a Future for each call, in the order of the calls,
+                            all of them done. result() returns what the call
+                            returned, or raises what it raised.
+        :rtype:             list of Future
+        """
+        executor = Executor(max_workers)
+        # keep a connection for each thread while the calls are made
+        pool = self.conn.pool
+        pool.reserve(executor.max_workers)
+        try:
+            futures = []
+            for call in calls:
+                method = call[0]
+                if isinstance(method, basestring):
+                    method = getattr(self, method)
+                kwargs = {}
+                if len(call) > 2:
+                    kwargs = call[2]
+                futures.append(executor.submit(method, *call[1], **kwargs))
+            for future in futures:
+                future.exception()
+            return futures
+        finally:
+            executor.shutdown(wait=False)
+            pool.release(executor.max_workers)
+
     def sanitize(self, url_param, plus=False):
         #This is a wrapper around urllib.quote to avoid issues like the one
         #discussed in http://bugs.python.org/issue9301
@@ -1141,3 +1878,52 @@ class UEPConnection:
         else:
             sane_string = urllib.quote(str(url_param))
         return sane_string
+
+
+class AsyncUEPConnection(object):
+    """
+    A UEPConnection whose calls return at once. Each of its methods takes
+    the arguments of the UEPConnection method of the same name, and returns
+    the Future of its result. Calls are made by an Executor, up to
+    max_workers at once over the kept alive connections of one Restlib.
+
+    Requests are built, and errors from the server raised, by the
+    UEPConnection methods themselves.
+    """
+
+    # helpers making no request, called directly
+    SYNC_METHODS = ('sanitize', 'sanitizeGuestIds')
+
+    def __init__(self, max_workers=None, **kwargs):
+        """
+        :param max_workers: number of calls made at once
+        :type  max_workers: int
+
+        Other arguments are those of UEPConnection. The pool_size defaults
+        to keeping a connection for each thread.
+        """
+        self.executor = Executor(max_workers)
+        if kwargs.get('pool_size') is None:
+            kwargs['pool_size'] = max(POOL_SIZE, self.executor.max_workers)
+        self.uep = UEPConnection(**kwargs)
+
+    def __getattr__(self, name):
+        if name in ('uep', 'executor'):
+            raise AttributeError(name)
+        attr = getattr(self.uep, name)
+        if name.startswith('_') or name in self.SYNC_METHODS or \
+                not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.executor.submit(attr, *args, **kwargs)
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+    def shutDown(self):
+        """
+        Wait for the calls already made, then close the connections.
+        """
+        self.executor.shutdown()
+        self.uep.shutDown()
@@ -107,22 +107,129 @@ class HuffmanNode(object):
         :rtype:         rhsm.huffman.HuffmanNode
         """
         # the counter makes sure that when nodes of equal weight are compared,
-        # the one most recently added gets chosen
+        # the one most recently added gets chosen. Weights are compared
+        # directly so the heap never has to call back into __cmp__.
         counter = itertools.count()
         # We use the heapq module to make a min priority queue
-        queue = [(node, counter.next()) for node in nodes]
+        queue = [(node.weight, counter.next(), node) for node in nodes]
         heapq.heapify(queue)
         while True:
-            left, count = heapq.heappop(queue)
+            left = heapq.heappop(queue)[2]
             try:
-                right, count = heapq.heappop(queue)
+                right = heapq.heappop(queue)[2]
             except IndexError:
                 # no more nodes to compare, so a is the root node of the tree
                 return left
-            heapq.heappush(queue, (cls.combine(left, right), counter.next()))
+            node = cls.combine(left, right)
+            heapq.heappush(queue, (node.weight, counter.next(), node))
 
     def __cmp__(self, other):
         return cmp(self.weight, other.weight)
 
     def __repr__(self):
         return 'HuffmanNode(%d, "%s")' % (self.weight, self.value)
+
+
+class HuffmanTable(object):
+    """
+    Multi-bit lookup table for decoding symbols of a Huffman tree.
+
+    Rather than walking the tree (or probing a dict of code strings) one bit
+    at a time, the table is indexed by the next BITS bits of the stream. Each
+    entry holds the leaf value and the length of its code. Codes longer than
+    the table width share a prefix that points to a nested table, which is
+    indexed by the following bits in the same way.
+    """
+
+    # how many bits are consumed by a single table probe
+    BITS = 10
+
+    def __init__(self, root, bits=None):
+        """
+        :param root:    root node of a Huffman tree, as returned by
+                        HuffmanNode.build_tree
+        :type  root:    rhsm.huffman.HuffmanNode
+        :param bits:    maximum width of each table level. Defaults to BITS.
+        :type  bits:    int
+        """
+        self.max_bits = bits or self.BITS
+        heights = self._get_heights(root)
+        self.bits, self.table = self._build_table(root, heights, self.max_bits)
+
+    @staticmethod
+    def _get_heights(root):
+        """
+        :param root:    root node of a Huffman tree
+        :type  root:    rhsm.huffman.HuffmanNode
+        :return:        dict where keys are id() of each node in the tree, and
+                        values are the length of the longest code below that
+                        node
+        :rtype:         dict
+        """
+        heights = {}
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if node.is_leaf:
+                heights[id(node)] = 0
+            elif visited:
+                heights[id(node)] = 1 + max(heights[id(node.left)],
+                                            heights[id(node.right)])
+            else:
+                stack.append((node, True))
+                stack.append((node.left, False))
+                stack.append((node.right, False))
+        return heights
+
+    @classmethod
+    def _build_table(cls, root, heights, max_bits):
+        """
+        Builds one level of the lookup table for the subtree starting at root.
+
+        :return:    tuple: (number of bits this level is indexed by, list of
+                    entries). Each entry is a tuple of (value, code length,
+                    nested level) where nested level is None for leaves.
+        :rtype:     tuple(int, list)
+        """
+        bits = min(heights[id(root)], max_bits)
+        table = [None] * (1 << bits)
+        stack = [(root, 0, 0)]
+        while stack:
+            node, code, depth = stack.pop()
+            if node.is_leaf:
+                # every index that starts with this code decodes to this leaf
+                shift = bits - depth
+                start = code << shift
+                entry = (node.value, depth, None)
+                for index in xrange(start, start + (1 << shift)):
+                    table[index] = entry
+            elif depth == bits:
+                table[code] = (None, bits,
+                               cls._build_table(node, heights, max_bits))
+            else:
+                stack.append((node.left, code << 1, depth + 1))
+                stack.append((node.right, (code << 1) | 1, depth + 1))
+        return bits, table
+
+    def decode(self, bitstream):
+        """
+        Consumes the next Huffman code from the bit stream and returns the
+        value of the leaf it identifies.
+
+        :param bitstream:   bit stream with a huffman code as the next value
+        :type  bitstream:   rhsm.bitstream.BitReader
+        :return:            value of the leaf, or None if the stream does not
+                            contain a complete code
+        """
+        remaining = bitstream.bits_remaining()
+        consumed = 0
+        bits, table = self.bits, self.table
+        while True:
+            value, length, nested = table[bitstream.peek_bits(bits)]
+            if consumed + length > remaining:
+                return None
+            bitstream.skip_bits(length)
+            if nested is None:
+                return value
+            consumed += length
+            bits, table = nested
@@ -12,10 +12,11 @@
 # in this software or its documentation.
 
 import itertools
+import posixpath
 import zlib
 
-from bitstream import GhettoBitStream
-from huffman import HuffmanNode
+from bitstream import BitReader
+from huffman import HuffmanNode, HuffmanTable
 
 # this is the "sentinel" value used for the path node that indicates the end
 # of a path
@@ -52,14 +53,51 @@ class PathTree(object):
         :type  data:    binary string
         """
         word_leaves, unused_bits = self._unpack_data(data)
-        HuffmanNode.build_tree(word_leaves)
-        word_dict = dict((node.code, node.value) for node in word_leaves)
-        bitstream = GhettoBitStream(unused_bits)
+        word_table = HuffmanTable(HuffmanNode.build_tree(word_leaves))
+        bitstream = BitReader(unused_bits)
         path_leaves = self._generate_path_leaves(bitstream)
-        HuffmanNode.build_tree(path_leaves)
-        path_dict = dict((node.code, node) for node in path_leaves)
+        path_table = HuffmanTable(HuffmanNode.build_tree(path_leaves))
         self.path_tree = self._generate_path_tree(
-                path_dict, path_leaves, word_dict, bitstream)
+                path_table, path_leaves, word_table, bitstream)
+
+    @classmethod
+    def from_compiled(cls, nodes):
+        """
+        Creates a PathTree from the compiled form of another one, without
+        decoding any data. The nested dict form in path_tree is rebuilt from
+        it only if something asks for it.
+
+        :param nodes:   compiled path tree, as returned by compiled()
+        :type  nodes:   list of tuples
+        :rtype:         rhsm.pathtree.PathTree
+        """
+        path_tree = cls.__new__(cls)
+        path_tree._path_tree = None
+        path_tree._automaton = nodes
+        return path_tree
+
+    def compiled(self):
+        """
+        :return:    the flattened form of the tree that paths are matched
+                    against, see _compile. It contains only lists, tuples,
+                    dicts, strings and bools, so it can easily be serialized.
+        :rtype:     list of tuples
+        """
+        if self._automaton is None:
+            self._automaton = self._compile(self._path_tree)
+        return self._automaton
+
+    def _get_path_tree(self):
+        if self._path_tree is None:
+            self._path_tree = self._decompile(self._automaton)
+        return self._path_tree
+
+    def _set_path_tree(self, path_tree):
+        self._path_tree = path_tree
+        # the compiled form is rebuilt from the new tree when next needed
+        self._automaton = None
+
+    path_tree = property(_get_path_tree, _set_path_tree)
 
     def match_path(self, path):
         """
@@ -76,38 +114,107 @@ class PathTree(object):
         """
         if not path.startswith('/'):
             raise ValueError('path must start with "/"')
-        return self._traverse_tree(self.path_tree, path.strip('/').split('/'))
+        nodes = self.compiled()
 
-    @classmethod
-    def _traverse_tree(cls, tree, words):
+        # ids of every node that the words matched so far lead to
+        states = (0,)
+        for word in path.strip('/').split('/'):
+            next_states = ()
+            for state in states:
+                children, variable_children, is_end = nodes[state]
+                if is_end:
+                    # we hit the end of a path in the tree, so the match was
+                    # successful
+                    return True
+                # we allow any word to match against entitlement variables
+                # such as "$releasever", but only if no word matches exactly.
+                next_states += children.get(word, variable_children)
+            if not next_states:
+                return False
+            if len(next_states) > 1:
+                # nodes can be shared, so don't try any of them twice
+                next_states = set(next_states)
+            states = next_states
+        for state in states:
+            if nodes[state][2]:
+                return True
+        return False
+
+    def paths(self):
+        """
+        :return:    every complete path in the tree, such as
+                    "/content/dist/rhel/server/$releasever/$basearch/os"
+        :rtype:     list of str
+        """
+        nodes = self.compiled()
+        paths = []
+        stack = [(0, ())]
+        while stack:
+            state, words = stack.pop()
+            children, variable_children, is_end = nodes[state]
+            if is_end:
+                paths.append('/' + '/'.join(words))
+            for word, child_ids in children.items():
+                for child_id in child_ids:
+                    stack.append((child_id, words + (word,)))
+        return paths
+
+    @staticmethod
+    def _compile(tree):
         """
-        Helper method for match_path that does recursive matching.
+        Flattens a path tree into a list indexed by node id, so matching does
+        not have to recurse or rescan each node's keys for variables. The root
+        node always has id 0.
 
-        :param tree:    A dict representing a node in the greater path tree.
+        :param tree:    root node of the path tree
         :type  tree:    dict
-        :param words:   list of words to match, the result of spliting a path
-                        by the "/" separator. Words must be sorted with the
-                        next word to match being at words[0]
-        :param words:   list
-        :return:        True iff there is a match, else False
-        :rtype:         bool
+        :return:        list with one tuple per node: (dict where keys are
+                        words and values are tuples of child node ids, tuple
+                        of node ids reachable through any "$variable" word,
+                        True iff the node ends a path)
+        :rtype:         list of tuples
         """
-        if PATH_END in tree:
-            # we hit the end of a path in the tree, so the match was successful
-            return True
-        if words:
-            if words[0] in tree:
-                words_to_try = [words[0]]
-            else:
-                # we allow any word to match against entitlement variables
-                # such as "$releasever".
-                words_to_try = [word for word in tree.keys() if word.startswith('$')]
-            for word in words_to_try:
-                # keep trying for each child
-                for child in tree[word]:
-                    if cls._traverse_tree(child, words[1:]):
-                        return True
-        return False
+        compiled = []
+        nodes = [tree]
+        node_ids = {id(tree): 0}
+        # nodes gets appended to as new children are found
+        for node in nodes:
+            children = {}
+            variable_children = []
+            for word, child_nodes in node.items():
+                if word == PATH_END:
+                    continue
+                child_ids = []
+                for child in child_nodes:
+                    if id(child) not in node_ids:
+                        node_ids[id(child)] = len(nodes)
+                        nodes.append(child)
+                    child_ids.append(node_ids[id(child)])
+                children[word] = tuple(child_ids)
+                if word.startswith('$'):
+                    variable_children.extend(child_ids)
+            compiled.append(
+                (children, tuple(variable_children), PATH_END in node))
+        return compiled
+
+    @staticmethod
+    def _decompile(nodes):
+        """
+        Rebuilds the nested dict form of a path tree from its compiled form.
+
+        :param nodes:   compiled path tree, as returned by _compile
+        :type  nodes:   list of tuples
+        :return:        root node of the path tree
+        :rtype:         dict
+        """
+        tree_nodes = [{} for node in nodes]
+        for tree_node, (children, variable_children, is_end) in \
+                zip(tree_nodes, nodes):
+            for word, child_ids in children.items():
+                tree_node[word] = [tree_nodes[child_id] for child_id in child_ids]
+            if is_end:
+                tree_node[PATH_END] = None
+        return tree_nodes[0]
 
     @staticmethod
     def _unpack_data(data):
@@ -148,22 +255,20 @@ class PathTree(object):
                             format, the beginning of this stream defines how
                             many total nodes exist. This method retrieves that
                             value.
-        :type  bitstream:   rhsm.bitstream.GhettoBitStream
+        :type  bitstream:   rhsm.bitstream.BitReader
         :return:            number of nodes
         :rtype:             int
         """
-        first_byte = bitstream.pop_byte()
+        first_byte = bitstream.read_byte()
         # less than 128 nodes, so only the first byte is used to define the
         # length
         if first_byte < 128:
             return first_byte
         # 128 or more nodes, so first byte tells us how many more bytes are used
-        # to define the number of nodes
+        # to define the number of nodes, stored as one big-endian number
         else:
             num_bytes = first_byte - 128
-            count_bytes = [bitstream.pop_byte() for x in range(num_bytes)]
-            node_count = bitstream.combine_bytes(count_bytes)
-            return node_count
+            return bitstream.read_bits(num_bytes * 8)
 
     @classmethod
     def _generate_path_leaves(cls, bitstream):
@@ -174,7 +279,7 @@ class PathTree(object):
 
         :param bitstream:   stream of bits remaining after decompressing the
                             word list
-        :type  bitstream:   rhsm.bitstream.GhettoBitStream
+        :type  bitstream:   rhsm.bitstream.BitReader
         :return:            list of HuffmanNode objects that can be used to
                             build a path tree
         :rtype:             list of HuffmanNode objects
@@ -188,60 +293,40 @@ class PathTree(object):
             nodes.append(node)
         return nodes
 
-    @staticmethod
-    def _get_leaf_from_dict(code_dict, bitstream):
-        """
-        Given a bit stream and dictionary where keys are huffman codes, return
-        the value from that dictionary that corresponds to the next huffman
-        code in the stream. This is a substitute for actually traversing the
-        tree, and this likely performs better in large data sets.
-
-        :param code_dict:   any dictionary where keys are huffman codes
-        :type  code_dict:   dict
-        :param bitstream:   bit stream with a huffman code as the next value
-        :type  bitstream:   rhsm.bitstream.GhettoBitStream
-        :return:            value from the dict
-        """
-        code = ''
-        for bit in bitstream:
-            code += bit
-            if code in code_dict:
-                return code_dict[code]
-
     @classmethod
-    def _generate_path_tree(cls, path_dict, path_leaves, word_dict, bitstream):
+    def _generate_path_tree(cls, path_table, path_leaves, word_table, bitstream):
         """
         Once huffman trees have been generated for the words and for the path
         nodes, this method uses them and the bit stream to create the path tree
         that can be traversed to match potentially authorized paths.
 
-        :param path_dict:   dictionary where keys are huffman codes and values
-                            are path nodes.
-        :type  path_dict:   dict
+        :param path_table:  lookup table for the huffman tree of path nodes,
+                            where leaf values are path nodes.
+        :type  path_table:  rhsm.huffman.HuffmanTable
         :param path_leaves: leaf nodes from the huffman tree of path nodes. the
                             values will be constructed into a new tree that can
                             be traversed to match actual paths.
         :type  path_leaves: list of HuffmanNode instances
-        :param word_dict:   dict where keys are huffman codes and values are
-                            words from the zlib-compressed word list.
-        :type  word_dict:   dict
+        :param word_table:  lookup table for the huffman tree of words from
+                            the zlib-compressed word list.
+        :type  word_table:  rhsm.huffman.HuffmanTable
         :param bitstream:   bit stream where the rest of the bits describe
                             how to use words as references between nodes in
                             the path tree. This format is described in detail
                             in the v3 entitlement certificate docs.
-        :type  bitstream:   rhsm.bitstream.GhettoBitStream
+        :type  bitstream:   rhsm.bitstream.BitReader
         """
         values = [leaf.value for leaf in path_leaves]
         root = {}
         values.insert(0, root)
         for value in values:
             while True:
-                word = cls._get_leaf_from_dict(word_dict, bitstream)
+                word = word_table.decode(bitstream)
                 # check for end of node
                 if not word:
                     break
-                path_node = cls._get_leaf_from_dict(path_dict, bitstream)
-                value.setdefault(word, []).append(path_node.value)
+                path_node = path_table.decode(bitstream)
+                value.setdefault(word, []).append(path_node)
         # add the sentinel value that marks this explicitly as the end of a path
         # there should usually only be one of these nodes
         for value in values:
@@ -249,3 +334,181 @@ class PathTree(object):
                 value[PATH_END] = None
 
         return root
+
+
+class PathIndex(object):
+    """
+    Answers which of many entitlement certificates authorize a path, without
+    checking each certificate in turn.
+
+    The content paths of every certificate are merged into one tree of path
+    segments. Each node where a content path ends holds the serials of the
+    certificates it came from. Every "$variable" segment is stored as the
+    same wildcard child, which matches any one segment of a requested path.
+    Lookups walk the tree once, so their cost depends on the depth of the
+    path rather than on the number of certificates.
+
+    Paths indexed with add_paths each match on their own, the same way v1
+    certificates have always been checked. PathTree.match_path does not try
+    a variable at a level where another of the certificate's content paths
+    has an exact segment, so a v3 certificate can reject a path that one of
+    its content paths matches on its own. Certificates indexed with add_cert
+    are therefore only returned once their own check_path accepts the path;
+    the tree narrows the check down to the few certificates that could
+    authorize it.
+    """
+
+    def __init__(self):
+        # each node is a list: [dict of segment -> child node,
+        #                       wildcard child node or None,
+        #                       set of serials whose content paths end here]
+        self._root = self._new_node()
+        # serial -> list of content paths, used to remove a certificate
+        self._paths = {}
+        # serial -> certificate added with add_cert, which has the final say
+        self._certs = {}
+
+    @staticmethod
+    def _new_node():
+        return [{}, None, set()]
+
+    @staticmethod
+    def _split(path):
+        return path.strip('/').split('/')
+
+    def add_cert(self, cert):
+        """
+        Indexes the content paths of an entitlement certificate, replacing any
+        previously indexed certificate with the same serial. Paths found in
+        the index are confirmed with the certificate's check_path.
+
+        :param cert:    entitlement certificate, either v1 or v3
+        :type  cert:    rhsm.certificate2.EntitlementCertificate
+        """
+        self.add_paths(cert.serial, cert.entitled_paths())
+        self._certs[cert.serial] = cert
+
+    def add_paths(self, serial, paths):
+        """
+        Indexes content paths under the given serial, replacing any paths
+        previously indexed under it.
+
+        :param serial:  serial of the certificate that authorizes the paths
+        :type  serial:  int
+        :param paths:   content paths, which may contain "$variable" segments
+        :type  paths:   iterable of str
+        """
+        if serial in self._paths:
+            self.remove(serial)
+        paths = list(paths)
+        for path in paths:
+            node = self._root
+            for word in self._split(path):
+                if word.startswith('$'):
+                    if node[1] is None:
+                        node[1] = self._new_node()
+                    node = node[1]
+                else:
+                    node = node[0].setdefault(word, self._new_node())
+            node[2].add(serial)
+        self._paths[serial] = paths
+
+    def remove(self, serial):
+        """
+        Removes all content paths indexed under the given serial. Branches of
+        the tree that no longer lead to any content path are pruned.
+
+        :param serial:  serial of the certificate to remove
+        :type  serial:  int
+
+        :raise: KeyError if nothing is indexed under the serial
+        """
+        self._certs.pop(serial, None)
+        for path in self._paths.pop(serial):
+            # list of (parent node, segment) pairs leading to the end node
+            trail = []
+            node = self._root
+            for word in self._split(path):
+                trail.append((node, word))
+                if word.startswith('$'):
+                    node = node[1]
+                else:
+                    node = node[0].get(word)
+                if node is None:
+                    # an equivalent path of this cert was already removed
+                    break
+            if node is None:
+                continue
+            node[2].discard(serial)
+            while trail and not (node[0] or node[1] or node[2]):
+                parent, word = trail.pop()
+                if word.startswith('$'):
+                    parent[1] = None
+                else:
+                    del parent[0][word]
+                node = parent
+
+    def match_all(self, path):
+        """
+        :param path:    path to which access is being requested
+        :type  path:    str
+        :return:        serials of all certificates that authorize the path
+        :rtype:         set
+        """
+        serials = set()
+        for node in self._walk(path):
+            serials.update(node[2])
+        return set([serial for serial in serials
+                    if self._authorizes(serial, path)])
+
+    def match_any(self, path):
+        """
+        :param path:    path to which access is being requested
+        :type  path:    str
+        :return:        True iff any certificate authorizes the path
+        :rtype:         bool
+        """
+        checked = set()
+        for node in self._walk(path):
+            for serial in node[2] - checked:
+                if self._authorizes(serial, path):
+                    return True
+                checked.add(serial)
+        return False
+
+    def _authorizes(self, serial, path):
+        """
+        Confirms a serial found in the tree for the path against its
+        certificate, if it was indexed with add_cert.
+        """
+        cert = self._certs.get(serial)
+        return cert is None or cert.check_path(path)
+
+    def _walk(self, path):
+        """
+        Yields every node of the tree that the beginning of the path, or the
+        whole path, leads to.
+        """
+        # squash double '//' the same way check_path does
+        path = posixpath.normpath(path)
+        nodes = [self._root]
+        for word in self._split(path):
+            next_nodes = []
+            for node in nodes:
+                yield node
+                child = node[0].get(word)
+                if child is not None:
+                    next_nodes.append(child)
+                if node[1] is not None:
+                    next_nodes.append(node[1])
+            if not next_nodes:
+                return
+            nodes = next_nodes
+        for node in nodes:
+            yield node
+
+    def __contains__(self, serial):
+        return serial in self._paths
+
+    def __len__(self):
+        return len(self._paths)
@@ -16,7 +16,9 @@
 import gettext
 import os
 import re
+import threading
 from urlparse import urlparse
+from M2Crypto import threading as m2_threading
 from rhsm.config import DEFAULT_PROXY_PORT
 
 _ = lambda x: gettext.ldgettext("rhsm", x)
@@ -221,3 +223,25 @@ def get_env_proxy_info():
         else:
             the_proxy['proxy_port'] = int(info[3])
     return the_proxy
+
+
+_ssl_threading_lock = threading.Lock()
+_ssl_threading = False
+
+
+def init_ssl_threading():
+    """
+    Give OpenSSL the locking callbacks it needs to be used from several
+    threads at once, as versions before 1.1 do not lock their shared state
+    otherwise. This covers both M2Crypto connections and the _certificate
+    extension, which share the process's OpenSSL. Only the first call does
+    anything.
+    """
+    global _ssl_threading
+    _ssl_threading_lock.acquire()
+    try:
+        if not _ssl_threading:
+            m2_threading.init()
+            _ssl_threading = True
+    finally:
+        _ssl_threading_lock.release()
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times getConsumer calls made one after the other with a UEPConnection, at
+once with an AsyncUEPConnection, and in a UEPConnection.batch(), to a local
+HTTPS server standing in for candlepin that takes some milliseconds to
+answer each.
+
+Usage: python test/benchmark/async-bench.py [calls] [max workers] [latency ms]
+"""
+
+import os
+import shutil
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from subprocess import Popen, PIPE, STDOUT
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from rhsm.connection import UEPConnection, AsyncUEPConnection
+
+CONSUMER = '{"uuid": "abc", "name": "bench"}'
+LATENCY = 0.02
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # write each response at once, rather than a line at a time
+    wbufsize = -1
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(CONSUMER)))
+        self.end_headers()
+        self.wfile.write(CONSUMER)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+def serve(directory):
+    """
+    Start an HTTPS server on a free local port in a thread.
+
+    :return:    the server
+    """
+    cert = os.path.join(directory, 'server.pem')
+    p = Popen(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+               '-subj', '/CN=localhost', '-days', '1', '-keyout', cert,
+               '-out', cert], stdout=PIPE, stderr=STDOUT)
+    p.communicate()
+    server = Server(('localhost', 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    context.load_cert_chain(cert)
+    # Restlib speaks TLSv1, which current openssl builds refuse by default
+    context.set_ciphers('DEFAULT:@SECLEVEL=0')
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    return server
+
+
+def main(calls, max_workers, latency):
+    global LATENCY
+    LATENCY = latency / 1000.0
+    tmp = tempfile.mkdtemp()
+    try:
+        server = serve(tmp)
+        kwargs = {'host': 'localhost', 'ssl_port': server.server_address[1],
+                  'handler': '/candlepin', 'insecure': True}
+
+        cp = UEPConnection(**kwargs)
+        start = time.time()
+        for i in range(calls):
+            cp.getConsumer('abc')
+        elapsed = time.time() - start
+        print 'UEPConnection: %d calls in %.3fs' % (calls, elapsed)
+
+        start = time.time()
+        for future in cp.batch([('getConsumer', ('abc',))] * calls,
+                               max_workers=max_workers):
+            future.result()
+        elapsed = time.time() - start
+        print 'UEPConnection.batch, %d workers: %d calls in %.3fs' % \
+              (max_workers, calls, elapsed)
+        cp.shutDown()
+
+        cp = AsyncUEPConnection(max_workers=max_workers, **kwargs)
+        start = time.time()
+        futures = [cp.getConsumer('abc') for i in range(calls)]
+        for future in futures:
+            future.result()
+        elapsed = time.time() - start
+        cp.shutDown()
+        print 'AsyncUEPConnection, %d workers: %d calls in %.3fs' % \
+              (max_workers, calls, elapsed)
+        server.shutdown()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 8, 20][len(args):]))
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Compares ingesting a bundle of concatenated v3 entitlement certificates by
+splitting it in python and loading each certificate on its own, with
+_certificate.load_all and create_many_from_pem.
+
+Usage: python test/benchmark/bundle-bench.py [certificate count] [content sets]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm import _certificate
+from rhsm.certificate import create_from_pem, create_many_from_pem
+from rhsm.certificate2 import CERT_PEM_HEADER
+
+
+def split(bundle):
+    return [CERT_PEM_HEADER + pem for pem in bundle.split(CERT_PEM_HEADER)[1:]]
+
+
+def load_each(bundle):
+    return [_certificate.load(pem=pem) for pem in split(bundle)]
+
+
+def create_each(bundle):
+    return [create_from_pem(pem) for pem in split(bundle)]
+
+
+def best(func, bundle):
+    times = []
+    for i in range(5):
+        start = time.time()
+        func(bundle)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = certgen.generate(tmp, count, content_count)
+        bundle = ''.join([open(path).read() for path in paths])
+    finally:
+        shutil.rmtree(tmp)
+    print '%d certs, %d content sets each' % (count, content_count)
+    for name, each, many in (
+            ('X509 only', load_each, _certificate.load_all),
+            ('certificates', create_each, create_many_from_pem)):
+        one = best(each, bundle)
+        bulk = best(many, bundle)
+        print '  %-12s one by one %7.3fs   bundle %7.3fs   speedup %4.2fx' % (
+                name, one, bulk, one / bulk)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [300, 100][len(args):]))
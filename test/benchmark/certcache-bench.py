@@ -0,0 +1,62 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Compares loading a directory of v3 entitlement certificates without a cache,
+while filling an empty CertificateCache, and from a warm one.
+
+Usage: python test/benchmark/certcache-bench.py [certificate count] [content sets]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import create_from_file
+
+
+def load(paths, cache_dir=None):
+    start = time.time()
+    for path in paths:
+        cert = create_from_file(path, cache_dir)
+        cert.check_path('/content/dist/rhel/server/1/6Server/x86_64/'
+                        'product1/repo1/os/repodata/repomd.xml')
+    return time.time() - start
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = certgen.generate(os.path.join(tmp, 'certs'), count,
+                                 content_count)
+        cache_dir = os.path.join(tmp, 'cache')
+        uncached = load(paths)
+        cold = load(paths, cache_dir)
+        warm = load(paths, cache_dir)
+        print '%d certs, %d content sets each' % (count, content_count)
+        print '  no cache    %7.3fs' % uncached
+        print '  cold cache  %7.3fs' % cold
+        print '  warm cache  %7.3fs   speedup %4.1fx' % (warm, uncached / warm)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [300, 100][len(args):]))
@@ -0,0 +1,158 @@
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Generates directories of entitlement certificates for the benchmarks, using
+the openssl command line tool.
+"""
+
+import base64
+import os
+import sys
+import zlib
+from subprocess import Popen, PIPE, STDOUT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'unit'))
+
+from rhsm import ourjson as json
+import pathtree_data
+
+REDHAT_OID = '1.3.6.1.4.1.2312.9'
+
+CONFIG = """
+[req]
+distinguished_name = dn
+[dn]
+[ext]
+%s
+"""
+
+
+def _openssl(*args):
+    p = Popen(('openssl',) + args, stdout=PIPE, stderr=STDOUT)
+    output = p.communicate()[0]
+    if p.returncode:
+        raise Exception('openssl %s failed: %s' % (args[0], output))
+
+
+def _utf8(oid, value):
+    # openssl expands $variables in its config files
+    value = value.replace('$', '\\$')
+    return '%s.%s = ASN1:UTF8String:%s' % (REDHAT_OID, oid, value)
+
+
+def _content(serial, content_count):
+    content = []
+    for n, path in enumerate(pathtree_data.content_paths(content_count)):
+        content.append({
+            'id': str(n),
+            'type': 'yum',
+            'name': 'content-%d-%d' % (serial, n),
+            'label': 'content-label-%d-%d' % (serial, n),
+            'vendor': 'Red Hat',
+            'path': path,
+            'gpg_url': 'file:///etc/pki/rpm-gpg/RPM-GPG-KEY-redhat-release',
+            'enabled': n % 2 == 0,
+            'arches': ['x86_64'],
+            'required_tags': ['rhel-6'],
+        })
+    return content
+
+
+def v3_extensions(serial, content_count):
+    paths = pathtree_data.content_paths(content_count)
+    tree = pathtree_data.encode_paths(paths).encode('hex')
+    return [_utf8('6', '3.2'),
+            '%s.7 = ASN1:FORMAT:HEX,OCTETSTRING:%s' % (REDHAT_OID, tree)]
+
+
+def v3_payload(serial, content_count):
+    payload = {
+        'consumer': 'c2e6d7b8-5b8c-4b7e-9b1e-%012d' % serial,
+        'quantity': 1,
+        'subscription': {'sku': 'RH%05d' % serial, 'name': 'Subscription %d' % serial,
+                         'warning': 30, 'sockets': 2,
+                         'service': {'level': 'Premium', 'type': 'L1-L3'}},
+        'order': {'number': str(serial), 'quantity': 10, 'contract': '1',
+                  'account': '1234'},
+        'products': [{'id': str(69 + serial % 10), 'name': 'Product %d' % serial,
+                      'version': '6.4', 'architectures': ['x86_64'],
+                      'content': _content(serial, content_count)}],
+        'pool': {'id': 'ff8080813d2a8c9b013d2a8d4c0b%04d' % serial},
+    }
+    data = base64.b64encode(zlib.compress(json.dumps(payload)))
+    lines = [data[i:i + 64] for i in range(0, len(data), 64)]
+    return '-----BEGIN ENTITLEMENT DATA-----\n%s\n' \
+            '-----END ENTITLEMENT DATA-----\n' % '\n'.join(lines)
+
+
+def v1_extensions(serial, content_count):
+    exts = [_utf8('4.1', 'Subscription %d' % serial),
+            _utf8('4.2', str(serial)),
+            _utf8('4.3', 'RH%05d' % serial),
+            _utf8('4.5', '10'),
+            _utf8('4.12', '30'),
+            _utf8('1.%d.1' % (69 + serial % 10), 'Product %d' % serial),
+            _utf8('1.%d.3' % (69 + serial % 10), 'x86_64')]
+    for n, path in enumerate(pathtree_data.content_paths(content_count)):
+        exts.append(_utf8('2.%d.1' % n, 'yum'))
+        exts.append(_utf8('2.%d.1.1' % n, 'content-%d-%d' % (serial, n)))
+        exts.append(_utf8('2.%d.1.2' % n, 'content-label-%d-%d' % (serial, n)))
+        exts.append(_utf8('2.%d.1.5' % n, 'Red Hat'))
+        exts.append(_utf8('2.%d.1.6' % n, path))
+        exts.append(_utf8('2.%d.1.8' % n, '1'))
+    return exts
+
+
+def generate(directory, count, content_count=100, version=3):
+    """
+    Writes "count" entitlement certificates, and a key for each of them, to
+    the directory.
+
+    :return:    list of paths of the certificates
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    key_path = os.path.join(directory, 'signing.key')
+    _openssl('genrsa', '-out', key_path, '2048')
+    key = open(key_path).read()
+    config_path = os.path.join(directory, 'openssl.cnf')
+    paths = []
+    for serial in range(1, count + 1):
+        if version == 3:
+            extensions = v3_extensions(serial, content_count)
+        else:
+            extensions = v1_extensions(serial, content_count)
+        f = open(config_path, 'w')
+        f.write(CONFIG % '\n'.join(extensions))
+        f.close()
+
+        path = os.path.join(directory, '%d.pem' % serial)
+        _openssl('req', '-new', '-x509', '-key', key_path,
+                 '-subj', '/CN=%d' % serial, '-set_serial', str(serial),
+                 '-days', '365', '-config', config_path,
+                 '-extensions', 'ext', '-out', path)
+        if version == 3:
+            f = open(path, 'a')
+            f.write(v3_payload(serial, content_count))
+            f.close()
+        f = open(os.path.join(directory, '%d-key.pem' % serial), 'w')
+        f.write(key)
+        f.close()
+        paths.append(path)
+    os.unlink(key_path)
+    os.unlink(config_path)
+    return paths
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times an expiry sweep over a directory of v3 entitlement certificates, which
+only looks at their dates, against loading them and reading every payload
+section. Each runs in a child process so that its peak memory can be
+reported too.
+
+Usage: python test/benchmark/certscan-bench.py [certificate count] [content sets]
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import create_from_file
+
+
+def sweep(paths):
+    certs = [create_from_file(path) for path in paths]
+    return [cert for cert in certs if not cert.is_valid()]
+
+
+def full(paths):
+    certs = [create_from_file(path) for path in paths]
+    for cert in certs:
+        cert.order, cert.content, cert.products, cert.pool
+    return certs
+
+
+def run(func, paths):
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        start = time.time()
+        func(paths)
+        elapsed = time.time() - start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write, '%f %d' % (elapsed, rss))
+        os._exit(0)
+    os.close(write)
+    result = os.read(read, 100).split()
+    os.waitpid(pid, 0)
+    return float(result[0]), int(result[1])
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = certgen.generate(tmp, count, content_count)
+        print '%d certs, %d content sets each' % (count, content_count)
+        for name, func in (('expiry sweep', sweep), ('all sections', full)):
+            elapsed, rss = run(func, paths)
+            print '  %-14s %7.3fs   peak rss %6d KiB' % (name, elapsed, rss)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [300, 100][len(args):]))
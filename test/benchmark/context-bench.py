@@ -0,0 +1,65 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times getting the SSL context Restlib makes its connections with, from a CA
+directory of many certificates, building it every time and through the
+context cache.
+
+Usage: python test/benchmark/context-bench.py [calls] [CA certificates]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.connection import Restlib
+
+
+def main(calls, count):
+    tmp = tempfile.mkdtemp()
+    try:
+        ca_dir = os.path.join(tmp, 'ca')
+        paths = certgen.generate(ca_dir, count, 1)
+        cert_file = os.path.join(tmp, 'cert.pem')
+        key_file = os.path.join(tmp, 'key.pem')
+        shutil.move(paths[0], cert_file)
+        shutil.move(os.path.join(ca_dir, '1-key.pem'), key_file)
+        for name in os.listdir(ca_dir):
+            if name.endswith('-key.pem'):
+                os.unlink(os.path.join(ca_dir, name))
+
+        restlib = Restlib('localhost', 8443, '/candlepin', ca_dir=ca_dir,
+                          cert_file=cert_file, key_file=key_file)
+        for name, get in (('built each time', restlib._create_context),
+                          ('cached', restlib._get_context)):
+            start = time.time()
+            for i in range(calls):
+                get()
+            elapsed = time.time() - start
+            print '%s: %d contexts from %d CA certs in %.3fs (%.2f ms ' \
+                  'each)' % (name, calls, count - 1, elapsed,
+                             elapsed * 1000 / calls)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 41][len(args):]))
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times reading the Red Hat extensions of a v1 entitlement certificate, the
+way _CertFactory used to (get_all_extensions, then OID.ltrim of every
+extension) and with get_extensions filtering on the namespace in C.
+
+Usage: python test/benchmark/extensions-bench.py [content set count ...]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm import _certificate
+from rhsm.certificate import Extensions, OID
+from rhsm.certificate2 import REDHAT_OID_NAMESPACE
+
+
+def all_then_ltrim(x509):
+    extensions = Extensions(dict((OID(oid), value) for oid, value in
+                                 x509.get_all_extensions().items()))
+    return extensions.ltrim(len(OID(REDHAT_OID_NAMESPACE)))
+
+
+def namespace(x509):
+    return Extensions(dict((OID(oid), value) for oid, value in
+                           x509.get_extensions(REDHAT_OID_NAMESPACE)))
+
+
+def rate(func, x509, seconds=1.0):
+    count = 0
+    start = time.time()
+    while True:
+        func(x509)
+        count += 1
+        elapsed = time.time() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main(counts):
+    for count in counts:
+        tmp = tempfile.mkdtemp()
+        try:
+            path = certgen.generate(tmp, 1, count, version=1)[0]
+            x509 = _certificate.load(path)
+        finally:
+            shutil.rmtree(tmp)
+        extensions = len(x509.get_all_extensions())
+        old = rate(all_then_ltrim, x509)
+        new = rate(namespace, x509)
+        print '%5d extensions   all + ltrim %7.1f/s   namespace %7.1f/s' \
+              '   speedup %4.1fx' % (extensions, old, new, new / old)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 500])
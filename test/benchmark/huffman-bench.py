@@ -0,0 +1,107 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Compares building a PathTree with the HuffmanTable decoder against the
+original decoder, which probes a dict of code strings one bit at a time.
+
+Usage: python test/benchmark/huffman-bench.py [content set count ...]
+"""
+
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'unit'))
+
+from rhsm.bitstream import GhettoBitStream
+from rhsm.huffman import HuffmanNode
+from rhsm.pathtree import PathTree, PATH_END
+import pathtree_data
+
+FIXTURE = os.path.join(HERE, '..', 'unit', 'entitlement_data.bin')
+
+
+def get_leaf_from_dict(code_dict, bitstream):
+    """
+    Given a bit stream and dictionary where keys are huffman codes, return
+    the value from that dictionary that corresponds to the next huffman
+    code in the stream.
+    """
+    code = ''
+    for bit in bitstream:
+        code += bit
+        if code in code_dict:
+            return code_dict[code]
+
+
+def legacy_path_tree(data):
+    """
+    PathTree construction as it was done before HuffmanTable existed.
+    """
+    word_leaves, unused_bits = PathTree._unpack_data(data)
+    HuffmanNode.build_tree(word_leaves)
+    word_dict = dict((node.code, node.value) for node in word_leaves)
+    bitstream = GhettoBitStream(unused_bits)
+    path_leaves = PathTree._generate_path_leaves(bitstream)
+    HuffmanNode.build_tree(path_leaves)
+    path_dict = dict((node.code, node) for node in path_leaves)
+
+    values = [leaf.value for leaf in path_leaves]
+    root = {}
+    values.insert(0, root)
+    for value in values:
+        while True:
+            word = get_leaf_from_dict(word_dict, bitstream)
+            if not word:
+                break
+            path_node = get_leaf_from_dict(path_dict, bitstream)
+            value.setdefault(word, []).append(path_node.value)
+    for value in values:
+        if not value:
+            value[PATH_END] = None
+    return root
+
+
+def best_of(func, data, repeat=3, number=1):
+    times = []
+    for x in range(repeat):
+        start = time.time()
+        for y in range(number):
+            func(data)
+        times.append((time.time() - start) / number)
+    return min(times)
+
+
+def compare(label, data, number=1):
+    legacy = best_of(legacy_path_tree, data, number=number)
+    table = best_of(PathTree, data, number=number)
+    print '%-28s legacy %9.3f ms   table %9.3f ms   speedup %5.1fx' % (
+            label, legacy * 1000, table * 1000, legacy / table)
+
+
+def main(counts):
+    compare('fixture (entitlement_data)', open(FIXTURE).read(), number=1000)
+    for count in counts:
+        data = pathtree_data.encode_paths(pathtree_data.content_paths(count))
+        # sanity check that both decoders agree
+        assert legacy_path_tree(data) == PathTree(data).path_tree
+        compare('%d content sets' % count, data)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times finding the certificates providing each repo of a directory of
+entitlement certificates, by scanning their content and with an
+EntitlementIndex.
+
+Usage: python test/benchmark/index-bench.py [certificate count] [content sets]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import load_directory
+from rhsm.certificate2 import EntitlementIndex
+
+
+def scan(certs, label):
+    found = []
+    for cert in certs:
+        for content in cert.content:
+            if content.label == label:
+                found.append((cert, content))
+    return found
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        certgen.generate(tmp, count, content_count)
+        certs = load_directory(tmp)[0].values()
+        labels = [content.label for cert in certs for content in cert.content]
+
+        start = time.time()
+        for label in labels:
+            scan(certs, label)
+        scanned = time.time() - start
+
+        start = time.time()
+        index = EntitlementIndex(certs)
+        for label in labels:
+            index.get_content(label)
+        indexed = time.time() - start
+
+        print '%d certs, %d repos: scanning %.3fs, index %.3fs' % \
+              (count, len(labels), scanned, indexed)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [50, 100][len(args):]))
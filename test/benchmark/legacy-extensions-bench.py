@@ -0,0 +1,63 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times loading a directory of v1 entitlement certificates with the deprecated
+rhsm.certificate.EntitlementCertificate class, counting the processes forked
+while doing so.
+
+Usage: python test/benchmark/legacy-extensions-bench.py [certificate count] [content sets]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import certgen
+
+from rhsm.certificate import EntitlementCertificate
+
+forks = [0]
+_fork = os.fork
+
+
+def counting_fork():
+    forks[0] += 1
+    return _fork()
+
+
+def main(count, content_count):
+    warnings.simplefilter('ignore', DeprecationWarning)
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = certgen.generate(tmp, count, content_count, version=1)
+        os.fork = counting_fork
+        start = time.time()
+        for path in paths:
+            EntitlementCertificate(open(path).read())
+        elapsed = time.time() - start
+        os.fork = _fork
+        print '%d v1 certs, %d content sets each: %.3fs, %d processes ' \
+              'forked' % (count, content_count, elapsed, forks[0])
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [100, 20][len(args):]))
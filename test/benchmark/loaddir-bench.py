@@ -0,0 +1,68 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Compares loading a directory of entitlement certificates by calling
+create_from_file on each file with load_directory and various numbers of
+worker threads.
+
+Usage: python test/benchmark/loaddir-bench.py [certificate count] [content sets]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import create_from_file, load_directory
+
+
+def loop(directory):
+    certs = {}
+    for name in os.listdir(directory):
+        if name.endswith('.pem') and not name.endswith('-key.pem'):
+            cert = create_from_file(os.path.join(directory, name))
+            certs[cert.serial] = cert
+    return certs
+
+
+def best(func, *args):
+    times = []
+    for i in range(3):
+        start = time.time()
+        func(*args)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        certgen.generate(tmp, count, content_count)
+        print '%d certs, %d content sets each' % (count, content_count)
+        print '  create_from_file loop      %7.3fs' % best(loop, tmp)
+        for workers in (1, 2, 4, 8):
+            print '  load_directory %d workers   %7.3fs' % (
+                    workers, best(load_directory, tmp, None, workers))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [300, 100][len(args):]))
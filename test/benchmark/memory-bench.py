@@ -0,0 +1,65 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Reports the resident memory taken by each loaded entitlement certificate,
+with its order, products and content built.
+
+Usage: python test/benchmark/memory-bench.py [certificate count] [content sets] [version]
+"""
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+
+import certgen
+
+from rhsm.certificate import create_from_file
+
+
+def resident():
+    """
+    :return:    resident memory of this process in bytes
+    """
+    f = open('/proc/self/statm')
+    pages = int(f.read().split()[1])
+    f.close()
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def main(count, content_count, version):
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = certgen.generate(tmp, count, content_count, version=version)
+        gc.collect()
+        before = resident()
+        certs = []
+        for path in paths:
+            cert = create_from_file(path)
+            cert.order, cert.products, cert.content
+            certs.append(cert)
+        gc.collect()
+        used = resident() - before
+        print '%d v%d certs, %d content sets each: %d bytes per cert' % \
+              (count, version, content_count, used / count)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 200, 3][len(args):]))
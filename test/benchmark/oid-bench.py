@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times building and querying the extension maps of many v1-style
+certificates, and reports the memory they take.
+
+Usage: python test/benchmark/oid-bench.py [certificate count] [content sets]
+"""
+
+import gc
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from rhsm.certificate import Extensions, OID
+
+CONTENT_NAMESPACE = '1.3.6.1.4.1.2312.9.2'
+CONTENT_FIELDS = ('1', '1.1', '1.2', '1.5', '1.6', '1.8')
+
+
+def main(count, content_count):
+    gc.collect()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    certs = []
+    for cert in range(count):
+        d = {}
+        for n in range(content_count):
+            for field in CONTENT_FIELDS:
+                d[OID('%s.%d.%s' % (CONTENT_NAMESPACE, n, field))] = field
+        certs.append(Extensions(d))
+    built = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+
+    start = time.time()
+    for extensions in certs:
+        for n in range(content_count):
+            extensions.get(OID('%s.%d.1.6' % (CONTENT_NAMESPACE, n)))
+            extensions['%s.%d.1.1' % (CONTENT_NAMESPACE, n)]
+    looked_up = time.time() - start
+
+    print '%d certs, %d extensions each: built in %.3fs (+%d KiB), ' \
+          '%d lookups in %.3fs' % (count, content_count * len(CONTENT_FIELDS),
+                                   built, rss, count * content_count * 2,
+                                   looked_up)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 200][len(args):]))
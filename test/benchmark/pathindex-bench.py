@@ -0,0 +1,97 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Compares finding every certificate that authorizes a path with a PathIndex
+against calling match_path on the PathTree of each certificate in turn.
+
+Usage: python test/benchmark/pathindex-bench.py [certificate count ...]
+"""
+
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'unit'))
+
+from rhsm.pathtree import PathIndex, PathTree
+import pathtree_data
+
+# content sets per certificate
+CONTENT = 50
+
+
+def cert_paths(serial):
+    return [path.replace('product', 'product%d-' % serial)
+            for path in pathtree_data.content_paths(CONTENT)]
+
+
+class TreeCert(object):
+    """
+    Stands in for a v3 entitlement certificate with the given content paths.
+    """
+
+    def __init__(self, serial, paths):
+        self.serial = serial
+        self.tree = PathTree(pathtree_data.encode_paths(paths))
+
+    def entitled_paths(self):
+        return self.tree.paths()
+
+    def check_path(self, path):
+        return self.tree.match_path(path)
+
+
+def rate(func, reqs, seconds=1.0):
+    count = 0
+    start = time.time()
+    while True:
+        for path in reqs:
+            func(path)
+        count += len(reqs)
+        elapsed = time.time() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main(counts):
+    for count in counts:
+        trees = {}
+        index = PathIndex()
+        reqs = []
+        for serial in range(count):
+            paths = cert_paths(serial)
+            cert = TreeCert(serial, paths)
+            trees[serial] = cert.tree
+            index.add_cert(cert)
+            path = paths[serial % CONTENT].replace('$releasever', '6Server')
+            reqs.append(path.replace('$basearch', 'x86_64') + '/repodata')
+
+        def loop(path):
+            return set(serial for serial, tree in trees.items()
+                       if tree.match_path(path))
+
+        for path in reqs:
+            assert loop(path) == index.match_all(path)
+        looped = rate(loop, reqs)
+        indexed = rate(index.match_all, reqs)
+        print '%4d certs   per-cert loop %8d req/s   index %8d req/s' % (
+                count, looped, indexed)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 500])
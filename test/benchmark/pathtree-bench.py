@@ -0,0 +1,107 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Measures path checks per second against a v3 path tree, comparing the
+compiled matcher used by PathTree.match_path with the original recursive
+traversal of the nested dicts. Each check includes the posixpath.normpath
+call that EntitlementCertificate.check_path makes.
+
+Usage: python test/benchmark/pathtree-bench.py [content set count ...]
+"""
+
+import os
+import posixpath
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'unit'))
+
+from rhsm.pathtree import PathTree, PATH_END
+import pathtree_data
+
+
+def traverse_tree(tree, words):
+    """
+    The recursive matcher PathTree used before it compiled its tree.
+    """
+    if PATH_END in tree:
+        return True
+    if words:
+        if words[0] in tree:
+            words_to_try = [words[0]]
+        else:
+            words_to_try = [word for word in tree.keys() if word.startswith('$')]
+        for word in words_to_try:
+            for child in tree[word]:
+                if traverse_tree(child, words[1:]):
+                    return True
+    return False
+
+
+def recursive_check(path_tree, path):
+    path = posixpath.normpath(path)
+    return traverse_tree(path_tree.path_tree, path.strip('/').split('/'))
+
+
+def compiled_check(path_tree, path):
+    return path_tree.match_path(posixpath.normpath(path))
+
+
+def requests(paths):
+    """
+    A mix of authorized package requests and requests that get denied.
+    """
+    reqs = []
+    for path in paths:
+        path = path.replace('$releasever', '6Server')
+        path = path.replace('$basearch', 'x86_64')
+        reqs.append(path + '/Packages/bash-4.1.2-15.el6_4.x86_64.rpm')
+        reqs.append(path.replace('/os', '/source') + '/SRPMS/bash.src.rpm')
+        reqs.append(path.replace('/product', '/otherproduct'))
+    return reqs
+
+
+def rate(check, path_tree, reqs, seconds=1.0):
+    count = 0
+    start = time.time()
+    while True:
+        for path in reqs:
+            check(path_tree, path)
+        count += len(reqs)
+        elapsed = time.time() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main(counts):
+    for count in counts:
+        paths = pathtree_data.content_paths(count)
+        path_tree = PathTree(pathtree_data.encode_paths(paths))
+        reqs = requests(paths[:200])
+        for path in reqs:
+            assert recursive_check(path_tree, path) == \
+                    compiled_check(path_tree, path)
+        recursive = rate(recursive_check, path_tree, reqs)
+        compiled = rate(compiled_check, path_tree, reqs)
+        print '%5d content sets   recursive %8d req/s   compiled %8d req/s' \
+              '   speedup %4.1fx' % (count, recursive, compiled,
+                                     compiled / recursive)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 5000])
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Reports the time and memory taken to build the order, products, pool and
+content of a v3 entitlement certificate with many content sets: the peak
+while building them, and what is kept once they are built.
+
+Usage: python test/benchmark/payload-bench.py [content sets]
+"""
+
+import gc
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import create_from_file
+
+
+def resident():
+    f = open('/proc/self/statm')
+    pages = int(f.read().split()[1])
+    f.close()
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(path):
+    cert = create_from_file(path)
+    gc.collect()
+    before = resident()
+    start = time.time()
+    cert.order, cert.products, cert.pool, cert.content
+    elapsed = time.time() - start
+    gc.collect()
+    kept = resident() - before
+    # ru_maxrss is in KiB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - before
+    print '%d content sets: %.3fs, peak +%d KiB, kept +%d KiB' % \
+          (len(cert.content), elapsed, peak / 1024, kept / 1024)
+
+
+def main(content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        path = certgen.generate(tmp, 1, content_count)[0]
+        # measure in a fresh process, as generating the certificate raises
+        # the peak memory of this one
+        subprocess.call([sys.executable, __file__, '--measure', path])
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(sys.argv[2])
+    else:
+        args = [int(arg) for arg in sys.argv[1:]]
+        main(*(args + [20000][len(args):]))
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times REST calls made with Restlib to a local HTTPS server standing in for
+candlepin: making a new connection for each call, with and without resuming
+the SSL session of the previous one, and with kept alive connections.
+
+Usage: python test/benchmark/restlib-bench.py [calls]
+"""
+
+import os
+import shutil
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from subprocess import Popen, PIPE, STDOUT
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from rhsm.connection import Restlib, SessionCache
+
+STATUS = '{"result": true, "version": "0.8.0", "release": "1"}'
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # write each response at once, rather than a line at a time
+    wbufsize = -1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(STATUS)))
+        self.end_headers()
+        self.wfile.write(STATUS)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+def serve(directory):
+    """
+    Start an HTTPS server on a free local port in a thread.
+
+    :return:    the server
+    """
+    cert = os.path.join(directory, 'server.pem')
+    p = Popen(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+               '-subj', '/CN=localhost', '-days', '1', '-keyout', cert,
+               '-out', cert], stdout=PIPE, stderr=STDOUT)
+    p.communicate()
+    server = Server(('localhost', 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    context.load_cert_chain(cert)
+    # Restlib speaks TLSv1, which current openssl builds refuse by default
+    context.set_ciphers('DEFAULT:@SECLEVEL=0')
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    return server
+
+
+class NoResumption(SessionCache):
+
+    def get(self, context, server):
+        return None
+
+
+def run(port, calls, sessions=None, **kwargs):
+    restlib = Restlib('localhost', port, '/candlepin', insecure=True,
+                      **kwargs)
+    restlib.sessions = sessions or SessionCache()
+    start = time.time()
+    for i in range(calls):
+        restlib.request_get('/status/')
+    elapsed = time.time() - start
+    restlib.close()
+    return calls / elapsed, restlib.pool, restlib.sessions
+
+
+def main(calls):
+    tmp = tempfile.mkdtemp()
+    try:
+        server = serve(tmp)
+        port = server.server_address[1]
+        for name, kwargs in (('new connection per call',
+                              {'pool_size': 0, 'sessions': NoResumption()}),
+                             ('new connection per call, sessions resumed',
+                              {'pool_size': 0}),
+                             ('kept alive connections', {})):
+            rate, pool, sessions = run(port, calls, **kwargs)
+            print '%s: %.0f calls/s (%d connections for %d calls, %d ' \
+                  'sessions resumed)' % (name, rate, pool.created, calls,
+                                         sessions.hits)
+        server.shutdown()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200][len(args):]))
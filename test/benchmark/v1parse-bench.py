@@ -0,0 +1,51 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times parsing v1 entitlement certificates, which are read entirely from
+extensions, with rhsm.certificate2.
+
+Usage: python test/benchmark/v1parse-bench.py [certificate count] [content sets]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+
+import certgen
+
+from rhsm.certificate import create_from_pem
+
+
+def main(count, content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        pems = [open(path).read() for path in
+                certgen.generate(tmp, count, content_count, version=1)]
+        start = time.time()
+        for pem in pems:
+            cert = create_from_pem(pem)
+            assert len(cert.content) == content_count
+        elapsed = time.time() - start
+        print '%d v1 certs, %d content sets each: %.3fs (%.1fms per cert)' % \
+              (count, content_count, elapsed, elapsed * 1000 / count)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [20, 200][len(args):]))
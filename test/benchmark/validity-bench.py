@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Times finding the certificates valid, and those expiring, on each day of a
+year, by checking every certificate and with a ValidityIndex.
+
+Usage: python test/benchmark/validity-bench.py [certificate count]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from rhsm.certificate2 import EntitlementCertificate, Order, ValidityIndex, \
+        Version
+
+
+def main(count):
+    rand = random.Random(0)
+    epoch = datetime(2012, 1, 1)
+    certs = []
+    for serial in range(count):
+        start = epoch + timedelta(days=rand.randint(0, 1000))
+        certs.append(EntitlementCertificate(serial=serial,
+                version=Version("3.0"), start=start,
+                end=start + timedelta(days=365),
+                order=Order(warning_period=30)))
+    days = [epoch + timedelta(days=n) for n in range(0, 1365, 3)]
+
+    start = time.time()
+    for day in days:
+        [cert for cert in certs if cert.is_valid(day)]
+        [cert for cert in certs if cert.is_expiring(day)]
+    checked = time.time() - start
+
+    start = time.time()
+    index = ValidityIndex(certs)
+    for day in days:
+        index.valid_on(day)
+        index.expiring(day)
+    indexed = time.time() - start
+
+    print '%d certs, %d days: checking each cert %.3fs, index %.3fs' % \
+          (count, len(days), checked, indexed)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [2000][len(args):]))
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Measures how rhsm._certificate scales across threads: each thread loads a
+v1 entitlement certificate from PEM, reads all of its extensions and writes
+it back out as PEM, over and over. This only scales if the extension
+releases the GIL while OpenSSL does the work.
+
+Usage: python test/benchmark/x509-threads-bench.py [content sets]
+"""
+
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import certgen
+
+from rhsm import _certificate
+from rhsm.utils import init_ssl_threading
+
+SECONDS = 2.0
+
+
+def work(pem, counts, index, stop):
+    count = 0
+    while time.time() < stop:
+        x509 = _certificate.load(pem=pem)
+        x509.get_all_extensions()
+        x509.as_pem()
+        count += 1
+    counts[index] = count
+
+
+def rate(pem, thread_count):
+    init_ssl_threading()
+    counts = [0] * thread_count
+    stop = time.time() + SECONDS
+    threads = [threading.Thread(target=work, args=(pem, counts, i, stop))
+               for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / SECONDS
+
+
+def main(content_count):
+    tmp = tempfile.mkdtemp()
+    try:
+        path = certgen.generate(tmp, 1, content_count, version=1)[0]
+        pem = open(path).read()
+    finally:
+        shutil.rmtree(tmp)
+    print 'v1 certificate with %d content sets' % content_count
+    single = None
+    for thread_count in (1, 2, 4, 8):
+        total = rate(pem, thread_count)
+        single = single or total
+        print '  %d threads %8d certs/s   scaling %4.1fx' % (
+                thread_count, total, total / single)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]] or [50])
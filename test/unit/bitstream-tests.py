@@ -15,7 +15,7 @@ import os
 import unittest
 import zlib
 
-from rhsm.bitstream import GhettoBitStream
+from rhsm.bitstream import BitReader, GhettoBitStream
 
 DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                     'entitlement_data.bin')
@@ -25,36 +25,98 @@ decompresser.decompress(entitlement_data)
 tree_data = decompresser.unused_data
 
 
+class TestBitReader(unittest.TestCase):
+    def setUp(self):
+        self.bs = BitReader(tree_data)
+
+    def test_read_byte(self):
+        length = self.bs.bits_remaining()
+        first = self.bs.read_byte()
+        self.assertEqual(first, 5)
+        self.assertEqual(self.bs.bits_remaining(), length - 8)
+
+    def test_read_bits(self):
+        # first two bytes are 00000101 11111101
+        self.assertEqual(self.bs.read_bits(5), 0)
+        self.assertEqual(self.bs.read_bits(4), 11)
+        self.assertEqual(self.bs.read_bits(7), 125)
+        self.assertEqual(self.bs.position, 16)
+
+    def test_read_bits_past_end(self):
+        bs = BitReader(chr(255))
+        bs.read_bits(4)
+        self.assertRaises(IndexError, bs.read_bits, 5)
+        # a failed read does not consume anything
+        self.assertEqual(bs.read_bits(4), 15)
+
+    def test_peek_bits(self):
+        # first byte is 5
+        remaining = self.bs.bits_remaining()
+        self.assertEqual(self.bs.peek_bits(8), 5)
+        self.assertEqual(self.bs.peek_bits(6), 1)
+        # peeking does not consume anything
+        self.assertEqual(self.bs.bits_remaining(), remaining)
+        self.assertEqual(self.bs.read_byte(), 5)
+
+    def test_bytearray(self):
+        bs = BitReader(bytearray([5, 253]))
+        self.assertEqual(bs.read_bits(5), 0)
+        self.assertEqual(bs.read_bits(11), 1533)
+        self.assertEqual(bs.bits_remaining(), 0)
+
+    def test_peek_bits_past_end(self):
+        bs = BitReader(chr(255))
+        self.assertEqual(bs.peek_bits(10), 1020)
+        bs.skip_bits(8)
+        self.assertEqual(bs.peek_bits(3), 0)
+
+    def test_skip_bits(self):
+        bs = BitReader(chr(15) + chr(1))
+        bs.skip_bits(4)
+        self.assertEqual(bs.bits_remaining(), 12)
+        self.assertEqual(bs.peek_bits(4), 15)
+        bs.skip_bits(11)
+        self.assertEqual(bs.read_bits(1), 1)
+        self.assertEqual(bs.bits_remaining(), 0)
+        bs.skip_bits(3)
+        self.assertEqual(bs.bits_remaining(), 0)
+
+
 class TestGhettoBitStream(unittest.TestCase):
     def setUp(self):
         self.bs = GhettoBitStream(tree_data)
 
     def test_pop_byte(self):
-        length = len(self.bs.bytes)
+        length = self.bs.bits_remaining()
         first = self.bs.pop_byte()
         self.assertEqual(first, 5)
-        self.assertEqual(len(self.bs.bytes), length - 1)
+        self.assertEqual(self.bs.bits_remaining(), length - 8)
+
+    def test_pop_byte_after_bits(self):
+        bs = GhettoBitStream(chr(5) + chr(253) + chr(1) + chr(2))
+        self.assertEqual(bs.next(), '0')
+        # the next whole byte is popped, and the rest of the partially
+        # consumed byte is still iterated over before the bytes after it
+        self.assertEqual(bs.pop_byte(), 253)
+        self.assertEqual(bs.pop_byte(), 1)
+        self.assertEqual(''.join(bs), '0000101' + '00000010')
+
+    def test_pop_byte_after_bits_empty(self):
+        bs = GhettoBitStream(chr(5))
+        bs.next()
+        self.assertRaises(IndexError, bs.pop_byte)
+        self.assertEqual(''.join(bs), '0000101')
+
+    def test_pop_byte_empty(self):
+        self.assertRaises(IndexError, GhettoBitStream('').pop_byte)
 
     def test_as_iterator(self):
         self.bs.next()
         self.assertTrue(list(self.bs))
 
-    def test_bit_buffer(self):
-        byte_count = len(self.bs.bytes)
-        # empty buffer
-        self.assertEqual(len(self.bs._bit_buffer), 0)
-
-        bit = self.bs.next()
-        # one byte decoded, then one bit consumed
-        self.assertEqual(len(self.bs._bit_buffer), 7)
-        # one byte removed
-        self.assertEqual(len(self.bs.bytes), byte_count - 1)
-
-        bit = self.bs.next()
-        # another bit consumed
-        self.assertEqual(len(self.bs._bit_buffer), 6)
-        # remaining bytes still stand
-        self.assertEqual(len(self.bs.bytes), byte_count - 1)
+    def test_iterate_bits(self):
+        bits = list(GhettoBitStream(chr(5) + chr(253)))
+        self.assertEqual(''.join(bits), '0000010111111101')
 
     def test_byte_to_bits(self):
         # just spot-checking
@@ -246,3 +246,21 @@ X6IYCJfN6Y6ywZDD0o+ISr2gpEh24nW+ZSHRpPxgirlm1/SFN4gT+UQrCRn5as6v
 t3EKmOyL75TqMEhhNiKuEd0sfIkBqgVh9+980hXBGruIANL2syxDeYY=
 -----END CERTIFICATE-----
 """
+
+# Valid until 2108, after 2049 the not after date is a GeneralizedTime
+# rather than a UTCTime.
+GENERALIZED_TIME_CERT = """
+-----BEGIN CERTIFICATE-----
+MIIB+DCCAWGgAwIBAgICEJIwDQYJKoZIhvcNAQELBQAwFjEUMBIGA1UEAwwLZ2Vu
+ZXJhbGl6ZWQwIBcNMjYxMDE2MTk0MjIyWhgPMjEwODEyMDUxOTQyMjJaMBYxFDAS
+BgNVBAMMC2dlbmVyYWxpemVkMIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQDP
+2lr9OPn8pgPifPGUQYtcKmwt/n+1h+iIXPNvWa4p1Xro7EcJMrv2q8KpamWHWBh2
+D3JcoO5nqq1LRjY5+WB9egp43CwtyS2HA38Hj1iMnj434BSzsawpdMQ4E0e/Cc/1
+hup0UjamYsfoMcuvk6vD4J/Ss0VaaCKr9TxkbGROfwIDAQABo1MwUTAdBgNVHQ4E
+FgQUQVgXSf1otGBLX+nN7nl/yHEi3d4wHwYDVR0jBBgwFoAUQVgXSf1otGBLX+nN
+7nl/yHEi3d4wDwYDVR0TAQH/BAUwAwEB/zANBgkqhkiG9w0BAQsFAAOBgQBNJ5xq
++V/gEutnf3OxktVASvclOgYoabeqgxvYLk5u8kYVe95e1y+4l+AOfvFfsWbOHoLi
+U5UdOtQQLrS1Puk1uXaLaY8B5Umq0X3lELdx/7JgaMvF7V9nKsP3jU0nT/D8rwyw
+BzP1ddV4xFvztgHOU+Ljv0SBokaGH8dLhbr5iQ==
+-----END CERTIFICATE-----
+"""
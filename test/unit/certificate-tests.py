@@ -14,8 +14,12 @@
 #
 
 import unittest
+import warnings
 
-from rhsm.certificate import Key, Content
+import certdata
+from mock import patch
+from rhsm.certificate import Key, Content, Certificate, \
+        EntitlementCertificate, Extensions, OID
 
 
 class KeyTests(unittest.TestCase):
@@ -84,3 +88,148 @@ class ContentTests(unittest.TestCase):
         self.assertEqual(c, d)
         self.assertEqual(c, e)
         self.assertNotEqual(c, f)
+
+
+class CertificateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.filters = warnings.filters[:]
+        warnings.simplefilter('ignore', DeprecationWarning)
+        self.cert = Certificate(certdata.IDENTITY_CERT)
+
+    def tearDown(self):
+        warnings.filters[:] = self.filters
+
+    def test_valid_range(self):
+        valid_range = self.cert.validRange()
+        self.assertEqual(2012, valid_range.begin().year)
+        self.assertEqual(2028, valid_range.end().year)
+        # parsed once, then reused by valid(), expired() and __cmp__
+        self.assertTrue(valid_range is self.cert.validRange())
+
+    def test_update_resets_valid_range(self):
+        self.cert.validRange()
+        self.cert._update(certdata.PRODUCT_CERT_V1_0)
+        self.assertEqual(self.cert.validRange().end(),
+                         Certificate(certdata.PRODUCT_CERT_V1_0).validRange().end())
+
+
+class ExtensionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.filters = warnings.filters[:]
+        warnings.simplefilter('ignore', DeprecationWarning)
+
+    def tearDown(self):
+        warnings.filters[:] = self.filters
+
+    @patch('os.fork')
+    def test_no_subprocess(self, fork):
+        fork.side_effect = AssertionError('forked')
+        cert = EntitlementCertificate(certdata.ENTITLEMENT_CERT_V1_0)
+        self.assertFalse(fork.called)
+        self.assertEqual('Awesome OS for x86_64', cert.getOrder().getName())
+
+    def test_redhat_extensions_only(self):
+        cert = Certificate(certdata.ENTITLEMENT_CERT_V1_0)
+        extensions = cert.extensions()
+        self.assertEqual(49, len(extensions))
+        for oid in extensions:
+            self.assertTrue(str(oid).startswith('1.3.6.1.4.1.2312.9.'))
+        self.assertEqual('Awesome OS for x86_64',
+                         extensions[OID('1.3.6.1.4.1.2312.9.4.1')])
+
+    def test_identity_cert_has_no_custom_extensions(self):
+        self.assertEqual({}, Certificate(certdata.IDENTITY_CERT).extensions())
+
+
+class ExtensionsLookupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.extensions = Extensions({
+            OID('1.69.1'): 'product 69',
+            OID('1.69.3'): 'x86_64',
+            OID('1.70.1'): 'product 70',
+            OID('2.1.1'): 'yum',
+            OID('2.1.1.1'): 'content 1',
+            OID('2.10.1'): 'yum',
+            OID('2.10.1.1'): 'content 10',
+            OID('2.2.1'): 'file',
+            OID('2.2.1.1'): 'content 2',
+            OID('4.1'): 'order',
+        })
+
+    def _scan(self, extensions, pattern):
+        # What find() returns, by matching every key
+        found = []
+        for oid, value in extensions.items():
+            if oid.match(OID(pattern)):
+                found.append((str(oid), value))
+        found.sort()
+        return found
+
+    def _find(self, pattern, *args):
+        return [(str(oid), value) for oid, value in
+                self.extensions.find(pattern, *args)]
+
+    def test_find_matches_scan(self):
+        for pattern in ('1.69.1', '1.*.1', '2.*.1.1', '*.*', '2.*.',
+                        '2.1.', '1.', '.1', '.1.1', '*.10.1.', '3.1',
+                        '2.1.1.1.1'):
+            found = self._find(pattern)
+            found.sort()
+            self.assertEqual(self._scan(self.extensions, pattern), found)
+
+    def test_find_numeric_order(self):
+        self.assertEqual(['2.1.1.1', '2.2.1.1', '2.10.1.1'],
+                         [oid for oid, value in self._find('2.*.1.1')])
+
+    def test_find_limit(self):
+        self.assertEqual([('2.1.1', 'yum')], self._find('2.*.1', 1))
+        self.assertEqual(1, len(self._find('2.*.1', 1, True)))
+
+    def test_get(self):
+        self.assertEqual('x86_64', self.extensions.get('1.69.3'))
+        self.assertEqual('x86_64', self.extensions.get(OID('1.*.3')))
+        self.assertEqual('content 10', self.extensions.get('.10.1.1'))
+        self.assertEqual('missing', self.extensions.get('1.71.1', 'missing'))
+
+    def test_branch(self):
+        branch = self.extensions.branch('2.10')
+        self.assertEqual(2, len(branch))
+        self.assertEqual('yum', branch.get('1'))
+        self.assertEqual('content 10', branch.get('1.1'))
+        self.assertEqual([('1.1', 'content 10')],
+                         [(str(oid), value) for oid, value in
+                          branch.find('1.*')])
+
+    def test_branch_wildcard(self):
+        branch = self.extensions.branch('1.*')
+        self.assertEqual(set(['1', '3']),
+                         set([str(oid) for oid in branch.keys()]))
+
+    def test_branch_of_branch(self):
+        branch = self.extensions.branch('2').branch('1')
+        self.assertEqual('yum', branch.get('1'))
+        self.assertEqual('content 1', branch.get('1.1'))
+
+    def test_branch_missing(self):
+        self.assertEqual({}, self.extensions.branch('3'))
+        self.assertEqual([], self.extensions.branch('3').find('*'))
+
+    def test_modified_after_lookup(self):
+        self.assertEqual(3, len(self._find('2.*.1')))
+        self.extensions[OID('2.3.1')] = 'kickstart'
+        self.assertEqual(4, len(self._find('2.*.1')))
+        del self.extensions[OID('2.1.1')]
+        self.assertEqual(3, len(self._find('2.*.1')))
+        self.extensions.update({OID('2.4.1'): 'yum'})
+        self.assertEqual(4, len(self._find('2.*.1')))
+        self.extensions.clear()
+        self.assertEqual([], self._find('2.*.1'))
+
+    def test_modified_branch(self):
+        branch = self.extensions.branch('2.1')
+        branch[OID('1.2')] = 'label'
+        self.assertEqual('label', branch.get(OID('*.2')))
+        self.assertEqual(None, self.extensions.get(OID('2.1.*.2')))
@@ -13,13 +13,28 @@
 # in this software or its documentation.
 #
 
-from datetime import datetime
+import base64
+import calendar
+import cPickle
+from datetime import datetime, timedelta
+import mmap
+import os
+import random
+import shutil
+import tempfile
+import threading
 import types
 import unittest
+import zlib
 
 import certdata
-from rhsm.certificate import create_from_pem, CertificateException
+from rhsm.certificate import create_from_file, create_from_pem, \
+        create_many_from_pem, load_directory, CertificateException, \
+        get_datetime_from_x509
 from rhsm.certificate2 import *
+from rhsm import _certificate
+from rhsm import ourjson as json
+from rhsm.utils import init_ssl_threading
 
 from mock import patch
 
@@ -114,14 +129,21 @@ class V1EntCertTests(unittest.TestCase):
         self.assertFalse(self.ent_cert.check_path('/foo/'))
         self.assertFalse(self.ent_cert.check_path('/foo/path/'))
 
-    @patch('rhsm.certificate2.EntitlementCertificate._validate_v1_url')
-    def test_download_url_identification(self, mock_validate):
-        # there are 4 OIDs in the testing cert that should be checked, and
-        # many others that should not. This verifies that exactly 4 OIDs get
-        # checked.
-        mock_validate.return_value = False
-        self.ent_cert.check_path('/foo')
-        self.assertEqual(mock_validate.call_count, 4)
+    def test_entitled_paths(self):
+        self.assertEqual(sorted(self.ent_cert.entitled_paths()),
+                         ['/foo/path/always/$releasever', '/foo/path/never',
+                          '/path/to/$basearch/$releasever/awesomeos',
+                          '/path/to/awesomeos/x86_64'])
+
+    def test_download_url_identification(self):
+        # there are 4 OIDs in the testing cert that are download URLs, and
+        # many others that are not. This verifies that exactly 4 get used.
+        self.assertEqual(len(self.ent_cert._v1_urls), 4)
+
+    def test_check_path_segments(self):
+        # a URL only matches whole path segments
+        self.assertFalse(self.ent_cert.check_path('/foo/path/neverland'))
+        self.assertFalse(self.ent_cert.check_path('/path/to/foo/awesomeos'))
 
     # TODO: test exception when cert major version is newer than we can handle
 
@@ -221,9 +243,233 @@ class V3CertTests(unittest.TestCase):
     def test_match_deep_path(self):
         self.assertTrue(self.ent_cert.check_path('/path/to/awesomeos/x86_64/foo/bar'))
 
+    def test_entitled_paths(self):
+        self.assertEqual(sorted(self.ent_cert.entitled_paths()),
+                         ['/foo/path/always/$releasever', '/foo/path/never',
+                          '/path/to/$basearch/$releasever/awesomeos',
+                          '/path/to/awesomeos/x86_64'])
+
     def test_missing_pool(self):
         self.assertEquals(None, self.ent_cert.pool)
 
+    def test_payload_parsed_on_demand(self):
+        self.assertTrue(self.ent_cert.is_valid(on_date=datetime(2012, 12, 1)))
+        self.assertEquals({}, self.ent_cert._sections)
+        self.assertTrue(self.ent_cert._payload_dict is None)
+
+        self.assertEquals("awesomeos-x86_64", self.ent_cert.order.sku)
+        self.assertEquals(['order'], self.ent_cert._sections.keys())
+        self.assertFalse(self.ent_cert._payload_dict is None)
+
+        self.ent_cert.content
+        self.ent_cert.products
+        self.ent_cert.pool
+        # nothing left to build, so the decompressed payload is dropped
+        self.assertTrue(self.ent_cert._payload_dict is None)
+        self.assertEquals(4, len(self.ent_cert.content))
+
+    def test_set_section(self):
+        self.ent_cert.content = []
+        self.assertEquals([], self.ent_cert.content)
+        self.assertEquals(1, len(self.ent_cert.products))
+
+    def test_bad_payload_raises_on_access(self):
+        cert = EntitlementCertificate(serial=1, version=Version("3.0"),
+                start=datetime(2012, 1, 1), end=datetime(2013, 1, 1),
+                payload="not zlib")
+        self.assertRaises(CertificateException, getattr, cert, 'order')
+
+    def test_content_built_only_when_read(self):
+        payload = {
+            'subscription': {'name': 'Sub'},
+            'order': {},
+            'products': [{'id': '69', 'name': 'Server',
+                          'content': [{'label': 'no-type-or-name'}]}],
+        }
+        cert = EntitlementCertificate(serial=1, version=Version("3.0"),
+                start=datetime(2012, 1, 1), end=datetime(2013, 1, 1),
+                payload=zlib.compress(json.dumps(payload)))
+        self.assertEquals("Sub", cert.order.name)
+        self.assertEquals("69", cert.products[0].id)
+        self.assertEquals({'label': 'no-type-or-name'},
+                          cert._payload_dict['products'][0]['content'][0])
+        self.assertRaises(CertificateException, getattr, cert, 'content')
+
+    def test_payload_with_passed_sections(self):
+        payload = {
+            'subscription': {'name': 'Sub'},
+            'order': {},
+            'products': [{'id': '69', 'name': 'Server'}],
+            'pool': {'id': 'from-payload'},
+        }
+        content = [Content(content_type="yum", name="mycontent",
+                           label="mylabel", enabled=True)]
+        cert = EntitlementCertificate(serial=1, version=Version("3.0"),
+                start=datetime(2012, 1, 1), end=datetime(2013, 1, 1),
+                content=content, products=[Product(id='70', name='Other')],
+                payload=zlib.compress(json.dumps(payload)))
+        # the passed sections win, the others come from the payload
+        self.assertEquals(content, cert.content)
+        self.assertEquals(['70'], [p.id for p in cert.products])
+        self.assertEquals("Sub", cert.order.name)
+        self.assertEquals("from-payload", cert.pool.id)
+        self.assertEquals(content[0], cert.get_content('mylabel'))
+
+    def test_pickle(self):
+        self.ent_cert.x509 = None
+        for protocol in (0, 2):
+            cert = cPickle.loads(cPickle.dumps(self.ent_cert, protocol))
+            self.assertEqual(self.ent_cert.serial, cert.serial)
+            self.assertEqual("Awesome OS for x86_64", cert.order.name)
+            self.assertEqual(len(self.ent_cert.content), len(cert.content))
+
+    def test_get_content(self):
+        content = self.ent_cert.get_content('awesomeos-x86_64')
+        self.assertEquals('awesomeos-x86_64', content.label)
+        self.assertTrue(content in self.ent_cert.content)
+        self.assertEquals(None, self.ent_cert.get_content('not-a-repo'))
+
+    def test_get_product(self):
+        product = self.ent_cert.get_product('100000000000002')
+        self.assertEquals('Awesome OS for x86_64 Bits', product.name)
+        self.assertEquals(None, self.ent_cert.get_product('69'))
+
+    def test_index_follows_set_section(self):
+        self.assertNotEqual(None, self.ent_cert.get_content('awesomeos'))
+        self.ent_cert.content = []
+        self.assertEquals(None, self.ent_cert.get_content('awesomeos'))
+
+
+def _content(label, tags=None, arches=None):
+    return Content(content_type='yum', name=label, label=label,
+                   required_tags=tags, arches=arches)
+
+
+def _ent_cert(serial, content, products=None):
+    return EntitlementCertificate(serial=serial, version=Version("3.0"),
+            start=datetime(2012, 1, 1), end=datetime(2013, 1, 1),
+            content=content, products=products)
+
+
+class EntitlementIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _ent_cert(1, [
+            _content('server', ['rhel-6-server'], ['x86_64']),
+            _content('server-i386', ['rhel-6-server'], ['i386']),
+            _content('common', [], ['ALL'])],
+            [Product(id='69', name='Server')])
+        self.workstation = _ent_cert(2, [
+            _content('workstation', ['rhel-6-workstation'], ['x86_64']),
+            _content('common', [], ['ALL'])],
+            [Product(id='71', name='Workstation')])
+
+    def _labels(self, content):
+        return [c.label for c in content]
+
+    def test_cert_content_by_tag(self):
+        self.assertEquals(['server', 'server-i386'], self._labels(
+            self.server.get_content_by_tag('rhel-6-server')))
+        self.assertEquals([],
+                self.server.get_content_by_tag('rhel-6-workstation'))
+
+    def test_cert_content_by_arch(self):
+        self.assertEquals(['server'], self._labels(
+            self.server.get_content_by_arch('x86_64')))
+        self.assertEquals(['common'], self._labels(
+            self.server.get_content_by_arch('ALL')))
+
+    def test_lookup_returns_copy(self):
+        self.server.get_content_by_arch('x86_64').append('junk')
+        self.assertEquals(1, len(self.server.get_content_by_arch('x86_64')))
+
+    def test_index_across_certs(self):
+        index = EntitlementIndex({2: self.workstation, 1: self.server})
+        self.assertEquals([(self.server, self.server.get_content('common')),
+                           (self.workstation,
+                            self.workstation.get_content('common'))],
+                          index.get_content('common'))
+        self.assertEquals([self.workstation],
+                [cert for cert, product in index.get_product('71')])
+        self.assertEquals(['server', 'workstation'],
+                [content.label for cert, content in
+                 index.get_content_by_arch('x86_64')])
+        self.assertEquals([(self.workstation,
+                            self.workstation.get_content('workstation'))],
+                          index.get_content_by_tag('rhel-6-workstation'))
+        self.assertEquals([], index.get_content('not-a-repo'))
+
+
+class ValidityIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(42)
+        epoch = datetime(2012, 1, 1)
+        self.certs = []
+        for serial in range(200):
+            start = epoch + timedelta(days=rand.randint(0, 700),
+                                      seconds=rand.randint(0, 86399))
+            end = start + timedelta(days=rand.randint(0, 400))
+            order = Order(warning_period=rand.choice([0, 30, 90]))
+            self.certs.append(EntitlementCertificate(serial=serial,
+                version=Version("3.0"), start=start, end=end, order=order))
+        self.index = ValidityIndex(self.certs)
+        self.dates = [epoch + timedelta(days=rand.randint(-30, 1200),
+                                        seconds=rand.randint(0, 86399))
+                      for i in range(50)]
+        self.dates.extend([cert.start for cert in self.certs[:10]])
+        self.dates.extend([cert.end for cert in self.certs[:10]])
+
+    def _serials(self, certs):
+        return sorted([cert.serial for cert in certs])
+
+    def test_valid_on(self):
+        for date in self.dates:
+            self.assertEquals(
+                    self._serials([c for c in self.certs if c.is_valid(date)]),
+                    self._serials(self.index.valid_on(date)))
+
+    def test_expiring(self):
+        for date in self.dates:
+            self.assertEquals(
+                    self._serials([c for c in self.certs if
+                                   c.is_expiring(date)]),
+                    self._serials(self.index.expiring(date)))
+
+    def test_overlapping(self):
+        for date in self.dates:
+            end = date + timedelta(days=45)
+            expected = [c for c in self.certs if
+                        c.valid_range.begin() <= end.replace(tzinfo=GMT()) and
+                        c.valid_range.end() >= date.replace(tzinfo=GMT())]
+            self.assertEquals(self._serials(expected),
+                    self._serials(self.index.overlapping(date, end)))
+
+    def test_ending_between(self):
+        for date in self.dates:
+            end = date + timedelta(days=30)
+            expected = [c for c in self.certs if
+                        date.replace(tzinfo=GMT()) <= c.valid_range.end() <=
+                        end.replace(tzinfo=GMT())]
+            self.assertEquals(self._serials(expected),
+                    self._serials(self.index.ending_between(date, end)))
+
+    def test_ordered_by_end(self):
+        found = self.index.valid_on(datetime(2013, 1, 1))
+        ends = [cert.end for cert in found]
+        self.assertEquals(sorted(ends), ends)
+        self.assertEquals(found[0], self.index.first_to_end(datetime(2013, 1, 1)))
+
+    def test_none_valid(self):
+        self.assertEquals([], self.index.valid_on(datetime(2000, 1, 1)))
+        self.assertEquals(None, self.index.first_to_end(datetime(2000, 1, 1)))
+        self.assertEquals([], ValidityIndex([]).valid_on())
+
+    def test_dict_of_certs(self):
+        index = ValidityIndex(dict((c.serial, c) for c in self.certs))
+        self.assertEquals(self._serials(self.index.valid_on(self.dates[0])),
+                          self._serials(index.valid_on(self.dates[0])))
+
 
 class V3_2CertTests(unittest.TestCase):
 
@@ -324,6 +570,31 @@ class ContentTests(unittest.TestCase):
         self.assertEqual(c, e)
         self.assertNotEqual(c, f)
 
+    def test_no_attribute_dict(self):
+        c = Content(content_type="yum", name="mycontent", label="mycontent")
+        self.assertRaises(AttributeError, setattr, c, "color", "red")
+
+    def test_repeated_strings_shared(self):
+        contents = []
+        for label in ("one", "two"):
+            contents.append(Content(content_type=u"".join([u"y", u"um"]),
+                name=label, label=label, vendor=u"".join([u"Red ", u"Hat"]),
+                arches=[u"".join([u"x86", u"_64"])]))
+        one, two = contents
+        self.assertTrue(one.content_type is two.content_type)
+        self.assertTrue(one.vendor is two.vendor)
+        self.assertTrue(one.arches[0] is two.arches[0])
+        self.assertTrue(isinstance(one.vendor, unicode))
+
+    def test_pickle(self):
+        c = Content(content_type="yum", name="mycontent", label="mycontent",
+                    enabled="0", arches=['i386'])
+        for protocol in (0, 2):
+            d = cPickle.loads(cPickle.dumps(c, protocol))
+            self.assertEqual(c, d)
+            self.assertFalse(d.enabled)
+            self.assertEqual(['i386'], d.arches)
+
 
 class ProductTests(unittest.TestCase):
 
@@ -351,3 +622,346 @@ class ProductTests(unittest.TestCase):
         p = Product(id="pid", name="pname",
                     brand_type=None)
         self.assertTrue(p.brand_type is None)
+
+
+class CertificateCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.cert_path = os.path.join(self.tmp_dir, '1234.pem')
+        self._write(certdata.ENTITLEMENT_CERT_V3_0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, pem):
+        f = open(self.cert_path, 'w')
+        f.write(pem)
+        f.close()
+
+    def _assert_same_cert(self, cert, cached):
+        self.assertEqual(cert.serial, cached.serial)
+        self.assertEqual(cert.start, cached.start)
+        self.assertEqual(cert.end, cached.end)
+        self.assertEqual(cert.subject, cached.subject)
+        self.assertEqual(cert.issuer, cached.issuer)
+        self.assertEqual(str(cert.version), str(cached.version))
+        self.assertEqual(cert.pem, cached.pem)
+        self.assertEqual(cert.order.sku, cached.order.sku)
+        self.assertEqual(cert.order.warning_period,
+                         cached.order.warning_period)
+        self.assertEqual(cert.products, cached.products)
+        self.assertEqual([p.name for p in cert.products],
+                         [p.name for p in cached.products])
+        self.assertEqual(cert.content, cached.content)
+        self.assertEqual([c.enabled for c in cert.content],
+                         [c.enabled for c in cached.content])
+        self.assertEqual(cert.extensions, cached.extensions)
+        self.assertEqual(sorted(cert.entitled_paths()),
+                         sorted(cached.entitled_paths()))
+
+    def test_warm_cache(self):
+        cert = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        patcher = patch('rhsm.certificate2._certificate.load')
+        mock_load = patcher.start()
+        try:
+            cached = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        finally:
+            patcher.stop()
+        # nothing had to be parsed
+        self.assertFalse(mock_load.called)
+        self._assert_same_cert(cert, cached)
+        self.assertTrue(cached.check_path('/path/to/awesomeos/x86_64'))
+        self.assertFalse(cached.check_path('/path/to/nothing'))
+
+    def test_x509_loaded_on_demand(self):
+        create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        cached = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self.assertEqual(cached._x509, None)
+        self.assertEqual(cached.x509.get_serial_number(), cached.serial)
+
+    def test_v1_cert(self):
+        self._write(certdata.ENTITLEMENT_CERT_V1_0)
+        cert = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        cached = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self._assert_same_cert(cert, cached)
+        self.assertTrue(cached.check_path('/foo/path/never'))
+
+    def test_changed_cert(self):
+        create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self._write(certdata.ENTITLEMENT_CERT_V3_2)
+        cert = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self.assertEqual(cert.serial,
+                         create_from_pem(certdata.ENTITLEMENT_CERT_V3_2).serial)
+        self.assertEqual(cert.pool.id,
+                         create_from_pem(certdata.ENTITLEMENT_CERT_V3_2).pool.id)
+
+    def test_product_cert_not_cached(self):
+        self._write(certdata.PRODUCT_CERT_V1_0)
+        create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_corrupt_cache_file(self):
+        create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        for name in os.listdir(self.cache_dir):
+            f = open(os.path.join(self.cache_dir, name), 'w')
+            f.write('garbage')
+            f.close()
+        cert = create_from_file(self.cert_path, cache_dir=self.cache_dir)
+        self.assertEqual(cert.serial,
+                         create_from_pem(certdata.ENTITLEMENT_CERT_V3_0).serial)
+
+
+class LoadDirectoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self._write('1.pem', certdata.ENTITLEMENT_CERT_V3_0)
+        self._write('1-key.pem', 'not a certificate')
+        self._write('2.pem', certdata.ENTITLEMENT_CERT_V1_0)
+        self._write('3.pem', certdata.PRODUCT_CERT_V1_0)
+        self._write('README', 'not a certificate')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, pem):
+        f = open(os.path.join(self.tmp_dir, name), 'w')
+        f.write(pem)
+        f.close()
+
+    def _serials(self, certs):
+        return sorted(cert.serial for cert in certs.values())
+
+    def test_load(self):
+        certs, errors = load_directory(self.tmp_dir)
+        self.assertEqual({}, errors)
+        expected = [create_from_file(os.path.join(self.tmp_dir, name)).serial
+                    for name in ('1.pem', '2.pem', '3.pem')]
+        self.assertEqual(sorted(expected), sorted(certs.keys()))
+        for serial, cert in certs.items():
+            self.assertEqual(serial, cert.serial)
+
+    def test_kind(self):
+        certs, errors = load_directory(self.tmp_dir, kind=ENTITLEMENT_CERT)
+        self.assertEqual(2, len(certs))
+        for cert in certs.values():
+            self.assertTrue(isinstance(cert, EntitlementCertificate))
+        self.assertEqual([os.path.join(self.tmp_dir, '3.pem')], errors.keys())
+
+    def test_errors_do_not_abort(self):
+        self._write('4.pem', 'junk')
+        self._write('5.pem', '')
+        for workers in (1, 3):
+            certs, errors = load_directory(self.tmp_dir, workers=workers)
+            self.assertEqual(3, len(certs))
+            self.assertEqual(sorted([os.path.join(self.tmp_dir, '4.pem'),
+                                     os.path.join(self.tmp_dir, '5.pem')]),
+                             sorted(errors.keys()))
+            for error in errors.values():
+                self.assertTrue(isinstance(error, CertificateException))
+
+    def test_duplicate_serial(self):
+        self._write('6.pem', certdata.ENTITLEMENT_CERT_V3_0)
+        certs, errors = load_directory(self.tmp_dir)
+        self.assertEqual(3, len(certs))
+        self.assertEqual([os.path.join(self.tmp_dir, '6.pem')], errors.keys())
+
+    def test_empty_directory(self):
+        empty = os.path.join(self.tmp_dir, 'empty')
+        os.mkdir(empty)
+        self.assertEqual(({}, {}), load_directory(empty))
+
+    @patch('rhsm.certificate2.init_ssl_threading')
+    def test_ssl_threading_initialized(self, mock_init):
+        load_directory(self.tmp_dir)
+        mock_init.assert_called_once_with()
+
+
+class X509ThreadTests(unittest.TestCase):
+
+    def setUp(self):
+        init_ssl_threading()
+
+    def test_concurrent_loads(self):
+        # the extension releases the GIL while OpenSSL works
+        pem = certdata.ENTITLEMENT_CERT_V1_0
+        x509 = _certificate.load(pem=pem)
+        expected = (x509.get_all_extensions(), x509.as_pem(),
+                    x509.get_extension(name='subjectAltName'))
+        results = []
+
+        def load():
+            for i in range(20):
+                x509 = _certificate.load(pem=pem)
+                results.append((x509.get_all_extensions(), x509.as_pem(),
+                                x509.get_extension(name='subjectAltName')))
+
+        threads = [threading.Thread(target=load) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(80, len(results))
+        for result in results:
+            self.assertEqual(expected, result)
+
+
+class X509ExtensionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.x509 = _certificate.load(pem=certdata.ENTITLEMENT_CERT_V1_0)
+
+    def test_get_extensions(self):
+        extensions = self.x509.get_extensions()
+        self.assertEqual(self.x509.get_all_extensions(), dict(extensions))
+        self.assertEqual(len(dict(extensions)), len(extensions))
+
+    def test_namespace(self):
+        all_extensions = self.x509.get_all_extensions()
+        extensions = self.x509.get_extensions(REDHAT_OID_NAMESPACE)
+        self.assertTrue(extensions)
+        for oid, value in extensions:
+            self.assertEqual(all_extensions[REDHAT_OID_NAMESPACE + '.' + oid],
+                             value)
+        self.assertEqual(len(extensions),
+                         len([oid for oid in all_extensions if
+                              oid.startswith(REDHAT_OID_NAMESPACE + '.')]))
+
+    def test_namespace_matches_whole_parts(self):
+        self.assertEqual([], self.x509.get_extensions('1.3.6.1.4.1.231'))
+        self.assertEqual([], self.x509.get_extensions('1.3.6.1.4.1.2312.9.4.1'
+                                                       '.1'))
+
+    def test_cert_extensions_are_in_namespace(self):
+        cert = create_from_pem(certdata.ENTITLEMENT_CERT_V1_0)
+        self.assertEqual(sorted(str(oid) for oid, value in
+                                self.x509.get_extensions(REDHAT_OID_NAMESPACE)),
+                         sorted(str(oid) for oid in cert.extensions))
+
+
+class X509LoadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pem = certdata.ENTITLEMENT_CERT_V1_0
+        self.expected = _certificate.load(pem=self.pem).get_all_extensions()
+
+    def _assert_loaded(self, x509):
+        self.assertFalse(x509 is None)
+        self.assertEqual(self.expected, x509.get_all_extensions())
+
+    def test_data_str(self):
+        self._assert_loaded(_certificate.load(data=self.pem))
+
+    def test_data_bytearray(self):
+        self._assert_loaded(_certificate.load(data=bytearray(self.pem)))
+
+    def test_data_mmap(self):
+        f = tempfile.TemporaryFile()
+        try:
+            f.write(self.pem)
+            f.flush()
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._assert_loaded(_certificate.load(data=data))
+            data.close()
+        finally:
+            f.close()
+
+    def test_data_der(self):
+        body = self.pem.split('-----BEGIN CERTIFICATE-----')[1]
+        body = body.split('-----END CERTIFICATE-----')[0]
+        self._assert_loaded(_certificate.load(data=base64.b64decode(body)))
+
+    def test_data_junk(self):
+        self.assertEqual(None, _certificate.load(data='junk'))
+        self.assertEqual(None, _certificate.load(data=''))
+
+    def test_data_unicode(self):
+        self.assertRaises(TypeError, _certificate.load, data=unicode(self.pem))
+
+    def test_pem_unicode(self):
+        self._assert_loaded(_certificate.load(pem=unicode(self.pem)))
+
+
+class CreateManyFromPemTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pems = [certdata.ENTITLEMENT_CERT_V1_0,
+                     certdata.ENTITLEMENT_CERT_V3_0,
+                     certdata.PRODUCT_CERT_V1_0,
+                     certdata.ENTITLEMENT_CERT_V3_2,
+                     certdata.IDENTITY_CERT]
+        self.bundle = ''.join(self.pems)
+
+    def test_load_all(self):
+        x509s = _certificate.load_all(self.bundle)
+        self.assertEqual([_certificate.load(pem=pem).get_serial_number()
+                          for pem in self.pems],
+                         [x509.get_serial_number() for x509 in x509s])
+
+    def test_load_all_empty(self):
+        self.assertEqual([], _certificate.load_all(''))
+        self.assertEqual([], _certificate.load_all('no certificates here'))
+
+    def test_load_all_corrupt(self):
+        bundle = certdata.PRODUCT_CERT_V1_0 + \
+                "-----BEGIN CERTIFICATE-----\njunk\n-----END CERTIFICATE-----\n"
+        self.assertRaises(ValueError, _certificate.load_all, bundle)
+
+    def test_create_many(self):
+        certs = create_many_from_pem(self.bundle)
+        expected = [create_from_pem(pem) for pem in self.pems]
+        self.assertEqual([cert.__class__ for cert in expected],
+                         [cert.__class__ for cert in certs])
+        self.assertEqual([cert.serial for cert in expected],
+                         [cert.serial for cert in certs])
+        # v3 certificates keep their own entitlement data
+        self.assertEqual(self.pems[1].strip(), certs[1].pem.strip())
+        self.assertEqual(expected[1].order.sku, certs[1].order.sku)
+        self.assertEqual('8a8d01f53cda9dd0013cda9ed5100475', certs[3].pool.id)
+
+    def test_create_many_unicode(self):
+        certs = create_many_from_pem(unicode(self.bundle))
+        self.assertEqual(len(self.pems), len(certs))
+
+    def test_create_many_empty(self):
+        self.assertEqual([], create_many_from_pem(''))
+
+    def test_create_many_corrupt(self):
+        bundle = self.bundle + \
+                "-----BEGIN CERTIFICATE-----\njunk\n-----END CERTIFICATE-----\n"
+        self.assertRaises(CertificateException, create_many_from_pem, bundle)
+
+
+class X509DateTests(unittest.TestCase):
+
+    def _assert_dates(self, pem):
+        x509 = _certificate.load(pem=pem)
+        start = get_datetime_from_x509(x509.get_not_before())
+        end = get_datetime_from_x509(x509.get_not_after())
+        self.assertEqual(calendar.timegm(start.utctimetuple()),
+                         x509.get_not_before_epoch())
+        self.assertEqual(calendar.timegm(end.utctimetuple()),
+                         x509.get_not_after_epoch())
+
+        cert = create_from_pem(pem)
+        self.assertEqual(start, cert.start)
+        self.assertEqual(end, cert.end)
+        self.assertEqual(start.utcoffset(), cert.start.utcoffset())
+
+    def test_epoch(self):
+        for pem in (certdata.ENTITLEMENT_CERT_V1_0,
+                    certdata.ENTITLEMENT_CERT_V3_0,
+                    certdata.PRODUCT_CERT_V1_0,
+                    certdata.IDENTITY_CERT):
+            self._assert_dates(pem)
+
+    def test_generalized_time(self):
+        self._assert_dates(certdata.GENERALIZED_TIME_CERT)
+        cert = create_from_pem(certdata.GENERALIZED_TIME_CERT)
+        self.assertEqual(2108, cert.end.year)
+        self.assertEqual(datetime(2108, 12, 5, 19, 42, 22),
+                         cert.end.replace(tzinfo=None))
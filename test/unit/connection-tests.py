@@ -14,13 +14,25 @@
 # in this software or its documentation.
 #
 
+import gc
+import httplib
 import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
 import unittest
 
 from rhsm.connection import UEPConnection, Restlib, ConnectionException, ConnectionSetupException, \
         BadCertificateException, RestlibException, GoneException, NetworkException, \
         RemoteServerException, drift_check, ExpiredIdentityCertException, UnauthorizedException, \
-        ForbiddenException, AuthenticationException
+        ForbiddenException, AuthenticationException, ConnectionPool, ContextCache, \
+        SessionCache, Executor, AsyncUEPConnection, TimeoutException
+from rhsm import connection
+from rhsm import utils
 
 from mock import Mock, patch
 from datetime import date
@@ -371,6 +383,595 @@ class RestlibTests(unittest.TestCase):
         self.assertTrue(isinstance(data["phoneNumbers"][0][0]["type"], str))
 
 
+def _connection(*responses):
+    """
+    A fake HTTPS connection, answering each request with the next response:
+    a (status, content, will_close) tuple, or an exception to raise.
+    """
+    conn = Mock()
+    conn.sock = Mock()
+    replies = list(responses)
+
+    def getresponse():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        response = Mock()
+        response.status, content, response.will_close = reply
+        response.read.return_value = content
+        response.getheader.return_value = None
+        return response
+    conn.getresponse.side_effect = getresponse
+    return conn
+
+
+class ConnectionPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.made = []
+
+    def _factory(self):
+        conn = _connection()
+        self.made.append(conn)
+        return conn
+
+    def test_reuses_idle_connection(self):
+        pool = ConnectionPool(self._factory)
+        conn, requests = pool.get()
+        self.assertEquals(0, requests)
+        pool.put(conn, 1)
+        self.assertEquals((conn, 1), pool.get())
+        self.assertEquals(1, pool.created)
+        self.assertEquals(1, pool.reused)
+
+    def test_most_recently_used_first(self):
+        pool = ConnectionPool(self._factory)
+        first = pool.get()[0]
+        second = pool.get()[0]
+        pool.put(first, 1)
+        pool.put(second, 1)
+        self.assertTrue(pool.get()[0] is second)
+
+    def test_keeps_size_connections(self):
+        pool = ConnectionPool(self._factory, size=2)
+        conns = [pool.get()[0] for i in range(3)]
+        for conn in conns:
+            pool.put(conn, 1)
+        self.assertTrue(conns[2].sock is None)
+        self.assertFalse(conns[1].sock is None)
+
+    def test_max_requests(self):
+        pool = ConnectionPool(self._factory, max_requests=5)
+        conn = pool.get()[0]
+        pool.put(conn, 5)
+        self.assertTrue(conn.sock is None)
+        self.assertFalse(pool.get()[0] is conn)
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(self._factory, idle_timeout=-1)
+        conn = pool.get()[0]
+        sock = conn.sock
+        pool.put(conn, 1)
+        self.assertFalse(pool.get()[0] is conn)
+        self.assertTrue(sock.close.called)
+
+    def test_no_pooling(self):
+        pool = ConnectionPool(self._factory, size=0)
+        conn = pool.get()[0]
+        pool.put(conn, 1)
+        self.assertFalse(pool.get()[0] is conn)
+
+    def test_close(self):
+        pool = ConnectionPool(self._factory)
+        conn = pool.get()[0]
+        sock = conn.sock
+        pool.put(conn, 1)
+        pool.close()
+        self.assertTrue(sock.close.called)
+        self.assertFalse(pool.get()[0] is conn)
+
+    def test_connection_in_use_when_closed(self):
+        pool = ConnectionPool(self._factory)
+        conn = pool.get()[0]
+        pool.close()
+        pool.put(conn, 1)
+        self.assertTrue(conn.sock is None)
+        self.assertFalse(pool.get()[0] is conn)
+
+    def test_reserve(self):
+        pool = ConnectionPool(self._factory, size=1)
+        pool.reserve(2)
+        conns = [pool.get()[0] for i in range(4)]
+        for conn in conns:
+            pool.put(conn, 1)
+        self.assertEquals(3, len(pool._idle))
+        pool.release(2)
+        self.assertEquals([conns[2]], [idle[0] for idle in pool._idle])
+        self.assertTrue(conns[0].sock is None)
+        self.assertTrue(conns[1].sock is None)
+
+    def test_discard(self):
+        pool = ConnectionPool(self._factory)
+        conn = pool.get()[0]
+        pool.discard(conn)
+        self.assertTrue(conn.sock is None)
+        self.assertEquals({}, pool._used)
+
+
+class RestlibPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.restlib = Restlib("somehost", "123", "/handler")
+        self.conns = []
+        self.restlib.pool.factory = lambda: self.conns.pop(0)
+
+    def test_connection_reused(self):
+        conn = _connection((200, '{"a": 1}', False), (200, '{"b": 2}', False))
+        self.conns.append(conn)
+        self.assertEquals({"a": 1}, self.restlib.request_get("/a"))
+        self.assertEquals({"b": 2}, self.restlib.request_get("/b"))
+        self.assertEquals(2, conn.request.call_count)
+
+    def test_reconnect_when_server_closed(self):
+        self.conns.append(_connection((200, '{"a": 1}', False),
+                                      httplib.BadStatusLine('')))
+        self.conns.append(_connection((200, '{"b": 2}', False)))
+        self.restlib.request_get("/a")
+        self.assertEquals({"b": 2}, self.restlib.request_get("/b"))
+        self.assertEquals([], self.conns)
+
+    def test_reconnect_when_send_fails(self):
+        conn = _connection((200, '{"a": 1}', False))
+        self.conns.append(conn)
+        self.conns.append(_connection((200, '{"b": 2}', False)))
+        self.restlib.request_get("/a")
+        conn.request.side_effect = socket.error(32, 'Broken pipe')
+        self.assertEquals({"b": 2}, self.restlib.request_post("/b"))
+
+    def test_no_retry_when_post_response_fails(self):
+        conn = _connection((200, '{"a": 1}', False),
+                           httplib.BadStatusLine(''))
+        second = _connection((200, '{"b": 2}', False))
+        self.conns.extend([conn, second])
+        self.restlib.request_get("/a")
+        self.assertRaises(httplib.BadStatusLine, self.restlib.request_post,
+                          "/b")
+        self.assertEquals(2, conn.request.call_count)
+        self.assertFalse(second.request.called)
+
+    def test_no_retry_on_timeout(self):
+        conn = _connection((200, '{"a": 1}', False),
+                           socket.timeout('timed out'))
+        second = _connection((200, '{"b": 2}', False))
+        self.conns.extend([conn, second])
+        self.restlib.request_get("/a")
+        self.assertRaises(socket.timeout, self.restlib.request_get, "/b")
+        self.assertFalse(second.request.called)
+
+    def test_no_retry_on_new_connection(self):
+        conn = _connection()
+        conn.request.side_effect = socket.error(111, 'Connection refused')
+        self.conns.append(conn)
+        self.assertRaises(socket.error, self.restlib.request_get, "/a")
+
+    def test_closed_by_server(self):
+        first = _connection((200, '{"a": 1}', True))
+        self.conns.append(first)
+        self.conns.append(_connection((200, '{"b": 2}', False)))
+        self.restlib.request_get("/a")
+        self.assertTrue(first.sock is None)
+        self.assertEquals({"b": 2}, self.restlib.request_get("/b"))
+
+    def test_error_response_keeps_connection(self):
+        conn = _connection((404, '', False), (200, '{"a": 1}', False))
+        self.conns.append(conn)
+        self.assertRaises(RemoteServerException, self.restlib.request_get,
+                          "/missing")
+        self.assertEquals({"a": 1}, self.restlib.request_get("/a"))
+
+    def test_close(self):
+        conn = _connection((200, '{"a": 1}', False))
+        self.conns.append(conn)
+        self.restlib.request_get("/a")
+        sock = conn.sock
+        self.restlib.close()
+        self.assertTrue(sock.close.called)
+
+
+class ContextCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cert = os.path.join(self.tmp, 'cert.pem')
+        open(self.cert, 'w').close()
+        os.utime(self.tmp, (1000, 1000))
+        os.utime(self.cert, (1000, 1000))
+        self.cache = ContextCache()
+        self.built = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _build(self):
+        context = object()
+        self.built.append(context)
+        return context
+
+    def _get(self, key='key'):
+        return self.cache.get(key, [self.tmp, self.cert], self._build)
+
+    def test_built_once(self):
+        context = self._get()
+        self.assertTrue(self._get() is context)
+        self.assertEquals(1, self.cache.built)
+        self.assertEquals(1, self.cache.reused)
+
+    def test_rebuilt_when_file_changes(self):
+        context = self._get()
+        os.utime(self.cert, (2000, 2000))
+        self.assertFalse(self._get() is context)
+        self.assertEquals(2, len(self.built))
+
+    def test_rebuilt_when_directory_changes(self):
+        context = self._get()
+        os.utime(self.tmp, (2000, 2000))
+        self.assertFalse(self._get() is context)
+
+    def test_rebuilt_when_file_appears(self):
+        os.remove(self.cert)
+        context = self._get()
+        open(self.cert, 'w').close()
+        self.assertFalse(self._get() is context)
+
+    def test_keys(self):
+        self.assertFalse(self._get('a') is self._get('b'))
+        self.assertEquals(2, self.cache.built)
+
+    def test_rebuilt_when_file_rewritten_in_place(self):
+        context = self.cache.get('key', connection._pem_files(self.tmp),
+                                 self._build)
+        f = open(self.cert, 'w')
+        f.write('rewritten')
+        f.close()
+        os.utime(self.tmp, (1000, 1000))
+        self.assertFalse(self.cache.get('key', connection._pem_files(self.tmp),
+                                        self._build) is context)
+
+    def test_bounded(self):
+        cache = ContextCache(size=2)
+        for key in ('a', 'b', 'c'):
+            cache.get(key, [], self._build)
+        self.assertEquals(['b', 'c'], sorted(cache._contexts.keys()))
+        cache.get('b', [], self._build)
+        cache.get('a', [], self._build)
+        self.assertEquals(['a', 'c'], sorted(cache._contexts.keys()))
+
+    def test_build_error_not_cached(self):
+        def fail():
+            raise ConnectionSetupException("bad")
+        self.assertRaises(ConnectionSetupException, self.cache.get, 'key',
+                          [self.tmp], fail)
+        self._get()
+        self.assertEquals(1, self.cache.built)
+
+
+class RestlibContextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        os.utime(self.tmp, (1000, 1000))
+        self.contexts = connection.contexts
+        connection.contexts = ContextCache()
+        self.restlib = Restlib("somehost", "123", "/handler", ca_dir=self.tmp)
+        self.restlib._create_context = Mock(side_effect=lambda: object())
+        self.conns = []
+        self.restlib.pool.factory = lambda: self.conns.pop(0)
+
+    def tearDown(self):
+        connection.contexts = self.contexts
+        shutil.rmtree(self.tmp)
+
+    def test_context_reused(self):
+        self.conns.append(_connection((200, '{"a": 1}', True)))
+        self.conns.append(_connection((200, '{"b": 2}', True)))
+        self.restlib.request_get("/a")
+        self.restlib.request_get("/b")
+        self.assertEquals(1, self.restlib._create_context.call_count)
+
+    def test_rebuilt_when_ca_cert_rewritten(self):
+        ca_cert = os.path.join(self.tmp, 'ca.pem')
+        open(ca_cert, 'w').close()
+        os.utime(self.tmp, (1000, 1000))
+        self.restlib._get_context()
+        f = open(ca_cert, 'w')
+        f.write('rewritten')
+        f.close()
+        os.utime(self.tmp, (1000, 1000))
+        self.restlib._get_context()
+        self.assertEquals(2, self.restlib._create_context.call_count)
+
+    def test_shared_between_instances(self):
+        other = Restlib("somehost", "123", "/handler", ca_dir=self.tmp)
+        self.assertTrue(other._get_context() is self.restlib._get_context())
+
+    def test_pool_flushed_when_ca_dir_changes(self):
+        first = _connection((200, '{"a": 1}', False))
+        self.conns.append(first)
+        self.conns.append(_connection((200, '{"b": 2}', False)))
+        self.restlib.request_get("/a")
+        sock = first.sock
+        os.utime(self.tmp, (2000, 2000))
+        self.assertEquals({"b": 2}, self.restlib.request_get("/b"))
+        self.assertTrue(sock.close.called)
+        self.assertEquals(2, self.restlib._create_context.call_count)
+
+
+class FakeSession(object):
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+class FakeContext(object):
+    pass
+
+
+class SessionCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SessionCache()
+        self.context = FakeContext()
+        self.patches = [patch('rhsm.connection._own_session', lambda s: s),
+                        patch('rhsm.connection._resumed', self._resumed)]
+        for p in self.patches:
+            p.__enter__()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.__exit__()
+
+    def _resumed(self, conn, offered):
+        return offered is not None and \
+                conn.get_session().session_id == offered.session_id
+
+    def _connect(self, session_id, context=None, server=('somehost', 443)):
+        conn = Mock()
+        conn.ssl_ctx = context or self.context
+        conn.get_session.return_value = FakeSession(session_id)
+        self.cache.connect(conn, server)
+        return conn
+
+    def test_first_connection_misses(self):
+        conn = self._connect('a')
+        self.assertFalse(conn.set_session.called)
+        conn.connect.assert_called_once_with()
+        self.assertEquals((0, 1), (self.cache.hits, self.cache.misses))
+
+    def test_session_resumed(self):
+        first = self._connect('a')
+        conn = self._connect('a')
+        conn.set_session.assert_called_once_with(
+                first.get_session.return_value)
+        self.assertEquals((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_session_refused(self):
+        self._connect('a')
+        self._connect('b')
+        self.assertEquals((0, 2), (self.cache.hits, self.cache.misses))
+        self.assertEquals('b', self.cache.get(self.context,
+                                              ('somehost', 443)).session_id)
+
+    def test_sessions_by_server(self):
+        self._connect('a')
+        conn = self._connect('b', server=('otherhost', 443))
+        self.assertFalse(conn.set_session.called)
+
+    def test_sessions_by_context(self):
+        self._connect('a')
+        conn = self._connect('b', context=FakeContext())
+        self.assertFalse(conn.set_session.called)
+
+    def test_sessions_dropped_with_context(self):
+        context = FakeContext()
+        self._connect('a', context=context)
+        del context
+        gc.collect()
+        self.assertEquals(0, len(self.cache._sessions))
+
+    def test_restlib_connects_new_connections(self):
+        restlib = Restlib("somehost", "123", "/handler")
+        restlib.sessions = Mock()
+        conn = _connection((200, '{"a": 1}', False), (200, '{"b": 2}', False))
+        conn.sock = None
+
+        def connect(conn, server):
+            conn.sock = Mock()
+        restlib.sessions.connect.side_effect = connect
+        restlib.pool.factory = lambda: conn
+        restlib.request_get("/a")
+        restlib.request_get("/b")
+        restlib.sessions.connect.assert_called_once_with(conn,
+                                                        ("somehost", 123))
+
+
+class ExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = Executor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_result(self):
+        future = self.executor.submit(lambda a, b=0: a + b, 1, b=2)
+        self.assertEquals(3, future.result())
+        self.assertTrue(future.done())
+        self.assertEquals(None, future.exception())
+
+    def test_exception(self):
+        def fail():
+            raise RemoteServerException(500)
+        future = self.executor.submit(fail)
+        self.assertRaises(RemoteServerException, future.result)
+        self.assertEquals(500, future.exception().code)
+
+    def test_timeout(self):
+        event = threading.Event()
+        future = self.executor.submit(event.wait)
+        self.assertRaises(TimeoutException, future.result, 0.01)
+        event.set()
+        future.result()
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0, 0]
+        event = threading.Event()
+
+        def call():
+            lock.acquire()
+            running[0] += 1
+            running[1] = max(running)
+            lock.release()
+            event.wait()
+            lock.acquire()
+            running[0] -= 1
+            lock.release()
+        futures = [self.executor.submit(call) for i in range(6)]
+        for i in range(100):
+            if running[1] == 2:
+                break
+            time.sleep(0.01)
+        event.set()
+        for future in futures:
+            future.result()
+        self.assertEquals(2, running[1])
+        self.assertEquals(2, len(self.executor._threads))
+
+    def test_done_callback(self):
+        done = []
+        future = self.executor.submit(lambda: 1)
+        future.result()
+        future.add_done_callback(done.append)
+        self.assertEquals([future], done)
+
+    def test_ssl_threading_initialized_once(self):
+        initialized = utils._ssl_threading
+        utils._ssl_threading = False
+        try:
+            m2_threading = Mock()
+            patcher = patch('rhsm.utils.m2_threading', m2_threading)
+            patcher.__enter__()
+            try:
+                Executor().shutdown()
+                Executor().shutdown()
+            finally:
+                patcher.__exit__()
+            m2_threading.init.assert_called_once_with()
+        finally:
+            utils._ssl_threading = initialized
+
+    def test_submit_after_shutdown(self):
+        self.executor.shutdown()
+        self.assertRaises(RuntimeError, self.executor.submit, lambda: 1)
+
+
+class AsyncUEPConnectionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cp = AsyncUEPConnection(max_workers=2, username="dummy",
+                                     password="dummy", handler="/Test/",
+                                     insecure=True)
+        self.cp.uep.conn = Mock()
+
+    def tearDown(self):
+        self.cp.shutDown()
+
+    def test_returns_future(self):
+        self.cp.uep.conn.request_get.return_value = {"uuid": "abc"}
+        future = self.cp.getConsumer("abc")
+        self.assertEquals({"uuid": "abc"}, future.result())
+        self.cp.uep.conn.request_get.assert_called_once_with(
+                "/consumers/abc")
+
+    def test_error_raised_by_result(self):
+        self.cp.uep.conn.request_put.side_effect = GoneException(410, "gone",
+                                                                 "abc")
+        future = self.cp.checkin("abc")
+        self.assertRaises(GoneException, future.result)
+
+    def test_helpers_not_async(self):
+        self.assertEquals("a%20b", self.cp.sanitize("a b"))
+        self.assertEquals("/Test", self.cp.handler)
+
+    def test_pool_keeps_connection_per_worker(self):
+        cp = AsyncUEPConnection(max_workers=8, username="dummy",
+                                password="dummy", handler="/Test/",
+                                insecure=True)
+        self.assertEquals(8, cp.uep.conn.pool.size)
+        cp.shutDown()
+
+    def test_pool_size_given(self):
+        cp = AsyncUEPConnection(max_workers=8, pool_size=2, username="dummy",
+                                password="dummy", handler="/Test/",
+                                insecure=True)
+        self.assertEquals(2, cp.uep.conn.pool.size)
+        cp.shutDown()
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cp = UEPConnection(username="dummy", password="dummy",
+                                handler="/Test/", insecure=True)
+        self.cp.conn = Mock()
+        self.cp.conn.pool = ConnectionPool(_connection, size=4)
+
+        def request_get(method):
+            if method.startswith("/pools/bad"):
+                raise RemoteServerException(404)
+            # answer the first calls last
+            time.sleep(0.05 / len(method))
+            return method
+        self.cp.conn.request_get.side_effect = request_get
+
+    def test_results_in_order(self):
+        ids = ["p%s" % ("x" * i) for i in range(10)]
+        futures = self.cp.batch([("getPool", (pool_id,)) for pool_id in ids],
+                                max_workers=4)
+        self.assertTrue(False not in [future.done() for future in futures])
+        self.assertEquals(["/pools/%s" % pool_id for pool_id in ids],
+                          [future.result() for future in futures])
+
+    def test_exceptions_in_place(self):
+        futures = self.cp.batch([("getPool", ("a",)), ("getPool", ("bad",)),
+                                 ("getProduct", ("b",))])
+        self.assertEquals("/pools/a", futures[0].result())
+        self.assertEquals(404, futures[1].exception().code)
+        try:
+            futures[1].result()
+            self.fail("RemoteServerException not raised")
+        except RemoteServerException:
+            # raised with the traceback of the call
+            tb = traceback.extract_tb(sys.exc_info()[2])
+            self.assertEquals("request_get", tb[-1][2])
+        self.assertEquals("/products/b", futures[2].result())
+
+    def test_kwargs_and_callables(self):
+        futures = self.cp.batch([("getPool", ("a",), {"consumerId": "c"}),
+                                 (lambda x: x * 2, (21,))])
+        self.assertEquals(["/pools/a?consumer=c", 42],
+                          [future.result() for future in futures])
+
+    def test_pool_keeps_connection_per_worker(self):
+        pool = self.cp.conn.pool
+        reserved = []
+        self.cp.batch([(lambda: reserved.append(pool._reserved), ())],
+                      max_workers=8)
+        self.assertEquals([8], reserved)
+        self.assertEquals(0, pool._reserved)
+        self.assertEquals(4, pool.size)
+
+
 # see #830767 and #842885 for examples of why this is
 # a useful test. Aka, sometimes we forget to make
 # str/repr work and that cases weirdness
@@ -13,7 +13,8 @@
 
 import unittest
 
-from rhsm.huffman import HuffmanNode
+from rhsm.bitstream import BitReader
+from rhsm.huffman import HuffmanNode, HuffmanTable
 
 
 class TestHuffmanNode(unittest.TestCase):
@@ -74,3 +75,41 @@ class TestHuffmanNode(unittest.TestCase):
             leaves = [HuffmanNode(weight) for weight in range(1, n)]
             tree = HuffmanNode.build_tree(leaves)
             self.assertEqual(tree.weight, sum(leaf.weight for leaf in leaves))
+
+
+class TestHuffmanTable(unittest.TestCase):
+    def setUp(self):
+        self.leaves = [HuffmanNode(weight, 'value%d' % weight)
+                       for weight in range(1, 40)]
+        self.root = HuffmanNode.build_tree(self.leaves)
+
+    def _stream(self, codes):
+        bits = ''.join(codes)
+        bits += '0' * (-len(bits) % 8)
+        return BitReader(''.join(
+            [chr(int(bits[i:i + 8], 2)) for i in range(0, len(bits), 8)]))
+
+    def test_decode(self):
+        table = HuffmanTable(self.root)
+        bitstream = self._stream([leaf.code for leaf in self.leaves])
+        for leaf in self.leaves:
+            self.assertEqual(table.decode(bitstream), leaf.value)
+
+    def test_decode_nested_tables(self):
+        # a narrow table forces long codes to go through nested tables
+        table = HuffmanTable(self.root, bits=2)
+        leaves = list(reversed(self.leaves))
+        bitstream = self._stream([leaf.code for leaf in leaves])
+        for leaf in leaves:
+            self.assertEqual(table.decode(bitstream), leaf.value)
+
+    def test_table_width(self):
+        table = HuffmanTable(HuffmanNode.build_tree(
+            [HuffmanNode(weight) for weight in range(1, 5)]))
+        # longest code is 3 bits, so the table need not be any wider
+        self.assertEqual(table.bits, 3)
+        self.assertEqual(len(table.table), 8)
+
+    def test_decode_incomplete_code(self):
+        table = HuffmanTable(self.root)
+        self.assertEqual(table.decode(BitReader('')), None)
@@ -1,3 +1,4 @@
+import cPickle
 import unittest
 import os
 
@@ -36,3 +37,34 @@ class OIDTests(unittest.TestCase):
         self.assertFalse(self.oid.match("1.2.3.4.5.6.7"))
 
 
+class OIDInternTests(unittest.TestCase):
+
+    def test_interned(self):
+        oid = OID("1.2.3.4")
+        self.assertTrue(oid is OID("1.2.3.4"))
+        self.assertTrue(oid is OID(["1", "2", "3", "4"]))
+        self.assertTrue(oid is OID("1.2").append("3.4"))
+        self.assertTrue(oid is OID("0.1.2.3.4").ltrim(1))
+        self.assertTrue(oid is OID("1.2.3.4.5").rtrim(1))
+
+    def test_immutable(self):
+        oid = OID("1.2.3")
+        self.assertEquals(("1", "2", "3"), oid.part)
+        self.assertRaises(AttributeError, setattr, oid, "color", "red")
+
+    def test_equality(self):
+        self.assertEquals(OID("1.2.3"), "1.2.3")
+        self.assertEquals(hash("1.2.3"), hash(OID("1.2.3")))
+        self.assertFalse(OID("1.2.3") != OID("1.2.3"))
+        self.assertTrue(OID("1.2.3") != OID("1.2.4"))
+
+    def test_empty(self):
+        self.assertEquals(0, len(OID([])))
+        self.assertEquals(1, len(OID("")))
+        self.assertEquals(1, len(OID([""])))
+        self.assertEquals(OID([]), OID(""))
+
+    def test_pickle(self):
+        oid = OID("1.2.3")
+        self.assertTrue(oid is cPickle.loads(cPickle.dumps(oid)))
+        self.assertTrue(oid is cPickle.loads(cPickle.dumps(oid, 2)))
@@ -11,45 +11,36 @@
 # granted to use or replicate Red Hat trademarks that are incorporated
 # in this software or its documentation.
 
-from collections import deque
 import os
 import unittest
 
-from rhsm.bitstream import GhettoBitStream
+from rhsm.bitstream import BitReader
 from rhsm.huffman import HuffmanNode
-from rhsm.pathtree import PathTree, PATH_END
+from rhsm.pathtree import PathIndex, PathTree, PATH_END
+import pathtree_data
 
 DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                     'entitlement_data.bin')
 
 
 class TestPathTree(unittest.TestCase):
-    def test_get_leaf_from_dict(self):
-        codes = {'1010': 'abc'}
-        bitstream = '10101111110000'
-        ret = PathTree._get_leaf_from_dict(codes, bitstream)
-        self.assertEqual(ret, 'abc')
-
     # see v3 entitlement cert format docs for explanation of how node count
     # is represented, which will explain the following tests
 
     def test_get_node_count_small(self):
-        bs = GhettoBitStream([])
-        bs.bytes = deque([6])
+        bs = BitReader(chr(6))
         ret = PathTree._get_node_count(bs)
         self.assertEqual(ret, 6)
 
     def test_get_node_count_medium(self):
-        bs = GhettoBitStream([])
         # count bigger than 127, only need 1 byte to represent it
-        bs.bytes = deque([129, 150])
+        bs = BitReader(chr(129) + chr(150))
         ret = PathTree._get_node_count(bs)
         self.assertEqual(ret, 150)
 
     def test_get_node_count_big(self):
-        bs = GhettoBitStream([])
         # count bigger than 127, need next 2 bytes to represent it
-        bs.bytes = deque([130, 1, 17])
+        bs = BitReader(chr(130) + chr(1) + chr(17))
         ret = PathTree._get_node_count(bs)
         self.assertEqual(ret, 273)
 
@@ -67,7 +58,7 @@ class TestPathTree(unittest.TestCase):
     def test_generate_path_leaves(self):
         data = open(DATA).read()
         nodes, bits = PathTree._unpack_data(data)
-        ret = PathTree._generate_path_leaves(GhettoBitStream(bits))
+        ret = PathTree._generate_path_leaves(BitReader(bits))
 
         self.assertEqual(len(ret), 4)
         for node in ret:
@@ -91,6 +82,16 @@ class TestPathTree(unittest.TestCase):
         self.assertFalse(pt.match_path('/foo'))
         self.assertFalse(pt.match_path('/bar'))
 
+    def test_match_large_tree(self):
+        paths = pathtree_data.content_paths(500)
+        pt = PathTree(pathtree_data.encode_paths(paths))
+        for path in paths:
+            path = path.replace('$releasever', '6Server')
+            path = path.replace('$basearch', 'x86_64')
+            self.assertTrue(pt.match_path(path))
+            self.assertTrue(pt.match_path(path + '/repodata/repomd.xml'))
+            self.assertFalse(pt.match_path(path.rsplit('/', 1)[0]))
+
     def test_match_variable(self):
         tree = {'foo': [{'$releasever': [{'bar':[{PATH_END: None}]}]}]}
         data = open(DATA).read()
@@ -99,3 +100,153 @@ class TestPathTree(unittest.TestCase):
         pt.path_tree = tree
         self.assertTrue(pt.match_path('/foo/path/bar'))
         self.assertFalse(pt.match_path('/foo/path/abc'))
+
+    def test_match_exact_before_variable(self):
+        # a variable is only tried when no word matches exactly
+        tree = {'foo': [{'$releasever': [{'bar': [{PATH_END: None}]}],
+                         'path': [{'baz': [{PATH_END: None}]}]}]}
+        pt = PathTree(open(DATA).read())
+        pt.path_tree = tree
+        self.assertTrue(pt.match_path('/foo/path/baz'))
+        self.assertFalse(pt.match_path('/foo/path/bar'))
+        self.assertTrue(pt.match_path('/foo/other/bar'))
+
+    def test_match_shared_nodes(self):
+        end = {PATH_END: None}
+        shared = {'os': [end], '$basearch': [{'debug': [end]}]}
+        tree = {'a': [shared], 'b': [shared, {'iso': [end]}]}
+        pt = PathTree(open(DATA).read())
+        pt.path_tree = tree
+        self.assertTrue(pt.match_path('/a/os'))
+        self.assertTrue(pt.match_path('/b/os/repodata'))
+        self.assertTrue(pt.match_path('/b/iso'))
+        self.assertTrue(pt.match_path('/b/x86_64/debug'))
+        self.assertFalse(pt.match_path('/a/iso'))
+        self.assertFalse(pt.match_path('/b'))
+
+    def test_compile(self):
+        end = {PATH_END: None}
+        tree = {'foo': [{'$releasever': [end], 'bar': [end]}]}
+        nodes = PathTree._compile(tree)
+        # root, the node below "foo", and one shared end node
+        self.assertEqual(len(nodes), 3)
+        self.assertEqual(nodes[0], ({'foo': (1,)}, (), False))
+        self.assertEqual(nodes[1],
+                         ({'$releasever': (2,), 'bar': (2,)}, (2,), False))
+        self.assertEqual(nodes[2], ({}, (), True))
+
+    def test_from_compiled(self):
+        pt = PathTree(open(DATA).read())
+        copy = PathTree.from_compiled(pt.compiled())
+        self.assertTrue(copy.match_path('/foo/path/always/2'))
+        self.assertFalse(copy.match_path('/foo'))
+        # the nested dict form gets rebuilt when asked for
+        self.assertEqual(copy.path_tree, pt.path_tree)
+
+    def test_paths(self):
+        pt = PathTree(open(DATA).read())
+        self.assertEqual(sorted(pt.paths()),
+                         ['/foo/path', '/foo/path/always/$releasever',
+                          '/foo/path/never'])
+
+    def test_paths_large_tree(self):
+        paths = pathtree_data.content_paths(300)
+        pt = PathTree(pathtree_data.encode_paths(paths))
+        self.assertEqual(sorted(pt.paths()), sorted(paths))
+
+    def test_match_relative_path(self):
+        pt = PathTree(open(DATA).read())
+        self.assertRaises(ValueError, pt.match_path, 'foo/path')
+
+
+class TreeCert(object):
+    """
+    Stands in for a v3 entitlement certificate with the given content paths.
+    """
+
+    def __init__(self, serial, paths):
+        self.serial = serial
+        self.tree = PathTree(pathtree_data.encode_paths(paths))
+
+    def entitled_paths(self):
+        return self.tree.paths()
+
+    def check_path(self, path):
+        return self.tree.match_path(path)
+
+
+class TestPathIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PathIndex()
+        self.index.add_paths(1, ['/foo/path/never', '/foo/path/$releasever'])
+        self.index.add_paths(2, ['/foo/path/never/debug', '/bar/$basearch/os'])
+        self.index.add_paths(3, ['/bar/$releasever/os/'])
+
+    def test_match_all(self):
+        self.assertEqual(self.index.match_all('/foo/path/never'), set([1]))
+        self.assertEqual(self.index.match_all('/foo/path/never/debug/x'),
+                         set([1, 2]))
+        self.assertEqual(self.index.match_all('/foo/path/6Server'), set([1]))
+        self.assertEqual(self.index.match_all('/bar/x86_64/os/repodata'),
+                         set([2, 3]))
+        self.assertEqual(self.index.match_all('/foo//path/never/'), set([1]))
+
+    def test_match_all_no_match(self):
+        self.assertEqual(self.index.match_all('/foo/path'), set())
+        self.assertEqual(self.index.match_all('/bar/x86_64/iso'), set())
+        self.assertEqual(self.index.match_all('/'), set())
+
+    def test_match_any(self):
+        self.assertTrue(self.index.match_any('/bar/x86_64/os'))
+        self.assertFalse(self.index.match_any('/bar/x86_64'))
+        self.assertFalse(self.index.match_any('/baz'))
+
+    def test_remove(self):
+        self.index.remove(2)
+        self.assertFalse(2 in self.index)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.match_all('/foo/path/never/debug'),
+                         set([1]))
+        self.assertEqual(self.index.match_all('/bar/x86_64/os'), set([3]))
+        self.index.remove(3)
+        self.assertFalse(self.index.match_any('/bar/x86_64/os'))
+        # the bar branch is gone entirely
+        self.assertFalse('bar' in self.index._root[0])
+        self.assertRaises(KeyError, self.index.remove, 3)
+
+    def test_remove_equivalent_paths(self):
+        self.index.add_paths(4, ['/baz/$basearch', '/baz/$releasever/'])
+        self.index.remove(4)
+        self.assertFalse(self.index.match_any('/baz/x86_64'))
+        self.assertFalse('baz' in self.index._root[0])
+
+    def test_add_replaces(self):
+        self.index.add_paths(1, ['/other'])
+        self.assertEqual(self.index.match_all('/foo/path/never'), set())
+        self.assertEqual(self.index.match_all('/other/a'), set([1]))
+
+    def test_add_cert_exact_over_variable(self):
+        # the cert does not try $x at the level where "b" matches exactly
+        index = PathIndex()
+        index.add_cert(TreeCert(5, ['/a/b/c', '/a/$x/d']))
+        index.add_paths(6, ['/a/$x/d'])
+        self.assertEqual(index.match_all('/a/b/d'), set([6]))
+        self.assertEqual(index.match_all('/a/z/d'), set([5, 6]))
+        self.assertEqual(index.match_all('/a/b/c/repodata'), set([5]))
+        index.remove(6)
+        self.assertFalse(index.match_any('/a/b/d'))
+        self.assertTrue(index.match_any('/a/z/d'))
+        index.remove(5)
+        self.assertFalse(index.match_any('/a/z/d'))
+
+    def test_agrees_with_path_tree(self):
+        paths = pathtree_data.content_paths(200)
+        pt = PathTree(pathtree_data.encode_paths(paths))
+        index = PathIndex()
+        index.add_paths(10, pt.paths())
+        for path in paths:
+            path = path.replace('$releasever', '6Server')
+            path = path.replace('$basearch', 'x86_64')
+            for request in [path, path + '/Packages', path.rsplit('/', 1)[0]]:
+                self.assertEqual(index.match_any(request),
+                                 pt.match_path(request))
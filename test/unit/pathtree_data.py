@@ -0,0 +1,105 @@
+# Copyright (c) 2012 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+
+"""
+Builds v3 entitlement path tree data, in the same format candlepin uses, from
+a list of content paths. This lets tests and benchmarks work with trees much
+larger than the entitlement_data.bin fixture.
+"""
+
+import itertools
+import zlib
+
+from rhsm.huffman import HuffmanNode
+
+
+def content_paths(count):
+    """
+    :return:    list of "count" distinct content paths that look like the
+                ones found in real entitlement certificates
+    """
+    paths = []
+    for n in xrange(count):
+        paths.append('/content/dist/rhel/server/%d/$releasever/$basearch/'
+                     'product%d/repo%d/os' % (n % 7, n % 97, n))
+    return paths
+
+
+def encode_paths(paths):
+    """
+    :param paths:   absolute content paths, which may contain variables such
+                    as "$releasever"
+    :type  paths:   list of str
+    :return:        compressed path tree, as found in a v3 entitlement
+                    certificate extension
+    :rtype:         str
+    """
+    # all paths end on one shared node, just like candlepin produces
+    end = {}
+    root = {}
+    for path in paths:
+        node = root
+        words = path.strip('/').split('/')
+        for word in words[:-1]:
+            child = node.setdefault(word, {})
+            if child is end:
+                break
+            node = child
+        else:
+            node[words[-1]] = end
+
+    nodes = [root]
+    for node in nodes:
+        for word in sorted(node.keys()):
+            if node[word] is not end:
+                nodes.append(node[word])
+    nodes.append(end)
+    node_index = dict((id(node), i) for i, node in enumerate(nodes))
+
+    words = set()
+    for node in nodes:
+        words.update(node.keys())
+    words = sorted(words) + ['']
+
+    word_leaves = [HuffmanNode(weight, value) for weight, value in
+                   zip(itertools.count(1), words)]
+    HuffmanNode.build_tree(word_leaves)
+    word_codes = dict((leaf.value, leaf.code) for leaf in word_leaves)
+
+    path_leaves = [HuffmanNode(weight, weight) for weight in
+                   range(1, len(nodes))]
+    HuffmanNode.build_tree(path_leaves)
+    path_codes = dict((leaf.value, leaf.code) for leaf in path_leaves)
+
+    bits = []
+    for node in nodes:
+        for word in sorted(node.keys()):
+            bits.append(word_codes[word])
+            bits.append(path_codes[node_index[id(node[word])]])
+        bits.append(word_codes[''])
+    bits = ''.join(bits)
+    bits += '0' * (-len(bits) % 8)
+    tree = ''.join(chr(int(bits[i:i + 8], 2)) for i in range(0, len(bits), 8))
+
+    return zlib.compress('\0'.join(words)) + _encode_node_count(len(nodes)) \
+            + tree
+
+
+def _encode_node_count(count):
+    if count < 128:
+        return chr(count)
+    count_bytes = []
+    while count:
+        count_bytes.insert(0, chr(count & 0xff))
+        count >>= 8
+    return chr(128 + len(count_bytes)) + ''.join(count_bytes)